@@ -0,0 +1,96 @@
+const {Channel, MODE_CLIENT, MODE_SERVER} = require('shmchannel')
+
+const STOP = new ArrayBuffer(1)
+
+function createChannel(name, mode, arenaSize, poolSize) {
+  let channel = new Channel(name, mode)
+  channel.setArenaSize(parseInt(arenaSize))
+  channel.setPoolSize(parseInt(poolSize))
+  return channel
+}
+
+function elapsedSeconds(start) {
+  let [seconds, nanoseconds] = process.hrtime(start)
+  return seconds + nanoseconds / 1e9
+}
+
+async function runServer(channel) {
+  channel.setNotificationCallback(function(data) {
+    if (data.byteLength === 1) {
+      channel.stopCommunication()
+    }
+  })
+  channel.open()
+  let loop = channel.startCommunication()
+  console.log("ready")
+  await loop
+  channel.close()
+}
+
+async function measureLatency(channel, payload, concurrency, count) {
+  let latencies = []
+  let issued = 0
+  let worker = async function() {
+    while (issued < count) {
+      issued++
+      let start = process.hrtime()
+      await channel.request(payload)
+      latencies.push(elapsedSeconds(start) * 1e6)
+    }
+  }
+  let start = process.hrtime()
+  let workers = []
+  for (let i = 0; i < concurrency; i++) {
+    workers.push(worker())
+  }
+  await Promise.all(workers)
+  return {elapsed_s: elapsedSeconds(start), latencies_us: latencies}
+}
+
+async function measureThroughput(channel, payload, count) {
+  let start = process.hrtime()
+  for (let i = 0; i < count; i++) {
+    channel.notify(payload)
+  }
+  await channel.request(new ArrayBuffer(8))
+  return {elapsed_s: elapsedSeconds(start)}
+}
+
+async function runClient(channel, scenario, size, concurrency, count) {
+  channel.open()
+  channel.startCommunication()
+  let payload = new ArrayBuffer(size)
+  let result
+  if (scenario === "latency") {
+    result = await measureLatency(channel, payload, concurrency, count)
+  } else {
+    result = await measureThroughput(channel, payload, count)
+  }
+  channel.notify(STOP)
+  channel.sendReceive()
+  channel.close()
+  console.log(JSON.stringify(result))
+}
+
+async function main(args) {
+  if (args.length === 6 && args[2] === "server") {
+    await runServer(createChannel(args[3], MODE_SERVER, args[4], args[5]))
+    return 0
+  }
+  if (args.length === 10 && args[2] === "client") {
+    let channel = createChannel(args[3], MODE_CLIENT, args[4], args[5])
+    await runClient(channel, args[6], parseInt(args[7]), parseInt(args[8]), parseInt(args[9]))
+    return 0
+  }
+  console.error("Usage: %s %s server NAME ARENA_SIZE POOL_SIZE", args[0], args[1])
+  console.error("       %s %s client NAME ARENA_SIZE POOL_SIZE latency|throughput SIZE CONCURRENCY COUNT",
+    args[0], args[1])
+  return 1
+}
+
+main(process.argv).then(function(status) {
+  process.exitCode = status
+}).catch(function (e) {
+  console.error("Error: %s", e)
+  process.exitCode = 1
+})
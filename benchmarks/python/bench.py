@@ -0,0 +1,84 @@
+import asyncio
+import json
+import sys
+import time
+from typing import List
+
+from shmchannel import MODE_SERVER, MODE_CLIENT, Channel
+
+STOP = b"\0"
+
+
+def create_channel(name: str, mode: int, arena_size: str, pool_size: str) -> Channel:
+    return Channel(name, mode, arena_size=int(arena_size), pool_size=int(pool_size))
+
+
+async def run_server(channel: Channel):
+    def notification_received(data: bytes):
+        if data == STOP:
+            channel.stop()
+
+    channel.set_notification_callback(notification_received)
+    channel.open()
+    channel.start()
+    print("ready", flush=True)
+    await channel.wait_stopped()
+    channel.close()
+
+
+async def measure_latency(channel: Channel, payload: bytes, concurrency: int, count: int) -> dict:
+    latencies = []
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < count:
+            issued += 1
+            start = time.perf_counter()
+            await channel.request(payload)
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"elapsed_s": time.perf_counter() - start, "latencies_us": latencies}
+
+
+async def measure_throughput(channel: Channel, payload: bytes, count: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(count):
+        channel.notify(payload)
+    await channel.request(b"barrier!")
+    return {"elapsed_s": time.perf_counter() - start}
+
+
+async def run_client(channel: Channel, scenario: str, size: int, concurrency: int, count: int):
+    channel.open()
+    channel.start()
+    payload = bytes(size)
+    if scenario == "latency":
+        result = await measure_latency(channel, payload, concurrency, count)
+    else:
+        result = await measure_throughput(channel, payload, count)
+    channel.notify(STOP)
+    channel.send_receive()
+    channel.close()
+    print(json.dumps(result), flush=True)
+
+
+async def main(args: List[str]) -> int:
+    if len(args) == 5 and args[1] == "server":
+        await run_server(create_channel(args[2], MODE_SERVER, args[3], args[4]))
+        return 0
+    if len(args) == 9 and args[1] == "client":
+        channel = create_channel(args[2], MODE_CLIENT, args[3], args[4])
+        await run_client(channel, args[5], int(args[6]), int(args[7]), int(args[8]))
+        return 0
+    print("Usage: %s server NAME ARENA_SIZE POOL_SIZE\n"
+          "       %s client NAME ARENA_SIZE POOL_SIZE latency|throughput SIZE CONCURRENCY COUNT"
+          % (args[0], args[0]), file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    sys.exit(loop.run_until_complete(main(sys.argv)))
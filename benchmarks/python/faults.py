@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from typing import List
+
+from shmchannel import Shmem
+
+MIB = 1024 * 1024
+OPTIONS = {
+    "plain": {},
+    "populate": {"populate": True},
+    "will_need": {"will_need": True},
+    "hugepages": {"hugepages": True},
+    "populate+hugepages": {"populate": True, "hugepages": True},
+    "mlock": {"mlock": True},
+}
+
+
+def minor_faults() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+
+
+class Phase:
+    def __init__(self, result: dict, name: str):
+        self._result = result
+        self._name = name
+
+    def __enter__(self):
+        self._faults = minor_faults()
+        self._start = time.perf_counter()
+
+    def __exit__(self, *args):
+        self._result[self._name] = {
+            "elapsed_ms": (time.perf_counter() - self._start) * 1000,
+            "minor_faults": minor_faults() - self._faults,
+        }
+
+
+def measure(name: str, size: int, options: dict) -> dict:
+    payload = b"\xa5" * size
+    result = {}
+    with Phase(result, "writer_map"):
+        writer = Shmem.create(name, size, **options)
+    with writer:
+        with Phase(result, "writer_copy"):
+            writer.buffer[:] = payload
+        with Phase(result, "reader_map"):
+            reader = Shmem.open(name, **options)
+        with reader:
+            with Phase(result, "reader_copy"):
+                copy = reader[:]
+    assert copy == payload
+    return result
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Measure page faults of mapping and touching a shared memory frame.")
+    parser.add_argument("options", nargs="*", default=list(OPTIONS), help="options of the mapping: %s" % (
+        ", ".join(OPTIONS)))
+    parser.add_argument("-s", "--size", type=int, default=100, help="the size of the frame in MiB, default: 100")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="the number of measurements of each option")
+    args = parser.parse_args(argv[1:])
+    for option in args.options:
+        if option not in OPTIONS:
+            parser.error("Unknown option '%s'." % option)
+
+    name = "/shmch-faults-%d" % os.getpid()
+    for option in args.options:
+        for _ in range(args.repeat):
+            result = {"options": option, "size": args.size * MIB}
+            result.update(measure(name, args.size * MIB, OPTIONS[option]))
+            print(json.dumps(result), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
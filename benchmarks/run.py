@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from typing import Dict, List, Optional, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD = os.path.join(ROOT, "build")
+
+RUNTIMES = {
+    "vala": [os.path.join(BUILD, "benchmarks", "bench")],
+    "python": [sys.executable, os.path.join(ROOT, "benchmarks", "python", "bench.py")],
+    "nodejs": ["node", os.path.join(ROOT, "benchmarks", "nodejs", "bench.js")],
+}
+RUNTIME_ENV = {
+    "vala": {"LD_LIBRARY_PATH": BUILD},
+    "python": {"LD_LIBRARY_PATH": BUILD, "PYTHONPATH": os.pathsep.join((ROOT, os.path.join(BUILD, "pyffi")))},
+    "nodejs": {"LD_LIBRARY_PATH": BUILD, "NODE_PATH": os.path.join(ROOT, "nodejs")},
+}
+SIZES = [16 * 4 ** i for i in range(12)]  # 16 B ... 64 MiB
+CONCURRENCY = [1, 10, 100, 1000]
+CONCURRENCY_SIZE = 64
+PERCENTILES = [50, 90, 99, 99.9]
+MIB = 1024 * 1024
+
+
+def parse_size(value: str) -> int:
+    units = {"k": 1024, "m": MIB, "g": 1024 * MIB}
+    value = value.strip().lower().rstrip("b")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return float("nan")
+    rank = max(0, math.ceil(p / 100 * len(samples)) - 1)
+    return samples[rank]
+
+
+def message_count(size: int, budget: int, min_count: int, max_count: int) -> int:
+    return max(min_count, min(max_count, budget // size))
+
+
+def runtime_env(runtime: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    for key, value in RUNTIME_ENV[runtime].items():
+        env[key] = os.pathsep.join((value, env[key])) if env.get(key) else value
+    return env
+
+
+def run_scenario(server: str, client: str, name: str, scenario: str, size: int, concurrency: int, count: int,
+                 arena_size: int, pool_size: int, timeout: float) -> dict:
+    options = [name, str(arena_size), str(pool_size)]
+    server_proc = subprocess.Popen(RUNTIMES[server] + ["server"] + options, env=runtime_env(server),
+                                   stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        line = server_proc.stdout.readline().strip()
+        if line != "ready":
+            raise RuntimeError("The %s server failed to start: %r" % (server, line))
+        args = ["client"] + options + [scenario, str(size), str(concurrency), str(count)]
+        output = subprocess.check_output(RUNTIMES[client] + args, env=runtime_env(client),
+                                         universal_newlines=True, timeout=timeout)
+        server_proc.wait(timeout=timeout)
+    finally:
+        if server_proc.poll() is None:
+            server_proc.kill()
+            server_proc.wait()
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(scenario: str, size: int, concurrency: int, count: int, raw: dict) -> dict:
+    elapsed = raw["elapsed_s"]
+    result = {
+        "scenario": scenario,
+        "size": size,
+        "concurrency": concurrency,
+        "count": count,
+        "elapsed_s": elapsed,
+        "messages_per_s": count / elapsed if elapsed > 0 else None,
+        "mb_per_s": count * size / MIB / elapsed if elapsed > 0 else None,
+    }
+    if scenario == "latency":
+        samples = sorted(raw["latencies_us"])
+        result["latency_us"] = {"p%s" % p: percentile(samples, p) for p in PERCENTILES}
+        result["latency_us"]["min"] = samples[0]
+        result["latency_us"]["max"] = samples[-1]
+        result["latency_us"]["mean"] = sum(samples) / len(samples)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "-C", ROOT, "rev-parse", "HEAD"], universal_newlines=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Sequence[str]) -> int:
+    parser = argparse.ArgumentParser(description="Measure latency and throughput of shmchannel runtimes.")
+    parser.add_argument("pairs", nargs="*", default=["vala:vala", "python:python", "nodejs:nodejs"],
+                        help="server:client pairs of runtimes (vala, python, nodejs), default: same-runtime pairs")
+    parser.add_argument("-o", "--output", default="-", help="the JSON file to write results to, default: stdout")
+    parser.add_argument("-s", "--sizes", nargs="+", type=parse_size, default=SIZES, help="payload sizes")
+    parser.add_argument("-c", "--concurrency", nargs="+", type=int, default=CONCURRENCY,
+                        help="numbers of outstanding requests")
+    parser.add_argument("--concurrency-size", type=parse_size, default=CONCURRENCY_SIZE,
+                        help="payload size of the concurrency scenarios")
+    parser.add_argument("--budget", type=parse_size, default=256 * MIB,
+                        help="the total size of payloads per scenario, it determines the number of messages")
+    parser.add_argument("--min-count", type=int, default=10, help="the minimal number of messages per scenario")
+    parser.add_argument("--max-count", type=int, default=100000, help="the maximal number of messages per scenario")
+    parser.add_argument("--arena-size", type=parse_size, default=0, help="the size of the payload arena")
+    parser.add_argument("--pool-size", type=parse_size, default=0, help="the size of the segment pool")
+    parser.add_argument("--timeout", type=float, default=600, help="the timeout of a single scenario in seconds")
+    args = parser.parse_args(argv[1:])
+
+    if min(args.sizes + [args.concurrency_size]) < 2:
+        parser.error("Payload sizes must be at least 2 bytes, a one-byte notification stops the server.")
+    pairs = []
+    for pair in args.pairs:
+        server, _, client = pair.partition(":")
+        client = client or server
+        for runtime in server, client:
+            if runtime not in RUNTIMES:
+                parser.error("Unknown runtime '%s'." % runtime)
+        pairs.append((server, client))
+
+    scenarios = [("latency", size, 1) for size in args.sizes]
+    scenarios += [("throughput", size, 1) for size in args.sizes]
+    scenarios += [("latency", args.concurrency_size, concurrency) for concurrency in args.concurrency]
+    results = []
+    for server, client in pairs:
+        for scenario, size, concurrency in scenarios:
+            count = message_count(size, args.budget, args.min_count, args.max_count)
+            if scenario == "latency":
+                count = max(count, concurrency)
+            name = "/shmch-bench-%d" % os.getpid()
+            print("%s -> %s: %s, %d B, concurrency %d, %d messages" % (
+                client, server, scenario, size, concurrency, count), file=sys.stderr)
+            raw = run_scenario(server, client, name, scenario, size, concurrency, count,
+                               args.arena_size, args.pool_size, args.timeout)
+            result = summarize(scenario, size, concurrency, count, raw)
+            result["server"] = server
+            result["client"] = client
+            results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "host": {"platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "options": {"arena_size": args.arena_size, "pool_size": args.pool_size, "budget": args.budget},
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,116 @@
+const uint8 STOP[] = {0};
+
+Shmch.Channel create_channel(string name, Shmch.Mode mode, string arena_size, string pool_size) {
+    var channel = new Shmch.Channel(name, mode);
+    channel.arena_size = (uint) uint64.parse(arena_size);
+    channel.pool_size = (uint) uint64.parse(pool_size);
+    return channel;
+}
+
+double elapsed_seconds(int64 start) {
+    return (GLib.get_monotonic_time() - start) / 1e6;
+}
+
+void run_server(Shmch.Channel channel) throws Shmch.Error {
+    var running = true;
+    channel.set_notification_callback((data) => {
+        if (data.length == 1) {
+            running = false;
+        }
+    });
+    channel.set_request_callback((request) => {
+        try {
+            request.send_response(request.get_data());
+        } catch (Shmch.Error e) {
+            critical("Failed to send a response: %s", e.message);
+        }
+    });
+    channel.open();
+    stdout.printf("ready\n");
+    stdout.flush();
+    while (running) {
+        if (channel.wait_for_data(-1)) {
+            channel.send_receive(false);
+        }
+    }
+    channel.close();
+}
+
+string measure_latency(Shmch.Channel channel, uint8[] payload, int concurrency, int count) throws Shmch.Error {
+    var latencies = new int64[count];
+    var issued = 0;
+    var received = 0;
+    var start = GLib.get_monotonic_time();
+    while (received < count) {
+        while (issued < count && issued - received < concurrency) {
+            var sent_at = GLib.get_monotonic_time();
+            channel.request(payload, (data) => {
+                latencies[received++] = GLib.get_monotonic_time() - sent_at;
+            });
+            issued++;
+        }
+        if (channel.wait_for_data(-1)) {
+            channel.send_receive(false);
+        }
+    }
+    var elapsed = elapsed_seconds(start);
+    var result = new StringBuilder();
+    result.append_printf("{\"elapsed_s\": %s, \"latencies_us\": [", elapsed.to_string());
+    for (var i = 0; i < count; i++) {
+        if (i > 0) {
+            result.append(", ");
+        }
+        result.append(latencies[i].to_string());
+    }
+    result.append("]}");
+    return result.str;
+}
+
+string measure_throughput(Shmch.Channel channel, uint8[] payload, int count) throws Shmch.Error {
+    var start = GLib.get_monotonic_time();
+    for (var i = 0; i < count; i++) {
+        channel.notify(payload);
+    }
+    var done = false;
+    channel.request("barrier!".data, (data) => {
+        done = true;
+    });
+    while (!done) {
+        if (channel.wait_for_data(-1)) {
+            channel.send_receive(false);
+        }
+    }
+    return "{\"elapsed_s\": %s}".printf(elapsed_seconds(start).to_string());
+}
+
+void run_client(Shmch.Channel channel, string scenario, int size, int concurrency, int count) throws Shmch.Error {
+    channel.open();
+    var payload = new uint8[size];
+    var result = scenario == "latency"
+        ? measure_latency(channel, payload, concurrency, count)
+        : measure_throughput(channel, payload, count);
+    channel.notify(STOP);
+    channel.send_receive(false);
+    channel.close();
+    stdout.printf("%s\n", result);
+}
+
+int main(string[] args) {
+    try {
+        if (args.length == 5 && args[1] == "server") {
+            run_server(create_channel(args[2], Shmch.Mode.SERVER, args[3], args[4]));
+            return 0;
+        }
+        if (args.length == 9 && args[1] == "client") {
+            var channel = create_channel(args[2], Shmch.Mode.CLIENT, args[3], args[4]);
+            run_client(channel, args[5], int.parse(args[6]), int.parse(args[7]), int.parse(args[8]));
+            return 0;
+        }
+    } catch (Shmch.Error e) {
+        stderr.printf("Error: %s\n", e.message);
+        return 2;
+    }
+    stderr.printf("Usage: %s server NAME ARENA_SIZE POOL_SIZE\n", args[0]);
+    stderr.printf("       %s client NAME ARENA_SIZE POOL_SIZE latency|throughput SIZE CONCURRENCY COUNT\n", args[0]);
+    return 1;
+}
@@ -4,6 +4,10 @@ typedef unsigned char guint8;
 typedef void* gpointer;
 typedef int gint;
 typedef unsigned long   gulong;
+typedef unsigned int guint;
+typedef unsigned long long guint64;
+typedef long long gint64;
+typedef double gdouble;
 typedef gint gboolean;
 typedef struct _GError GError;
 
@@ -18,13 +22,47 @@ void g_clear_error(GError **err);
 typedef struct _ShmchIncomingRequest ShmchIncomingRequest;
 typedef struct _ShmchShmem ShmchShmem;
 typedef struct _ShmchChannel ShmchChannel;
+typedef struct _ShmchIncomingBatch ShmchIncomingBatch;
+typedef struct _ShmchLease ShmchLease;
+typedef struct _ShmchReservation ShmchReservation;
+typedef struct _ShmchLatencyHistogram ShmchLatencyHistogram;
+typedef struct _ShmchChannelServer ShmchChannelServer;
+typedef struct _ShmchChannelGroup ShmchChannelGroup;
+typedef struct _ShmchOutgoingStream ShmchOutgoingStream;
+
+typedef enum  {
+	SHMCH_STREAM_EVENT_OPEN,
+	SHMCH_STREAM_EVENT_DATA,
+	SHMCH_STREAM_EVENT_END,
+	SHMCH_STREAM_EVENT_ABORT
+} ShmchStreamEvent;
 
 
 extern "Python" void data_callback(guint8*, int, void*);
 extern "Python" void request_callback(ShmchIncomingRequest*, void*);
+extern "Python" void batch_response_callback(gint, guint8*, int, void*);
+extern "Python" void batch_callback(ShmchIncomingBatch*, void*);
+extern "Python" void leased_data_callback(guint8*, int, void*);
+extern "Python" void leased_request_callback(ShmchIncomingRequest*, void*);
+extern "Python" void timeout_callback(guint, void*);
+extern "Python" void channel_callback(ShmchChannel*, void*);
+extern "Python" void client_request_callback(guint, ShmchIncomingRequest*, void*);
+extern "Python" void client_data_callback(guint, guint8*, int, void*);
+extern "Python" void client_state_callback(guint, gboolean, void*);
+extern "Python" void streaming_response_callback(guint8*, int, gboolean, void*);
+extern "Python" void stream_callback(guint, ShmchStreamEvent, guint8*, int, void*);
 
 typedef void (*ShmchDataCallback) (guint8* data, int data_length1, void* user_data);
 typedef void (*ShmchRequestCallback) (ShmchIncomingRequest* request, void* user_data);
+typedef void (*ShmchBatchResponseCallback) (gint index, guint8* data, int data_length1, void* user_data);
+typedef void (*ShmchBatchCallback) (ShmchIncomingBatch* batch, void* user_data);
+typedef void (*ShmchTimeoutCallback) (guint id, void* user_data);
+typedef void (*ShmchChannelCallback) (ShmchChannel* channel, void* user_data);
+typedef void (*ShmchClientRequestCallback) (guint client, ShmchIncomingRequest* request, void* user_data);
+typedef void (*ShmchClientDataCallback) (guint client, guint8* data, int data_length1, void* user_data);
+typedef void (*ShmchClientStateCallback) (guint client, gboolean connected, void* user_data);
+typedef void (*ShmchStreamingResponseCallback) (guint8* data, int data_length1, gboolean last, void* user_data);
+typedef void (*ShmchStreamCallback) (guint id, ShmchStreamEvent event, guint8* data, int data_length1, void* user_data);
 
 typedef enum  {
 	SHMCH_ERROR_ALREADY_OPEN,
@@ -33,7 +71,10 @@ typedef enum  {
 	SHMCH_ERROR_INVALID_SIZE,
 	SHMCH_ERROR_SHM_OPEN_FAILED,
 	SHMCH_ERROR_SHM_CLOSE_FAILED,
-	SHMCH_ERROR_RESOURCE_LIMIT
+	SHMCH_ERROR_RESOURCE_LIMIT,
+	SHMCH_ERROR_INCOMPATIBLE,
+	SHMCH_ERROR_WOULD_BLOCK,
+	SHMCH_ERROR_BUSY
 } ShmchError;
 
 typedef enum  {
@@ -41,22 +82,108 @@ typedef enum  {
 	SHMCH_MODE_CLIENT
 } ShmchMode;
 
+typedef enum  {
+	SHMCH_MESSAGE_KIND_NOTIFICATION,
+	SHMCH_MESSAGE_KIND_REQUEST,
+	SHMCH_MESSAGE_KIND_RESPONSE
+} ShmchMessageKind;
+
+typedef enum  {
+	SHMCH_LATENCY_STAGE_QUEUED,
+	SHMCH_LATENCY_STAGE_IN_RING,
+	SHMCH_LATENCY_STAGE_CALLBACK,
+	SHMCH_LATENCY_STAGE_TOTAL
+} ShmchLatencyStage;
+
+typedef enum  {
+	SHMCH_SHMEM_FLAGS_NONE = 0,
+	SHMCH_SHMEM_FLAGS_POPULATE = 1 << 0,
+	SHMCH_SHMEM_FLAGS_HUGEPAGES = 1 << 1,
+	SHMCH_SHMEM_FLAGS_WILL_NEED = 1 << 2,
+	SHMCH_SHMEM_FLAGS_MLOCK = 1 << 3,
+	SHMCH_SHMEM_FLAGS_GROWABLE = 1 << 4
+} ShmchShmemFlags;
+
+typedef struct _ShmchBatchEntry {
+	ShmchMessageKind kind;
+	guint id;
+	guint8* data;
+	gint size;
+} ShmchBatchEntry;
+
+
+typedef struct _ShmchStats {
+	guint64 messages_sent;
+	guint64 bytes_sent;
+	guint64 messages_received;
+	guint64 bytes_received;
+	guint64 arena_payloads;
+	guint64 pool_payloads;
+	guint64 segment_payloads;
+	guint64 send_receive_calls;
+	guint64 outgoing_ring_full;
+	guint64 incoming_ring_full;
+	guint64 doorbell_rings;
+	guint64 doorbell_drains;
+	guint64 waits;
+	guint64 segments_opened;
+	guint64 outgoing_queue_length;
+	guint64 outgoing_queue_max;
+	guint64 incoming_batch_max;
+	guint64 pending_requests;
+	guint64 requests_timed_out;
+	guint64 credit_stalls;
+	guint64 inline_payloads;
+} ShmchStats;
+
 
 gpointer shmch_incoming_request_ref (gpointer instance);
 void shmch_incoming_request_unref (gpointer instance);
 guint8* shmch_incoming_request_get_data (ShmchIncomingRequest* self, int* result_length1);
 void shmch_incoming_request_send_response (ShmchIncomingRequest* self, guint8* data, int data_length1, GError** error);
+void shmch_incoming_request_send_partial_response (ShmchIncomingRequest* self, guint8* data, int data_length1, GError** error);
+
+gpointer shmch_incoming_batch_ref (gpointer instance);
+void shmch_incoming_batch_unref (gpointer instance);
+gint shmch_incoming_batch_get_length (ShmchIncomingBatch* self);
+ShmchBatchEntry* shmch_incoming_batch_get_entries (ShmchIncomingBatch* self, int* result_length1);
+
+gpointer shmch_lease_ref (gpointer instance);
+void shmch_lease_unref (gpointer instance);
+gboolean shmch_lease_get_released (ShmchLease* self);
+guint8* shmch_lease_get_data (ShmchLease* self, int* result_length1);
+void shmch_lease_release (ShmchLease* self, GError** error);
+
+gpointer shmch_reservation_ref (gpointer instance);
+void shmch_reservation_unref (gpointer instance);
+gint shmch_reservation_get_size (ShmchReservation* self);
+gboolean shmch_reservation_get_finished (ShmchReservation* self);
+guint8* shmch_reservation_get_buffer (ShmchReservation* self, int* result_length1);
+
+gpointer shmch_latency_histogram_ref (gpointer instance);
+void shmch_latency_histogram_unref (gpointer instance);
+gdouble shmch_latency_histogram_get_mean (ShmchLatencyHistogram* self);
+gint64 shmch_latency_histogram_get_value_at_percentile (ShmchLatencyHistogram* self, gdouble percentile);
+guint64 shmch_latency_histogram_get_count (ShmchLatencyHistogram* self);
+gint64 shmch_latency_histogram_get_min (ShmchLatencyHistogram* self);
+gint64 shmch_latency_histogram_get_max (ShmchLatencyHistogram* self);
 
 gchar* shmch_get_error_message (GError* e);
 
 gpointer shmch_shmem_ref (gpointer instance);
 void shmch_shmem_unref (gpointer instance);
 ShmchShmem* shmch_shmem_new (const gchar* name, gulong size, gboolean create, gboolean discard, GError** error);
+ShmchShmem* shmch_shmem_new_with_flags (const gchar* name, gulong size, gboolean create, gboolean discard, ShmchShmemFlags flags, GError** error);
 guint8* shmch_shmem_get_buffer (ShmchShmem* self, int* result_length1);
 void shmch_shmem_close (ShmchShmem* self, GError** error);
 const gchar* shmch_shmem_get_name (ShmchShmem* self);
 gulong shmch_shmem_get_size (ShmchShmem* self);
 void* shmch_shmem_get_pointer (ShmchShmem* self);
+ShmchShmemFlags shmch_shmem_get_flags (ShmchShmem* self);
+guint shmch_shmem_get_generation (ShmchShmem* self);
+void shmch_shmem_resize (ShmchShmem* self, gulong new_size, GError** error);
+gboolean shmch_shmem_is_stale (ShmchShmem* self);
+gboolean shmch_shmem_refresh (ShmchShmem* self, GError** error);
 
 gpointer shmch_channel_ref (gpointer instance);
 void shmch_channel_unref (gpointer instance);
@@ -64,10 +191,111 @@ ShmchChannel* shmch_channel_new (const gchar* name, ShmchMode mode);
 void shmch_channel_open (ShmchChannel* self, GError** error);
 void shmch_channel_set_request_callback (ShmchChannel* self, ShmchRequestCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
 void shmch_channel_set_notification_callback (ShmchChannel* self, ShmchDataCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
-void shmch_channel_request (ShmchChannel* self, guint8* data, int data_length1, ShmchDataCallback response_callback, void* response_callback_target, GDestroyNotify response_callback_target_destroy_notify, GError** error);
+void shmch_channel_set_batch_callback (ShmchChannel* self, ShmchBatchCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
+void shmch_channel_set_timeout_callback (ShmchChannel* self, ShmchTimeoutCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
+void shmch_channel_set_stream_callback (ShmchChannel* self, ShmchStreamCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
+ShmchOutgoingStream* shmch_channel_open_stream (ShmchChannel* self, guint8* metadata, int metadata_length1, GError** error);
+void shmch_channel_consume_stream_chunk (ShmchChannel* self, gint size);
+gboolean shmch_channel_cancel_request (ShmchChannel* self, guint id);
+gint shmch_channel_get_next_timeout (ShmchChannel* self);
+gboolean shmch_channel_has_credit (ShmchChannel* self, gint size);
+gboolean shmch_channel_wait_for_credit (ShmchChannel* self, gint size, gint timeout, GError** error);
+guint shmch_channel_request (ShmchChannel* self, guint8* data, int data_length1, ShmchDataCallback response_callback, void* response_callback_target, GDestroyNotify response_callback_target_destroy_notify, GError** error);
+guint shmch_channel_request_stream (ShmchChannel* self, guint8* data, int data_length1, ShmchStreamingResponseCallback frame_callback, void* frame_callback_target, GDestroyNotify frame_callback_target_destroy_notify, GError** error);
 void shmch_channel_notify (ShmchChannel* self, guint8* data, int data_length1, GError** error);
+void shmch_channel_get_stats (ShmchChannel* self, ShmchStats* result);
+void shmch_channel_reset_stats (ShmchChannel* self);
+ShmchLatencyHistogram* shmch_channel_get_latency_histogram (ShmchChannel* self, ShmchLatencyStage stage);
+void shmch_channel_reset_latency_histograms (ShmchChannel* self);
+ShmchLease* shmch_channel_lease_payload (ShmchChannel* self);
+ShmchReservation* shmch_channel_reserve (ShmchChannel* self, gint size, GError** error);
+void shmch_channel_commit (ShmchChannel* self, ShmchReservation* reservation, GError** error);
+guint shmch_channel_commit_request (ShmchChannel* self, ShmchReservation* reservation, ShmchDataCallback response_callback, void* response_callback_target, GDestroyNotify response_callback_target_destroy_notify, GError** error);
+void shmch_channel_cancel_reservation (ShmchChannel* self, ShmchReservation* reservation, GError** error);
+void shmch_channel_send_response (ShmchChannel* self, guint id, guint8* data, int data_length1, GError** error);
+void shmch_channel_send_partial_response (ShmchChannel* self, guint id, guint8* data, int data_length1, GError** error);
+void shmch_channel_request_many (ShmchChannel* self, guint8* data, int data_length1, gint* sizes, int sizes_length1, guint* ids, int ids_length1, ShmchBatchResponseCallback response_callback, void* response_callback_target, GDestroyNotify response_callback_target_destroy_notify, GError** error);
+void shmch_channel_notify_many (ShmchChannel* self, guint8* data, int data_length1, gint* sizes, int sizes_length1, GError** error);
 gboolean shmch_channel_send_receive (ShmchChannel* self, gboolean wait, GError** error);
 void shmch_channel_close (ShmchChannel* self, GError** error);
+gint shmch_channel_get_wakeup_fd (ShmchChannel* self, GError** error);
+gint shmch_channel_dup_wakeup_fd (ShmchChannel* self, GError** error);
+gboolean shmch_channel_wait_for_data (ShmchChannel* self, gint timeout, GError** error);
 const gchar* shmch_channel_get_name (ShmchChannel* self);
 ShmchMode shmch_channel_get_mode (ShmchChannel* self);
 gboolean shmch_channel_get_is_opened (ShmchChannel* self);
+guint shmch_channel_get_arena_size (ShmchChannel* self);
+void shmch_channel_set_arena_size (ShmchChannel* self, guint value);
+guint shmch_channel_get_pool_size (ShmchChannel* self);
+void shmch_channel_set_pool_size (ShmchChannel* self, guint value);
+guint shmch_channel_get_slot_capacity (ShmchChannel* self);
+void shmch_channel_set_slot_capacity (ShmchChannel* self, guint value);
+gboolean shmch_channel_get_tracing (ShmchChannel* self);
+void shmch_channel_set_tracing (ShmchChannel* self, gboolean value);
+guint shmch_channel_get_request_timeout (ShmchChannel* self);
+void shmch_channel_set_request_timeout (ShmchChannel* self, guint value);
+guint shmch_channel_get_max_pending_requests (ShmchChannel* self);
+void shmch_channel_set_max_pending_requests (ShmchChannel* self, guint value);
+guint shmch_channel_get_receive_window_packets (ShmchChannel* self);
+void shmch_channel_set_receive_window_packets (ShmchChannel* self, guint value);
+guint shmch_channel_get_receive_window_bytes (ShmchChannel* self);
+void shmch_channel_set_receive_window_bytes (ShmchChannel* self, guint value);
+gboolean shmch_channel_get_io_thread (ShmchChannel* self);
+void shmch_channel_set_io_thread (ShmchChannel* self, gboolean value);
+guint shmch_channel_get_stream_chunk_size (ShmchChannel* self);
+void shmch_channel_set_stream_chunk_size (ShmchChannel* self, guint value);
+gboolean shmch_channel_get_defer_stream_credit (ShmchChannel* self);
+void shmch_channel_set_defer_stream_credit (ShmchChannel* self, gboolean value);
+ShmchShmemFlags shmch_channel_get_shmem_flags (ShmchChannel* self);
+void shmch_channel_set_shmem_flags (ShmchChannel* self, ShmchShmemFlags value);
+ShmchShmemFlags shmch_channel_get_segment_shmem_flags (ShmchChannel* self);
+void shmch_channel_set_segment_shmem_flags (ShmchChannel* self, ShmchShmemFlags value);
+
+gpointer shmch_outgoing_stream_ref (gpointer instance);
+void shmch_outgoing_stream_unref (gpointer instance);
+gint shmch_outgoing_stream_write (ShmchOutgoingStream* self, guint8* data, int data_length1, GError** error);
+void shmch_outgoing_stream_finish (ShmchOutgoingStream* self, GError** error);
+void shmch_outgoing_stream_abort (ShmchOutgoingStream* self, GError** error);
+guint shmch_outgoing_stream_get_id (ShmchOutgoingStream* self);
+gboolean shmch_outgoing_stream_get_finished (ShmchOutgoingStream* self);
+
+gpointer shmch_channel_server_ref (gpointer instance);
+void shmch_channel_server_unref (gpointer instance);
+ShmchChannelServer* shmch_channel_server_new (const gchar* name, guint max_clients);
+void shmch_channel_server_open (ShmchChannelServer* self, GError** error);
+void shmch_channel_server_close (ShmchChannelServer* self, GError** error);
+ShmchChannel* shmch_channel_server_get_client (ShmchChannelServer* self, guint index, GError** error);
+gint shmch_channel_server_get_wakeup_fd (ShmchChannelServer* self, GError** error);
+gint shmch_channel_server_dup_wakeup_fd (ShmchChannelServer* self, GError** error);
+gboolean shmch_channel_server_wait_for_data (ShmchChannelServer* self, gint timeout, GError** error);
+gint shmch_channel_server_get_next_timeout (ShmchChannelServer* self);
+void shmch_channel_server_set_request_callback (ShmchChannelServer* self, ShmchClientRequestCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
+void shmch_channel_server_set_notification_callback (ShmchChannelServer* self, ShmchClientDataCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
+void shmch_channel_server_set_client_callback (ShmchChannelServer* self, ShmchClientStateCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
+void shmch_channel_server_notify (ShmchChannelServer* self, guint client, guint8* data, int data_length1, GError** error);
+guint shmch_channel_server_request (ShmchChannelServer* self, guint client, guint8* data, int data_length1, ShmchDataCallback response_callback, void* response_callback_target, GDestroyNotify response_callback_target_destroy_notify, GError** error);
+gboolean shmch_channel_server_send_receive (ShmchChannelServer* self, GError** error);
+guint shmch_channel_server_collect_dead_clients (ShmchChannelServer* self, GError** error);
+const gchar* shmch_channel_server_get_name (ShmchChannelServer* self);
+guint shmch_channel_server_get_max_clients (ShmchChannelServer* self);
+guint shmch_channel_server_get_n_clients (ShmchChannelServer* self);
+gboolean shmch_channel_server_get_is_opened (ShmchChannelServer* self);
+guint shmch_channel_server_get_arena_size (ShmchChannelServer* self);
+void shmch_channel_server_set_arena_size (ShmchChannelServer* self, guint value);
+guint shmch_channel_server_get_pool_size (ShmchChannelServer* self);
+void shmch_channel_server_set_pool_size (ShmchChannelServer* self, guint value);
+guint shmch_channel_server_get_slot_capacity (ShmchChannelServer* self);
+void shmch_channel_server_set_slot_capacity (ShmchChannelServer* self, guint value);
+
+gpointer shmch_channel_group_ref (gpointer instance);
+void shmch_channel_group_unref (gpointer instance);
+ShmchChannelGroup* shmch_channel_group_new (GError** error);
+gboolean shmch_channel_group_add (ShmchChannelGroup* self, ShmchChannel* channel, GError** error);
+gboolean shmch_channel_group_remove (ShmchChannelGroup* self, ShmchChannel* channel);
+gboolean shmch_channel_group_contains (ShmchChannelGroup* self, ShmchChannel* channel);
+void shmch_channel_group_set_serviced_callback (ShmchChannelGroup* self, ShmchChannelCallback callback, void* callback_target, GDestroyNotify callback_target_destroy_notify);
+gint shmch_channel_group_get_wakeup_fd (ShmchChannelGroup* self);
+gint shmch_channel_group_get_next_timeout (ShmchChannelGroup* self);
+gboolean shmch_channel_group_wait_for_data (ShmchChannelGroup* self, gint timeout);
+guint shmch_channel_group_send_receive (ShmchChannelGroup* self, GError** error);
+guint shmch_channel_group_get_size (ShmchChannelGroup* self);
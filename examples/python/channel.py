@@ -26,12 +26,12 @@ async def main(args: List[str]) -> int:
         channel.set_request_callback(_request_received)
         channel.open()
 
-        task = asyncio.ensure_future(channel.send_receive())
+        channel.start()
         channel.notify(message.encode())
         print("Request sent:", message)
         data = await channel.request(message.encode())
         print("%s: Response received: %s" % (mode, data.decode()))
-        await task
+        await channel.wait_stopped()
         channel.close()
         return 0
     else:
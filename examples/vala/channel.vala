@@ -25,8 +25,8 @@ int main(string[] args) {
         stdout.printf("Request sent: %s\n", message);
         channel.notify(message.data);
         while (true) {
+            channel.wait_for_data(-1);
             channel.send_receive(true);
-            Thread.usleep(100000);
         }
         channel.close();
         return 0;
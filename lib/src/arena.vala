@@ -0,0 +1,232 @@
+/* This file contains a ring allocator for payloads stored in a shared memory arena.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * A ring allocator for payloads stored in a region of shared memory.
+ *
+ * Each direction of a {@link Channel} has its own arena. The sender allocates payloads at the head of the ring
+ * and the receiver releases them in the same order by advancing the shared tail position. Positions grow
+ * monotonically (wrapping around `uint.MAX`) and the capacity is a power of two, so that a position maps to
+ * an offset in the buffer by a simple mask.
+ */
+private class Arena {
+    /**
+     * The alignment of allocated payloads.
+     */
+    private const uint ALIGNMENT = 8;
+    /**
+     * The beginning of the arena buffer.
+     */
+    private uint8* buffer;
+    /**
+     * The capacity of the arena buffer. It is a power of two.
+     */
+    private uint capacity;
+    /**
+     * The shared position up to which payloads have been released by the receiver. Accessed atomically.
+     */
+    private uint* tail;
+    /**
+     * The position of the next allocation. Used only by the sender.
+     */
+    private uint head;
+    /**
+     * Payloads waiting for release because a payload before them has been retained. Used only by the receiver.
+     */
+    private Queue<ArenaSpan> pending = new Queue<ArenaSpan>();
+
+    /**
+     * Create a new arena view.
+     *
+     * @param buffer      The beginning of the arena buffer.
+     * @param capacity    The capacity of the arena buffer. It must be a power of two.
+     * @param tail        The shared release position.
+     */
+    public Arena(void* buffer, uint capacity, uint* tail) {
+        assert(capacity > 0 && (capacity & (capacity - 1)) == 0);
+        this.buffer = (uint8*) buffer;
+        this.capacity = capacity;
+        this.tail = tail;
+        this.head = atomic_uint_get(tail);
+    }
+
+    /**
+     * Allocate space for a payload.
+     *
+     * A payload is never split: if it does not fit to the end of the buffer, the remaining space is skipped
+     * and the payload is placed at the beginning of the buffer.
+     *
+     * @param size        The payload size.
+     * @param position    The position of the allocated payload.
+     * @return `true` on success, `false` if there is not enough free space.
+     */
+    public bool allocate(uint size, out uint position) {
+        position = 0;
+        var aligned = align(size);
+        if (aligned > capacity) {
+            return false;
+        }
+        var start = head;
+        var offset = start & (capacity - 1);
+        if (offset + aligned > capacity) {
+            start += capacity - offset;
+        }
+        if (start + aligned - atomic_uint_get(tail) > capacity) {
+            return false;
+        }
+        head = start + aligned;
+        position = start;
+        return true;
+    }
+
+    /**
+     * Undo the last allocation.
+     *
+     * @param position    The position of the last allocated payload.
+     */
+    public void rollback(uint position) {
+        head = position;
+    }
+
+    /**
+     * Get the pointer to a payload.
+     *
+     * @param position    The position of the payload.
+     * @return The pointer to the payload.
+     */
+    public uint8* get_pointer(uint position) {
+        return buffer + (position & (capacity - 1));
+    }
+
+    /**
+     * Get a payload as a binary buffer.
+     *
+     * @param position    The position of the payload.
+     * @param size        The payload size.
+     * @return The payload buffer.
+     */
+    public unowned uint8[] get_buffer(uint position, uint size) {
+        unowned uint8[] data = (uint8[]) get_pointer(position);
+        data.length = (int) size;
+        return data;
+    }
+
+    /**
+     * Release a payload.
+     *
+     * Payloads must be released or retained in the order they were allocated. If a payload before this one
+     * is still retained, the release is postponed until that payload is released too.
+     *
+     * @param position    The position of the payload.
+     * @param size        The payload size.
+     */
+    public void release(uint position, uint size) {
+        if (pending.is_empty()) {
+            atomic_uint_set(tail, position + align(size));
+        } else {
+            pending.push_tail(new ArenaSpan(position, position + align(size), true));
+        }
+    }
+
+    /**
+     * Retain a payload instead of releasing it.
+     *
+     * The payload and all payloads after it stay reserved until it is released with {@link release_retained}.
+     *
+     * @param position    The position of the payload.
+     * @param size        The payload size.
+     */
+    public void retain(uint position, uint size) {
+        pending.push_tail(new ArenaSpan(position, position + align(size), false));
+    }
+
+    /**
+     * Release a payload retained with {@link retain}.
+     *
+     * @param position    The position of the payload.
+     */
+    public void release_retained(uint position) {
+        foreach (unowned ArenaSpan span in pending.head) {
+            if (span.position == position) {
+                span.released = true;
+                break;
+            }
+        }
+        var released = false;
+        uint end = 0;
+        unowned ArenaSpan? span = null;
+        while ((span = pending.peek_head()) != null && span.released) {
+            end = span.end;
+            released = true;
+            pending.pop_head();
+        }
+        if (released) {
+            atomic_uint_set(tail, end);
+        }
+    }
+
+    /**
+     * Round the size up to {@link ALIGNMENT}.
+     *
+     * @param size    The size to align.
+     * @return The aligned size.
+     */
+    private inline uint align(uint size) {
+        return (size + ALIGNMENT - 1) & ~(ALIGNMENT - 1);
+    }
+}
+
+/**
+ * A payload of an {@link Arena} waiting for release.
+ */
+private class ArenaSpan {
+    /**
+     * The position of the payload.
+     */
+    public uint position;
+    /**
+     * The position right after the payload.
+     */
+    public uint end;
+    /**
+     * Whether the payload has been released.
+     */
+    public bool released;
+
+    /**
+     * Create a new payload span.
+     *
+     * @param position    The position of the payload.
+     * @param end         The position right after the payload.
+     * @param released    Whether the payload has been released.
+     */
+    public ArenaSpan(uint position, uint end, bool released) {
+        this.position = position;
+        this.end = end;
+        this.released = released;
+    }
+}
+
+} // namespace Shmch
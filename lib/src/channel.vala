@@ -1,4 +1,4 @@
-/* This file contains an implementation of a binary message channel using POSIX shared memory and semaphores.
+/* This file contains an implementation of a binary message channel using POSIX shared memory and lock-free rings.
  * It supports server/client mode, requests with corresponding responses and notifications (without a response).
  *
  * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
@@ -24,7 +24,7 @@
 namespace Shmch {
 
 /**
- * A binary message channel using POSIX shared memory and semaphores. It supports server
+ * A binary message channel using POSIX shared memory and lock-free rings. It supports server
  * ({@link Mode.SERVER})/client ({@link Mode.CLIENT}) mode, requests ({@link request}, {@link set_request_callback})
  * with corresponding responses and notifications without a response ({@link set_notification_callback}).
  */
@@ -41,6 +41,162 @@ public class Channel {
      * Whether channel is open.
      */
     public bool is_opened {get; private set; default = false;}
+    /**
+     * The capacity of the payload arena for each direction in bytes.
+     *
+     * Payloads that fit into the arena are stored there instead of creating a new shared memory segment
+     * for each packet. Larger payloads fall back to dedicated segments. The capacity is rounded up to a power of
+     * two and it must not exceed 1 GiB. Zero disables the arena.
+     *
+     * The server sets the capacity before the channel is {@link open}ed. The client uses the capacity chosen by
+     * the server instead and updates this property on {@link open}.
+     */
+    public uint arena_size {get; set; default = 0;}
+    /**
+     * The number of slots in the ring of each direction.
+     *
+     * The server sets the capacity before the channel is {@link open}ed. It is rounded up to a power of two and
+     * it must not exceed 65536. Zero means the default capacity of 16 slots. The server stores the capacity in
+     * the header of the shared memory.
+     *
+     * The client reads the capacity from the header on {@link open} and updates this property. If the client has set
+     * a non-zero capacity which does not match the one of the server, {@link open} fails.
+     */
+    public uint slot_capacity {get; set; default = 0;}
+    /**
+     * The maximal total size of pooled payload segments in bytes.
+     *
+     * Payloads which do not fit into the payload arena are stored in shared memory segments. If the pool size
+     * is greater than zero, these segments are recycled for payloads of the same power-of-two size class instead of
+     * being created and unlinked for each packet, and the least recently used idle segments are evicted to keep
+     * the total size within the limit. The same limit applies to the cache of mapped incoming segments.
+     * Zero disables pooling. It must be set before the channel is {@link open}ed.
+     */
+    public uint pool_size {get; set; default = 0;}
+    /**
+     * Whether to trace latencies of messages.
+     *
+     * If tracing is enabled, outgoing packets are stamped with the time they are queued and published and
+     * latencies of incoming packets are recorded in histograms, see {@link get_latency_histogram}. The sender must
+     * trace too for the {@link LatencyStage.QUEUED}, {@link LatencyStage.IN_RING} and {@link LatencyStage.TOTAL}
+     * stages to be recorded. If tracing is disabled, the clock is not read at all.
+     */
+    public bool tracing {get; set; default = false;}
+    /**
+     * The timeout of outgoing requests in milliseconds.
+     *
+     * A request which has not been responded before its deadline is removed from the table of pending requests,
+     * its response callback is released and the callback set by {@link set_timeout_callback} is called. A late
+     * response is then ignored. Deadlines are checked in {@link send_receive} and {@link wait_for_data} wakes up
+     * when the nearest deadline passes. The timeout applies to requests sent after it is set. Zero means no timeout.
+     */
+    public uint request_timeout {get; set; default = 0;}
+    /**
+     * The maximal number of pending outgoing requests.
+     *
+     * If there are too many requests waiting for a response, sending another request fails with
+     * {@link Error.RESOURCE_LIMIT}. Zero means no limit.
+     */
+    public uint max_pending_requests {get; set; default = 0;}
+    /**
+     * The maximal number of incoming packets in flight.
+     *
+     * The channel grants the other side credit for this many packets which are queued, published or being processed
+     * but not yet consumed by {@link send_receive}. Sending more messages fails with {@link Error.WOULD_BLOCK} until
+     * this side catches up, see {@link has_credit} and {@link wait_for_credit}, so that a slow receiver bounds
+     * the memory used by the sender. Responses are never refused but they take credit too. Zero means no limit.
+     * It can be changed even after the channel is {@link open}ed.
+     */
+    public uint receive_window_packets {
+        get {
+            return _receive_window_packets;
+        }
+        set {
+            _receive_window_packets = value;
+            if (incoming_credit != null) {
+                atomic_uint_set(&incoming_credit->window_packets, value);
+            }
+        }
+    }
+    private uint _receive_window_packets = 0;
+    /**
+     * The maximal size of incoming payloads in flight in bytes.
+     *
+     * Same as {@link receive_window_packets} but for the total size of payloads. A single larger payload is
+     * accepted if nothing else is in flight, but a batch must fit into the window. Zero means no limit. It can be
+     * changed even after the channel is {@link open}ed.
+     */
+    public uint receive_window_bytes {
+        get {
+            return _receive_window_bytes;
+        }
+        set {
+            _receive_window_bytes = value;
+            if (incoming_credit != null) {
+                atomic_uint_set(&incoming_credit->window_bytes, value);
+            }
+        }
+    }
+    private uint _receive_window_bytes = 0;
+    /**
+     * Whether to run the I/O of the channel in a dedicated thread.
+     *
+     * The I/O thread blocks until the other side rings, publishes outgoing packets and reads incoming packets
+     * even while the thread which uses the channel is busy. {@link get_wakeup_fd} then becomes readable when
+     * the I/O thread has received packets and {@link send_receive} only dispatches them to callbacks. All other
+     * methods must still be called from a single thread. It must be set before the channel is {@link open}ed.
+     */
+    public bool io_thread {get; set; default = false;}
+    /**
+     * The maximal size of a chunk of an outgoing stream in bytes.
+     *
+     * {@link OutgoingStream.write} splits data into chunks of this size. If chunks fit into the payload arena
+     * or the segment pool, see {@link arena_size} and {@link pool_size}, they reuse the same memory over and over,
+     * and {@link receive_window_bytes} of the other side bounds how much of it is in flight.
+     */
+    public uint stream_chunk_size {get; set; default = 64 * 1024;}
+    /**
+     * Whether the credit for incoming stream chunks is returned by {@link consume_stream_chunk}.
+     *
+     * By default, the credit is returned once the stream callback returns. If this is enabled, the chunks which have
+     * been queued by the stream callback but not yet consumed count against {@link receive_window_packets} and
+     * {@link receive_window_bytes}, so that a slow consumer eventually stops the sender. Without a window, the
+     * queued chunks are not bounded at all, so the bindings set one when a stream callback is installed.
+     */
+    public bool defer_stream_credit {get; set; default = false;}
+    /**
+     * The options of the mapping of the shared memory for the header, rings and payload arenas.
+     *
+     * {@link ShmemFlags.MLOCK} keeps the hot control region resident. It applies to the mapping of this side only
+     * and must be set before the channel is {@link open}ed. {@link ShmemFlags.GROWABLE} is not supported.
+     */
+    public ShmemFlags shmem_flags {get; set; default = ShmemFlags.NONE;}
+    /**
+     * The options of the mappings of payload segments, both outgoing and incoming, including pooled ones.
+     *
+     * {@link ShmemFlags.POPULATE} replaces a page fault on the first touch of every page of a large payload by
+     * a single system call. It must be set before the channel is {@link open}ed. {@link ShmemFlags.GROWABLE} is not
+     * supported.
+     */
+    public ShmemFlags segment_shmem_flags {get; set; default = ShmemFlags.NONE;}
+    /**
+     * The name of the {@link ChannelServer} this server channel belongs to, or `null`.
+     *
+     * It is set by the {@link ChannelServer} before the channel is opened. The channel then shares the doorbell of
+     * the server, which it neither creates nor drains.
+     */
+    internal string? hub_name = null;
+    /**
+     * The name of the shared memory and other resources of the channel.
+     *
+     * It is the same as {@link name} unless the channel is a client of a {@link ChannelServer}, which uses
+     * the channel of its registration instead.
+     */
+    private string resource_name;
+    /**
+     * The registration of the client in the registry of a {@link ChannelServer} or `null`.
+     */
+    private ClientRegistration? registration = null;
     /**
      * Incoming packets.
      */
@@ -50,13 +206,73 @@ public class Channel {
      */
     private Queue<Packet?> outgoing_queue = new Queue<Packet?>();
     /**
-     * Shared memory for slots.
+     * Shared memory for the header, rings and payload arenas.
      */
     private Shmem? shmem = null;
     /**
-     * Slots for packets.
+     * The header of the shared memory.
+     */
+    private unowned ChannelHeader? header = null;
+    /**
+     * The credit granted by the other side for outgoing packets.
+     */
+    private CreditHeader* outgoing_credit = null;
+    /**
+     * The credit granted to the other side for incoming packets.
+     */
+    private CreditHeader* incoming_credit = null;
+    /**
+     * The number of queued outgoing packets, wrapping around `uint.MAX`.
+     */
+    private uint sent_packets = 0;
+    /**
+     * The size of queued outgoing payloads, wrapping around `uint.MAX`.
+     */
+    private uint sent_bytes = 0;
+    /**
+     * The number of received packets, wrapping around `uint.MAX`.
+     */
+    private uint received_packets = 0;
+    /**
+     * The size of received payloads, wrapping around `uint.MAX`.
+     */
+    private uint received_bytes = 0;
+    /**
+     * The ring of outgoing packets.
+     */
+    private Ring? outgoing_ring = null;
+    /**
+     * The ring of incoming packets.
+     */
+    private Ring? incoming_ring = null;
+    /**
+     * Payload arena for outgoing packets.
+     */
+    private Arena? outgoing_arena = null;
+    /**
+     * Payload arena for incoming packets.
+     */
+    private Arena? incoming_arena = null;
+    /**
+     * The pool of segments for outgoing payloads.
+     */
+    private SegmentPool? outgoing_pool = null;
+    /**
+     * The cache of mapped segments of incoming payloads.
+     */
+    private SegmentCache? incoming_cache = null;
+    /**
+     * The doorbell rung by the other side when it has published packets.
+     */
+    private Doorbell? incoming_doorbell = null;
+    /**
+     * The doorbell to ring when this side has published packets.
+     */
+    private Doorbell? outgoing_doorbell = null;
+    /**
+     * The dedicated I/O thread, see {@link io_thread}.
      */
-    private unowned Slots? slots = null;
+    private IoThread? io = null;
     /**
      * The id of the last outgoing request.
      */
@@ -65,6 +281,14 @@ public class Channel {
      * The id of the last outgoing notification.
      */
     private uint last_notification_id = 0;
+    /**
+     * The id of the last outgoing stream.
+     */
+    private uint last_stream_id = 0;
+    /**
+     * The serial number of the last stream chunk or partial response stored in a dedicated shared memory segment.
+     */
+    private uint last_frame_segment = 0;
     /**
      * The callback to process incoming requests.
      */
@@ -73,11 +297,64 @@ public class Channel {
      * The callback to process incoming notifications.
      */
     private DataCallback? notification_callback = null;
+    /**
+     * The callback to process batches of incoming messages.
+     */
+    private BatchCallback? batch_callback = null;
+    /**
+     * The callback to be called when a request has not been responded before its deadline.
+     */
+    private TimeoutCallback? timeout_callback = null;
+    /**
+     * The callback to process incoming streams.
+     */
+    private StreamCallback? stream_callback = null;
+    /**
+     * Runtime statistics.
+     */
+    private Stats stats = Stats();
+    /**
+     * Histograms of latencies of incoming messages indexed by {@link LatencyStage}, created once they are needed.
+     */
+    private LatencyHistogram[]? latency_histograms = null;
+    /**
+     * The pending reservation in the outgoing payload arena. No other payloads are allocated in the arena
+     * until it is finished, so that payloads are published in the order of allocation.
+     */
+    private Reservation? arena_reservation = null;
+    /**
+     * The id of the last reservation in a dedicated shared memory segment.
+     */
+    private uint last_reservation_id = 0;
+    /**
+     * The packet whose payload is being passed to a callback.
+     */
+    private unowned Packet? dispatched_packet = null;
+    /**
+     * The shared memory segment of the payload being passed to a callback.
+     */
+    private unowned Shmem? dispatched_payload = null;
+    /**
+     * The data of the payload being passed to a callback.
+     */
+    private unowned uint8[]? dispatched_data = null;
+    /**
+     * The lease of the payload being passed to a callback.
+     */
+    private Lease? dispatched_lease = null;
+    /**
+     * The number of leases which have not been released yet.
+     */
+    private uint n_leases = 0;
     /**
      * The table to map outgoing requests with incoming responses by their id (cast to a pointer).
      */
     private HashTable<void*, OutgoingRequest> outgoing_requests = new HashTable<void*, OutgoingRequest>(
         null, null);
+    /**
+     * The deadlines of outgoing requests, see {@link request_timeout}.
+     */
+    private DeadlineQueue deadlines = new DeadlineQueue();
     /**
      * Create a new closed binary message channel.
      *
@@ -88,6 +365,7 @@ public class Channel {
     public Channel(string name, Mode mode){
         this.name = name;
         this.mode = mode;
+        this.resource_name = name;
     }
 
     ~Channel() {
@@ -101,225 +379,1169 @@ public class Channel {
     /**
      * Open the channel.
      *
-     * @throws Error on failure: {@link Error.ALREADY_OPEN}, {@link Error.INVALID_NAME}, {@link Error.SHM_OPEN_FAILED}.
+     * The server creates the shared memory with the chosen {@link slot_capacity} and {@link arena_size} stored in
+     * its header. The client reads them from the header and rejects the channel if it is not compatible.
+     *
+     * If the name belongs to a {@link ChannelServer}, the client claims a free entry of its registry and uses
+     * the channel of that entry. Opening fails with {@link Error.RESOURCE_LIMIT} if there is no free entry.
+     *
+     * @throws Error on failure: {@link Error.ALREADY_OPEN}, {@link Error.INVALID_NAME}, {@link Error.INVALID_SIZE},
+     *     {@link Error.SHM_OPEN_FAILED}, {@link Error.INCOMPATIBLE}, {@link Error.RESOURCE_LIMIT}.
      */
     public void open() throws Error {
         if (is_opened) {
             throw new Error.ALREADY_OPEN("The channel '%s' has already been opened.", name);
         }
+        // The header of a growable region would shift the layout, which the other side does not expect.
+        if (ShmemFlags.GROWABLE in shmem_flags || ShmemFlags.GROWABLE in segment_shmem_flags) {
+            throw new Error.INCOMPATIBLE("The channel '%s' does not support growable shared memory.", name);
+        }
         switch (mode) {
         case Mode.SERVER:
-            shmem = new Shmem(name, sizeof(Slots), true, true);
-            slots = (Slots?) shmem.pointer;
-            posix_die_if(slots.semaphore.init(1, 1) < 0, SHM_OF,
-                "Failed to init a semaphore for shmem '%s'.".printf(name));
+            create_shmem();
             break;
         case Mode.CLIENT:
-            shmem = new Shmem(name, sizeof(Slots), false, false);
-            slots = (Slots?) shmem.pointer;
+            open_shmem();
             break;
         default:
             assert_not_reached();
         }
+        uint8* base = (uint8*) shmem.pointer;
+        Packet* server_packets = (Packet*) (base + get_packets_offset());
+        Packet* client_packets = server_packets + slot_capacity;
+        var server_ring = new Ring(&header.server_ring, server_packets, slot_capacity);
+        var client_ring = new Ring(&header.client_ring, client_packets, slot_capacity);
+        outgoing_ring = mode == Mode.SERVER ? server_ring : client_ring;
+        incoming_ring = mode == Mode.SERVER ? client_ring : server_ring;
+        outgoing_credit = mode == Mode.SERVER ? &header.server_credit : &header.client_credit;
+        incoming_credit = mode == Mode.SERVER ? &header.client_credit : &header.server_credit;
+        atomic_uint_set(&incoming_credit->window_packets, receive_window_packets);
+        atomic_uint_set(&incoming_credit->window_bytes, receive_window_bytes);
+        // Nothing is in flight, even if the other side has already been connected before.
+        sent_packets = atomic_uint_get(&outgoing_credit->consumed_packets);
+        sent_bytes = atomic_uint_get(&outgoing_credit->consumed_bytes);
+        received_packets = atomic_uint_get(&incoming_credit->consumed_packets);
+        received_bytes = atomic_uint_get(&incoming_credit->consumed_bytes);
+        if (arena_size > 0) {
+            uint8* server_arena = base + get_arena_offset(slot_capacity);
+            uint8* client_arena = server_arena + arena_size;
+            if (mode == Mode.SERVER) {
+                outgoing_arena = new Arena(server_arena, arena_size, &header.server_arena_tail);
+                incoming_arena = new Arena(client_arena, arena_size, &header.client_arena_tail);
+            } else {
+                outgoing_arena = new Arena(client_arena, arena_size, &header.client_arena_tail);
+                incoming_arena = new Arena(server_arena, arena_size, &header.server_arena_tail);
+            }
+        }
+        try {
+            var server = mode == Mode.SERVER;
+            var hub = hub_name ?? (registration != null ? name : null);
+            Doorbell to_server;
+            if (hub != null) {
+                // All clients of a ChannelServer ring the same doorbell, which is owned by the server.
+                to_server = new Doorbell(Doorbell.get_path(hub, "to-server"), false, false);
+            } else {
+                to_server = new Doorbell(Doorbell.get_path(resource_name, "to-server"), server, server);
+            }
+            var to_client = new Doorbell(Doorbell.get_path(resource_name, "to-client"), server, server);
+            incoming_doorbell = server ? to_server : to_client;
+            outgoing_doorbell = server ? to_client : to_server;
+        } catch (Error e) {
+            outgoing_ring = null;
+            incoming_ring = null;
+            outgoing_credit = null;
+            incoming_credit = null;
+            outgoing_arena = null;
+            incoming_arena = null;
+            header = null;
+            shmem.close();
+            shmem = null;
+            leave_registration();
+            throw e;
+        }
+        if (pool_size > 0) {
+            var prefix = "%s-%s".printf(resource_name, mode == Mode.SERVER ? "s" : "c");
+            outgoing_pool = new SegmentPool(prefix, pool_size, segment_shmem_flags);
+            incoming_cache = new SegmentCache(pool_size, segment_shmem_flags);
+        }
         is_opened = true;
+        if (io_thread) {
+            try {
+                var path = Doorbell.get_path(resource_name, mode == Mode.SERVER ? "server-io" : "client-io");
+                io = new IoThread(path, incoming_ring, outgoing_ring, incoming_doorbell, outgoing_doorbell, tracing);
+            } catch (Error e) {
+                close();
+                throw e;
+            }
+        }
+        if (registration != null) {
+            // Let the server know about the new client.
+            outgoing_doorbell.ring();
+        }
     }
 
     /**
-     * Set callback to be called to handle incoming requests.
-     *
-     * The data of the request must be used immediately or a copy must be made.
-     * The callback is executed in the thread the {@link send_receive} method is called in.
+     * Create the shared memory of the channel and initialize its header.
      *
-     * @param callback    The request callback.
+     * @throws Error on failure: {@link Error.INVALID_NAME}, {@link Error.INVALID_SIZE},
+     *     {@link Error.SHM_OPEN_FAILED}.
      */
-    public void set_request_callback(owned RequestCallback callback) {
-        this.request_callback = (owned) callback;
+    private void create_shmem() throws Error {
+        var capacity = slot_capacity == 0 ? N_SLOTS : slot_capacity;
+        if (capacity > MAX_SLOT_CAPACITY) {
+            throw new Error.INVALID_SIZE("The slot capacity %u of channel '%s' is too large.", capacity, name);
+        }
+        if (arena_size > MAX_ARENA_SIZE) {
+            throw new Error.INVALID_SIZE("The arena size %u of channel '%s' is too large.", arena_size, name);
+        }
+        slot_capacity = round_up_to_power_of_two(capacity);
+        arena_size = round_up_to_power_of_two(arena_size);
+        var size = get_arena_offset(slot_capacity) + 2 * (ulong) arena_size;
+        shmem = new Shmem.with_flags(resource_name, size, true, true, shmem_flags);
+        header = (ChannelHeader?) shmem.pointer;
+        header.version = PROTOCOL_VERSION;
+        header.slot_capacity = slot_capacity;
+        header.arena_size = arena_size;
+        atomic_uint_store(&header.magic, PROTOCOL_MAGIC, ATOMIC_RELEASE);
     }
 
     /**
-     * Set callback to be called to handle incoming notification.
-     *
-     * The data of the notification must be used immediately or a copy must be made.
-     * The callback is executed in the thread the {@link send_receive} method is called in.
+     * Open the shared memory of the channel and validate its header.
      *
-     * @param callback    The notification callback.
+     * @throws Error on failure: {@link Error.INVALID_NAME}, {@link Error.SHM_OPEN_FAILED},
+     *     {@link Error.INCOMPATIBLE}.
      */
-    public void set_notification_callback(owned DataCallback callback) {
-        this.notification_callback = (owned) callback;
+    private void open_shmem() throws Error {
+        shmem = new Shmem.with_flags(name, 0, false, false, shmem_flags);
+        if (ClientRegistration.is_registry(shmem)) {
+            var registry = (owned) shmem;
+            registration = new ClientRegistration(name, registry);
+            resource_name = registration.channel_name;
+            try {
+                shmem = new Shmem.with_flags(resource_name, 0, false, false, shmem_flags);
+            } catch (Error e) {
+                leave_registration();
+                throw e;
+            }
+        }
+        try {
+            if (shmem.size < sizeof(ChannelHeader)) {
+                throw new Error.INCOMPATIBLE("The shmem of channel '%s' is too small.", name);
+            }
+            header = (ChannelHeader?) shmem.pointer;
+            if (atomic_uint_load(&header.magic, ATOMIC_ACQUIRE) != PROTOCOL_MAGIC) {
+                throw new Error.INCOMPATIBLE("The shmem '%s' is not an initialized channel.", name);
+            }
+            if (header.version != PROTOCOL_VERSION) {
+                throw new Error.INCOMPATIBLE("The channel '%s' uses protocol version %u but %u is supported.",
+                    name, header.version, PROTOCOL_VERSION);
+            }
+            var capacity = header.slot_capacity;
+            var arena = header.arena_size;
+            if (capacity == 0 || capacity > MAX_SLOT_CAPACITY || round_up_to_power_of_two(capacity) != capacity
+            || arena > MAX_ARENA_SIZE || round_up_to_power_of_two(arena) != arena
+            || shmem.size < get_arena_offset(capacity) + 2 * (ulong) arena) {
+                throw new Error.INCOMPATIBLE("The header of channel '%s' is corrupted.", name);
+            }
+            if (slot_capacity != 0 && slot_capacity != capacity) {
+                throw new Error.INCOMPATIBLE("The slot capacity %u of channel '%s' does not match the requested %u.",
+                    capacity, name, slot_capacity);
+            }
+            slot_capacity = capacity;
+            arena_size = arena;
+        } catch (Error e) {
+            header = null;
+            shmem.close();
+            shmem = null;
+            leave_registration();
+            throw e;
+        }
     }
 
     /**
-     * Send a request.
+     * Leave the registry of a {@link ChannelServer} if the client has joined it.
+     */
+    private void leave_registration() {
+        if (registration != null) {
+            registration.leave();
+            registration = null;
+            resource_name = name;
+        }
+    }
+
+    /**
+     * Get the offset of ring slots in the shared memory.
      *
-     * The callback is executed in the thread the {@link send_receive} method is called in.
+     * @return The offset in bytes.
+     */
+    private static ulong get_packets_offset() {
+        return align_size(sizeof(ChannelHeader), 64);
+    }
+
+    /**
+     * Get the offset of payload arenas in the shared memory.
      *
-     * @param data                 The request data.
-     * @param response_callback    The callback to be called when a response arrives.
-     * @throws Error on failure: {@link Error.RESOURCE_LIMIT},  {@link Error.SHM_OPEN_FAILED},
-     *     {@link Error.SHM_CLOSE_FAILED}.
+     * @param capacity    The number of slots in each ring.
+     * @return The offset in bytes.
      */
-    public void request(uint8[] data, owned DataCallback response_callback) throws Error {
-        bool wrapped = false;
-        uint id = 0;
-        do {
-            id = ++last_request_id;
-            if (id == 0) { // uint.MAX + 1 wraps to 0
-                if (wrapped) {
-                    throw new Error.RESOURCE_LIMIT("Too many pending outgoing requests.");
-                } else {
-                    wrapped = true;
-                    id = ++last_request_id;
-                }
-            }
-        } while (outgoing_requests.contains(id.to_pointer()));
-        outgoing_requests[id.to_pointer()] = new OutgoingRequest(id, (owned) response_callback);
-        var flag = mode == Mode.SERVER ? Flag.SERVER_REQUEST : Flag.CLIENT_REQUEST;
-        push_outgoing_data(flag, id, data);
+    private static ulong get_arena_offset(uint capacity) {
+        return align_size(get_packets_offset() + 2 * (ulong) capacity * sizeof(Packet), 64);
     }
 
     /**
-     * Send a notification.
+     * Get the file descriptor to watch for incoming data.
      *
-     * @param data    The notification data.
-     * @throws Error on failure: {@link Error.RESOURCE_LIMIT}, {@link Error.SHM_OPEN_FAILED},
-     *     {@link Error.SHM_CLOSE_FAILED}.
+     * The file descriptor becomes readable when the other side has published packets or there are outgoing packets
+     * waiting to be sent. Then call {@link send_receive}, which also consumes the readiness. The file descriptor is
+     * owned by the channel and it is valid until the channel is {@link close}d. Use {@link dup_wakeup_fd} if the event
+     * loop takes ownership of the file descriptor.
+     *
+     * @return The file descriptor.
+     * @throws Error on failure: {@link Error.CLOSED}.
      */
-    public void notify(uint8[] data) throws Error {
-        // TODO: How to avoid hypothetical overwriting of notifications with the same id?
-        var id = ++last_notification_id;  // uint.MAX + 1 wraps to 0
-        var flag = mode == Mode.SERVER ? Flag.SERVER_NOTIFICATION : Flag.CLIENT_NOTIFICATION;
-        push_outgoing_data(flag, id, data);
+    public int get_wakeup_fd() throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel '%s' is closed.", name);
+        }
+        return io != null ? io.wakeup.fd : incoming_doorbell.fd;
     }
 
     /**
-     * Queue outgoing packets.
+     * Get a duplicate of the file descriptor to watch for incoming data.
      *
-     * @param flag    Packet flag.
-     * @param id      Packet id.
-     * @param data    Packet data.
-     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     * Same as {@link get_wakeup_fd} but the caller owns the returned file descriptor and is responsible to close it.
+     *
+     * @return The file descriptor.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.SHM_OPEN_FAILED}.
      */
-    private void push_outgoing_data(Flag flag, uint id, uint8[] data) throws Error {
-        var name = "%s-%d-%u".printf(this.name, (int) flag, id);
-        var size = data.length;
-        var payload = new Shmem(name, size, true, false);
-        Posix.memcpy(payload.pointer, data, size);
-        payload.close();
-        outgoing_queue.push_tail(Packet(flag, id, name));
+    public int dup_wakeup_fd() throws Error {
+        var fd = Posix.dup(get_wakeup_fd());
+        posix_die_if(fd < 0, SHM_OF, "Failed to duplicate the wakeup fd of channel '%s'.".printf(name));
+        return fd;
     }
 
     /**
-     * Send and receive messages.
+     * Wait until there is any work for {@link send_receive}.
      *
-     * This method does the heavy lifting and should be called periodically, e. g. as an idle callback in an event loop.
-     * Otherwise, no messages are sent nor received.
+     * The wait ends early when the deadline of a pending request passes, see {@link request_timeout}.
      *
-     * @param wait    Whether to wait if the channel is currently locked by the other side. It may block then.
-     * @return `True` if any data have been received or sent.
-     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}, {@link Error.CLOSED}.
+     * @param timeout    The timeout in milliseconds. A negative value means an infinite timeout.
+     * @return `true` if there is any work, `false` on timeout.
+     * @throws Error on failure: {@link Error.CLOSED}.
      */
-    public bool send_receive(bool wait) throws Error {
+    public bool wait_for_data(int timeout) throws Error {
         if (!is_opened) {
             throw new Error.CLOSED("The channel '%s' is closed.", name);
         }
-        var result = wait ? slots.semaphore.wait() : slots.semaphore.trywait();
-        if (result >= 0) {
-            var sent_received = false;
-            sent_received = read_slots() || sent_received;
-            sent_received = write_slots(rearrange_slots()) || sent_received;
-            posix_die_if(slots.semaphore.post() < 0, SHM_OF + 1,
-                "Failed to release the semaphore for shmem '%s'.".printf(name));
-            process_incoming_queue();
-            return sent_received;
-        } else {
-            var err_code = Posix.errno;
-            if (err_code == Posix.EINVAL) {
-                throw new Error.SHM_OPEN_FAILED(
-                    "The semaphore for shmem '%s' is invalid. %d: %s", name, err_code, Posix.strerror(err_code));
-            }
+        stats.waits++;
+        unowned Doorbell doorbell = io != null ? io.wakeup : incoming_doorbell;
+        var next_timeout = get_next_timeout();
+        if (next_timeout >= 0 && (timeout < 0 || next_timeout <= timeout)) {
+            doorbell.wait(next_timeout);
+            return true;
         }
-        return false;
+        return doorbell.wait(timeout);
     }
 
-     /**
-     * Read slots and queue incoming data.
+    /**
+     * Get the time until the nearest deadline of a pending request.
+     *
+     * Event loops which watch {@link get_wakeup_fd} should call {@link send_receive} after this timeout,
+     * so that expired requests are removed.
      *
-     * @return `true` if there are any incoming data.
+     * @return The timeout in milliseconds or `-1` if no pending request has a deadline.
      */
-    private bool read_slots() {
-        var received = false;
-        for (var slot = 0; slot < N_SLOTS; slot++) {
-            var flag = slots.packets[slot].flag;
-            var accept = false;
-            switch (flag) {
-            case Flag.CLIENT_NOTIFICATION:
-            case Flag.CLIENT_REQUEST:
-            case Flag.CLIENT_RESPONSE:
-                accept = mode == Mode.SERVER;
-                break;
-            case Flag.SERVER_NOTIFICATION:
-            case Flag.SERVER_REQUEST:
-            case Flag.SERVER_RESPONSE:
-                accept = mode == Mode.CLIENT;
-                break;
-            }
-            if (accept) {
-                incoming_queue.push_tail(slots.packets[slot]);
-                slots.packets[slot].flag = Flag.EMPTY;
-                received = true;
-            }
+    public int get_next_timeout() {
+        if (deadlines.is_empty()) {
+            return -1;
         }
-        return received;
+        var remaining = deadlines.get_next_deadline() - get_monotonic_time();
+        return remaining > 0 ? (int) ((remaining + 999) / 1000) : 0;
     }
 
     /**
-     * Rearrange slots so that non-empty slots are at the beginning but preserve order.
+     * Set callback to be called to handle incoming requests.
+     *
+     * The data of the request must be used immediately or a copy must be made.
+     * The callback is executed in the thread the {@link send_receive} method is called in.
      *
-     * @return The index of the first empty slot or `-1` if there is not any.
+     * @param callback    The request callback.
      */
-    private int rearrange_slots() {
-        var first_empty = -1;
-        for (var slot = 0; slot < N_SLOTS; slot++) {
-            if (first_empty < 0 && slots.packets[slot].flag == Flag.EMPTY) {
-                first_empty = slot;
-            } else if (first_empty >= 0 && slots.packets[slot].flag != Flag.EMPTY) {
-                slots.packets[first_empty] = slots.packets[slot];
-                slots.packets[slot].flag = Flag.EMPTY;
-                first_empty++;
-            }
-        }
-        assert(first_empty < N_SLOTS);
-        return first_empty;
+    public void set_request_callback(owned RequestCallback callback) {
+        this.request_callback = (owned) callback;
     }
 
     /**
-     * Write packets from outgoing queue.
+     * Set callback to be called to handle incoming notification.
+     *
+     * The data of the notification must be used immediately or a copy must be made.
+     * The callback is executed in the thread the {@link send_receive} method is called in.
      *
-     * @param cursor    The index where to start looking for an empty slot.
-     * @return `true` if any data have been written.
+     * @param callback    The notification callback.
      */
-    private bool write_slots(int cursor) {
-        var sent = false;
-        for (var slot = cursor; slot < N_SLOTS && !outgoing_queue.is_empty(); slot++) {
-            if (slots.packets[slot].flag == Flag.EMPTY) {
-                slots.packets[slot] = outgoing_queue.pop_head();
-                sent = true;
-            }
-        }
-        return sent;
+    public void set_notification_callback(owned DataCallback callback) {
+        this.notification_callback = (owned) callback;
     }
 
     /**
-     * Process incoming queue and fire callbacks.
+     * Set callback to be called to handle batches of incoming messages.
      *
-     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     * If the batch callback is set, all notifications and requests received by a single {@link send_receive} call
+     * and responses to requests sent without a response callback are passed to it at once instead of calling
+     * the notification or the request callbacks for each of them. Use {@link send_response} to respond to requests
+     * from a batch.
+     *
+     * The data of the batch must be used immediately or a copy must be made.
+     * The callback is executed in the thread the {@link send_receive} method is called in.
+     *
+     * @param callback    The batch callback or `null` to dispatch messages one by one.
      */
-    private void process_incoming_queue() throws Error {
+    public void set_batch_callback(owned BatchCallback? callback) {
+        this.batch_callback = (owned) callback;
+    }
+
+    /**
+     * Set callback to be called when a request has not been responded before its deadline.
+     *
+     * The callback is executed in the thread the {@link send_receive} method is called in.
+     *
+     * @param callback    The timeout callback.
+     */
+    public void set_timeout_callback(owned TimeoutCallback? callback) {
+        this.timeout_callback = (owned) callback;
+    }
+
+    /**
+     * Set callback to be called to handle incoming streams.
+     *
+     * The data passed to the callback must be used immediately or a copy must be made. The callback is executed
+     * in the thread the {@link send_receive} method is called in, even if the batch callback is set.
+     *
+     * @param callback    The stream callback or `null` to drop incoming streams.
+     */
+    public void set_stream_callback(owned StreamCallback? callback) {
+        this.stream_callback = (owned) callback;
+    }
+
+    /**
+     * Send a request.
+     *
+     * The callback is executed in the thread the {@link send_receive} method is called in.
+     *
+     * @param data                 The request data.
+     * @param response_callback    The callback to be called when a response arrives. If it is `null`, the response
+     *                             is passed to the callback set by {@link set_batch_callback} instead.
+     * @return The request id. Use it to {@link cancel_request}.
+     * @throws Error on failure: {@link Error.RESOURCE_LIMIT},  {@link Error.SHM_OPEN_FAILED},
+     *     {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public uint request(uint8[] data, owned DataCallback? response_callback) throws Error {
+        check_credit(1, data.length);
+        var id = allocate_request_id();
+        add_outgoing_request(new OutgoingRequest(id, (owned) response_callback));
+        var flag = mode == Mode.SERVER ? Flag.SERVER_REQUEST : Flag.CLIENT_REQUEST;
+        push_outgoing_data(flag, id, data);
+        return id;
+    }
+
+    /**
+     * Send a request which may be responded with a stream of partial responses.
+     *
+     * The other side sends any number of partial responses with {@link IncomingRequest.send_partial_response}
+     * or {@link send_partial_response} followed by the final response. The callback is executed in the thread
+     * the {@link send_receive} method is called in, once for each of them. If {@link request_timeout} is set,
+     * each response frame extends the deadline of the request.
+     *
+     * @param data              The request data.
+     * @param frame_callback    The callback to be called when a response frame arrives.
+     * @return The request id. Use it to {@link cancel_request}.
+     * @throws Error on failure: {@link Error.RESOURCE_LIMIT}, {@link Error.WOULD_BLOCK},
+     *     {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public uint request_stream(uint8[] data, owned StreamingResponseCallback frame_callback) throws Error {
+        check_credit(1, data.length);
+        var id = allocate_request_id();
+        add_outgoing_request(new OutgoingRequest.streaming(id, (owned) frame_callback));
+        var flag = mode == Mode.SERVER ? Flag.SERVER_REQUEST : Flag.CLIENT_REQUEST;
+        push_outgoing_data(flag, id, data);
+        return id;
+    }
+
+    /**
+     * Send a batch of requests.
+     *
+     * The payloads of the requests are concatenated in `data` and their sizes are given by `sizes`. All requests are
+     * published to the other side together. The callback is executed in the thread the {@link send_receive} method is
+     * called in, once for each response, with the index of the corresponding request in the batch.
+     *
+     * The ids of the requests are stored to `ids`, so that individual requests can be cancelled with
+     * {@link cancel_request} and paired with the ids passed to the callback set by {@link set_timeout_callback}.
+     *
+     * @param data                 The concatenated request data.
+     * @param sizes                The sizes of individual requests.
+     * @param ids                  The buffer for the ids of individual requests. It must be as long as `sizes`.
+     * @param response_callback    The callback to be called when a response arrives.
+     * @throws Error on failure: {@link Error.INVALID_SIZE}, {@link Error.RESOURCE_LIMIT},
+     *     {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void request_many(uint8[] data, int[] sizes, uint[] ids, owned BatchResponseCallback response_callback)
+    throws Error {
+        check_batch_sizes(data, sizes);
+        if (ids.length != sizes.length) {
+            throw new Error.INVALID_SIZE("The batch for channel '%s' has %d requests but room for %d ids.",
+                name, sizes.length, ids.length);
+        }
+        check_pending_requests(sizes.length);
+        check_credit(sizes.length, data.length);
+        var batch = new BatchResponse((owned) response_callback);
+        var flag = mode == Mode.SERVER ? Flag.SERVER_REQUEST : Flag.CLIENT_REQUEST;
+        Packet[] packets = null;
+        var registered = 0;
+        try {
+            for (; registered < sizes.length; registered++) {
+                ids[registered] = allocate_request_id();
+                add_outgoing_request(new OutgoingRequest.for_batch(ids[registered], batch, registered));
+            }
+            packets = pack_outgoing_batch(flag, ids, data, sizes);
+        } catch (Error e) {
+            for (var i = 0; i < registered; i++) {
+                take_outgoing_request(ids[i]);
+            }
+            throw e;
+        }
+        push_outgoing_batch(packets, sizes);
+    }
+
+    /**
+     * Send a notification.
+     *
+     * @param data    The notification data.
+     * @throws Error on failure: {@link Error.RESOURCE_LIMIT}, {@link Error.SHM_OPEN_FAILED},
+     *     {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void notify(uint8[] data) throws Error {
+        check_credit(1, data.length);
+        // TODO: How to avoid hypothetical overwriting of notifications with the same id?
+        var id = ++last_notification_id;  // uint.MAX + 1 wraps to 0
+        var flag = mode == Mode.SERVER ? Flag.SERVER_NOTIFICATION : Flag.CLIENT_NOTIFICATION;
+        push_outgoing_data(flag, id, data);
+    }
+
+    /**
+     * Send a batch of notifications.
+     *
+     * The payloads of the notifications are concatenated in `data` and their sizes are given by `sizes`.
+     * All notifications are published to the other side together.
+     *
+     * @param data     The concatenated notification data.
+     * @param sizes    The sizes of individual notifications.
+     * @throws Error on failure: {@link Error.INVALID_SIZE}, {@link Error.RESOURCE_LIMIT}, {@link Error.WOULD_BLOCK},
+     *     {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void notify_many(uint8[] data, int[] sizes) throws Error {
+        check_batch_sizes(data, sizes);
+        check_credit(sizes.length, data.length);
+        var flag = mode == Mode.SERVER ? Flag.SERVER_NOTIFICATION : Flag.CLIENT_NOTIFICATION;
+        var ids = new uint[sizes.length];
+        for (var i = 0; i < sizes.length; i++) {
+            ids[i] = ++last_notification_id;
+        }
+        push_outgoing_batch(pack_outgoing_batch(flag, ids, data, sizes), sizes);
+    }
+
+    /**
+     * Open a new outgoing stream.
+     *
+     * A stream transfers data of arbitrary size as a sequence of chunks of at most {@link stream_chunk_size}
+     * bytes, so that neither side ever maps the whole data at once. The other side receives them with the callback
+     * set by {@link set_stream_callback}.
+     *
+     * @param metadata    The metadata of the stream, e.g. its name or size, passed to {@link StreamEvent.OPEN}.
+     * @return The stream.
+     * @throws Error on failure: {@link Error.WOULD_BLOCK}, {@link Error.SHM_OPEN_FAILED},
+     *     {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public OutgoingStream open_stream(uint8[] metadata) throws Error {
+        check_credit(1, metadata.length);
+        var id = ++last_stream_id;  // uint.MAX + 1 wraps to 0
+        push_outgoing_data(Flag.STREAM_OPEN, id, metadata);
+        return new OutgoingStream(this, id);
+    }
+
+    /**
+     * Send as many chunks of a stream as the credit granted by the other side allows.
+     *
+     * @param id      The id of the stream.
+     * @param data    The data to send.
+     * @return The number of bytes sent.
+     * @throws Error on failure: {@link Error.WOULD_BLOCK}, {@link Error.SHM_OPEN_FAILED},
+     *     {@link Error.SHM_CLOSE_FAILED}.
+     */
+    internal int write_stream(uint id, uint8[] data) throws Error {
+        var chunk_size = stream_chunk_size > 0 ? (int) stream_chunk_size : data.length;
+        var written = 0;
+        while (written < data.length) {
+            var size = int.min(chunk_size, data.length - written);
+            if (!has_credit_for(1, size)) {
+                break;
+            }
+            push_outgoing_data(Flag.STREAM_DATA, id, data[written:written + size]);
+            written += size;
+        }
+        if (written == 0 && data.length > 0) {
+            stats.credit_stalls++;
+            throw new Error.WOULD_BLOCK("Channel '%s' has run out of credit granted by the other side.", name);
+        }
+        return written;
+    }
+
+    /**
+     * Finish or abort a stream.
+     *
+     * @param id        The id of the stream.
+     * @param aborted   Whether to abort the stream rather than to finish it.
+     * @throws Error on failure: {@link Error.WOULD_BLOCK}.
+     */
+    internal void end_stream(uint id, bool aborted) throws Error {
+        check_credit(1, 0);
+        push_outgoing_packet(Packet.empty(aborted ? Flag.STREAM_ABORT : Flag.STREAM_END, id), 0);
+    }
+
+    /**
+     * Return the credit for an incoming stream chunk once it has been consumed.
+     *
+     * It must be called once for each {@link StreamEvent.DATA} chunk if {@link defer_stream_credit} is enabled.
+     *
+     * @param size    The size of the chunk.
+     */
+    public void consume_stream_chunk(int size) {
+        received_packets++;
+        received_bytes += size;
+        if (is_opened) {
+            return_credit();
+        }
+    }
+
+    /**
+     * Allocate an id for a new outgoing request.
+     *
+     * @return A request id not used by any pending outgoing request.
+     * @throws Error on failure: {@link Error.RESOURCE_LIMIT}.
+     */
+    private uint allocate_request_id() throws Error {
+        check_pending_requests(1);
+        bool wrapped = false;
+        uint id = 0;
+        do {
+            id = ++last_request_id;
+            if (id == 0) { // uint.MAX + 1 wraps to 0
+                if (wrapped) {
+                    throw new Error.RESOURCE_LIMIT("Too many pending outgoing requests.");
+                } else {
+                    wrapped = true;
+                    id = ++last_request_id;
+                }
+            }
+        } while (outgoing_requests.contains(id.to_pointer()));
+        return id;
+    }
+
+    /**
+     * Check that new requests do not exceed {@link max_pending_requests}.
+     *
+     * @param count    The number of new requests.
+     * @throws Error if there are too many pending requests: {@link Error.RESOURCE_LIMIT}.
+     */
+    private void check_pending_requests(int count) throws Error {
+        if (max_pending_requests > 0 && outgoing_requests.size() + count > max_pending_requests) {
+            throw new Error.RESOURCE_LIMIT("Channel '%s' has too many pending outgoing requests (%u).",
+                name, outgoing_requests.size());
+        }
+    }
+
+    /**
+     * Add a pending outgoing request and schedule its deadline.
+     *
+     * @param request    The request.
+     */
+    private void add_outgoing_request(OutgoingRequest request) {
+        outgoing_requests[request.id.to_pointer()] = request;
+        if (request_timeout > 0) {
+            request.deadline = get_monotonic_time() + (int64) request_timeout * 1000;
+            deadlines.push(request);
+        }
+    }
+
+    /**
+     * Postpone the deadline of a pending outgoing request after one of its partial responses has arrived.
+     *
+     * @param request    The request.
+     */
+    private void extend_deadline(OutgoingRequest request) {
+        if (request.deadline > 0) {
+            deadlines.remove(request);
+            request.deadline = get_monotonic_time() + (int64) request_timeout * 1000;
+            deadlines.push(request);
+        }
+    }
+
+    /**
+     * Remove a pending outgoing request.
+     *
+     * @param id    The id of the request.
+     * @return The request or `null` if it is not pending.
+     */
+    private OutgoingRequest? take_outgoing_request(uint id) {
+        var request = outgoing_requests.take(id.to_pointer());
+        if (request != null) {
+            deadlines.remove(request);
+        }
+        return request;
+    }
+
+    /**
+     * Cancel a pending outgoing request.
+     *
+     * The response callback of the request is released without being called and a late response is ignored.
+     *
+     * @param id    The id of the request.
+     * @return `true` if the request was pending, `false` otherwise.
+     */
+    public bool cancel_request(uint id) {
+        return take_outgoing_request(id) != null;
+    }
+
+    /**
+     * Remove pending outgoing requests whose deadline has passed and call the timeout callback.
+     */
+    private void expire_requests() {
+        if (deadlines.is_empty()) {
+            return;
+        }
+        var now = get_monotonic_time();
+        OutgoingRequest? request = null;
+        while ((request = deadlines.pop_expired(now)) != null) {
+            outgoing_requests.remove(request.id.to_pointer());
+            stats.requests_timed_out++;
+            if (timeout_callback != null) {
+                timeout_callback(request.id);
+            }
+        }
+    }
+
+    /**
+     * Check whether the other side has granted enough credit to send a message now.
+     *
+     * If it has not, the other side rings the doorbell once it consumes more messages, so that
+     * {@link get_wakeup_fd} becomes readable. See {@link receive_window_packets} and {@link receive_window_bytes}.
+     *
+     * @param size    The size of the message.
+     * @return `true` if the message may be sent.
+     */
+    public bool has_credit(int size) {
+        return has_credit_for(1, size);
+    }
+
+    /**
+     * Wait until the other side grants enough credit to send a message.
+     *
+     * Messages are sent and received with {@link send_receive} meanwhile.
+     *
+     * @param size       The size of the message.
+     * @param timeout    The timeout in milliseconds. A negative value means an infinite timeout.
+     * @return `true` if the message may be sent, `false` on timeout.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public bool wait_for_credit(int size, int timeout) throws Error {
+        var deadline = timeout >= 0 ? get_monotonic_time() + (int64) timeout * 1000 : -1;
+        while (!has_credit(size)) {
+            var remaining = -1;
+            if (deadline >= 0) {
+                remaining = (int) ((deadline - get_monotonic_time() + 999) / 1000);
+                if (remaining <= 0) {
+                    return false;
+                }
+            }
+            if (wait_for_data(remaining)) {
+                send_receive(false);
+            }
+        }
+        return true;
+    }
+
+    /**
+     * Check whether the other side has granted enough credit and ask for a doorbell ring if it has not.
+     *
+     * @param packets    The number of packets to send.
+     * @param bytes      The total size of their payloads.
+     * @return `true` if the packets may be sent.
+     */
+    private bool has_credit_for(uint packets, uint64 bytes) {
+        if (outgoing_credit == null || is_within_credit(packets, bytes)) {
+            return true;
+        }
+        atomic_uint_set(&outgoing_credit->waiting, 1);
+        // The other side might have consumed packets before it noticed the flag.
+        return is_within_credit(packets, bytes);
+    }
+
+    /**
+     * Check whether packets fit into the credit granted by the other side.
+     *
+     * @param packets    The number of packets to send.
+     * @param bytes      The total size of their payloads.
+     * @return `true` if the packets may be sent.
+     */
+    private bool is_within_credit(uint packets, uint64 bytes) {
+        var window_packets = atomic_uint_get(&outgoing_credit->window_packets);
+        if (window_packets > 0) {
+            var in_flight = sent_packets - atomic_uint_get(&outgoing_credit->consumed_packets);
+            if (in_flight + packets > window_packets) {
+                return false;
+            }
+        }
+        var window_bytes = atomic_uint_get(&outgoing_credit->window_bytes);
+        if (window_bytes > 0) {
+            var in_flight = sent_bytes - atomic_uint_get(&outgoing_credit->consumed_bytes);
+            // Only a single message may exceed the window, otherwise a batch could bypass it.
+            if ((in_flight > 0 || packets > 1) && in_flight + bytes > window_bytes) {
+                return false;
+            }
+        }
+        return true;
+    }
+
+    /**
+     * Fail if the other side has not granted enough credit.
+     *
+     * @param packets    The number of packets to send.
+     * @param bytes      The total size of their payloads.
+     * @throws Error if there is not enough credit: {@link Error.WOULD_BLOCK}, or if a batch is larger than
+     *     the window: {@link Error.RESOURCE_LIMIT}.
+     */
+    private void check_credit(uint packets, uint64 bytes) throws Error {
+        if (packets > 1 && outgoing_credit != null) {
+            var window_packets = atomic_uint_get(&outgoing_credit->window_packets);
+            var window_bytes = atomic_uint_get(&outgoing_credit->window_bytes);
+            if ((window_packets > 0 && packets > window_packets) || (window_bytes > 0 && bytes > window_bytes)) {
+                throw new Error.RESOURCE_LIMIT(
+                    "The batch of %u messages (%s bytes) for channel '%s' does not fit into the receive window.",
+                    packets, bytes.to_string(), name);
+            }
+        }
+        if (!has_credit_for(packets, bytes)) {
+            stats.credit_stalls++;
+            throw new Error.WOULD_BLOCK("Channel '%s' has run out of credit granted by the other side.", name);
+        }
+    }
+
+    /**
+     * Publish the number of consumed incoming packets and wake the other side up if it waits for credit.
+     */
+    private void return_credit() {
+        if (atomic_uint_get(&incoming_credit->consumed_packets) == received_packets) {
+            return;
+        }
+        atomic_uint_set(&incoming_credit->consumed_bytes, received_bytes);
+        atomic_uint_set(&incoming_credit->consumed_packets, received_packets);
+        if (atomic_uint_exchange(&incoming_credit->waiting, 0, ATOMIC_SEQ_CST) != 0) {
+            outgoing_doorbell.ring();
+            stats.doorbell_rings++;
+        }
+    }
+
+    /**
+     * Check that the sizes of a batch match the batch data.
+     *
+     * @param data     The concatenated data of the batch.
+     * @param sizes    The sizes of individual payloads.
+     * @throws Error if the sizes do not match: {@link Error.INVALID_SIZE}.
+     */
+    private void check_batch_sizes(uint8[] data, int[] sizes) throws Error {
+        int64 total = 0;
+        foreach (var size in sizes) {
+            if (size < 0) {
+                throw new Error.INVALID_SIZE("The batch for channel '%s' contains a negative size.", name);
+            }
+            total += size;
+        }
+        if (total != data.length) {
+            throw new Error.INVALID_SIZE("The batch for channel '%s' has %d bytes but the sizes sum up to %s.",
+                name, data.length, total.to_string());
+        }
+    }
+
+    /**
+     * Publish queued outgoing packets right away instead of waiting for {@link send_receive}.
+     */
+    private void flush_outgoing_queue() {
+        // The I/O thread publishes packets as soon as they are handed over.
+        if (is_opened && io == null && outgoing_ring.write(outgoing_queue, tracing) > 0) {
+            outgoing_doorbell.ring();
+        }
+    }
+
+    /**
+     * Queue outgoing packets.
+     *
+     * @param flag    Packet flag.
+     * @param id      Packet id.
+     * @param data    Packet data.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private void push_outgoing_data(Flag flag, uint id, uint8[] data) throws Error {
+        push_outgoing_packet(pack_outgoing_data(flag, id, data), data.length);
+    }
+
+    /**
+     * Store outgoing data and create a packet without queuing it.
+     *
+     * @param flag    Packet flag.
+     * @param id      Packet id.
+     * @param data    Packet data.
+     * @return The packet.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private Packet pack_outgoing_data(Flag flag, uint id, uint8[] data) throws Error {
+        var size = data.length;
+        if (size == 0) {
+            return Packet.empty(flag, id);
+        }
+        if (size <= MAX_INLINE_SIZE) {
+            stats.inline_payloads++;
+            return Packet.inlined(flag, id, data);
+        }
+        uint position = 0;
+        if (outgoing_arena != null && arena_reservation == null && outgoing_arena.allocate(size, out position)) {
+            Posix.memcpy(outgoing_arena.get_pointer(position), data, size);
+            stats.arena_payloads++;
+            return Packet.arena(flag, id, position, size);
+        }
+        var segment = outgoing_pool != null ? outgoing_pool.acquire(size) : null;
+        if (segment != null) {
+            Posix.memcpy(segment.payload, data, size);
+            stats.pool_payloads++;
+            return Packet.pooled(flag, id, segment.shmem.name, size);
+        }
+        // All chunks of a stream and all partial responses to a request have the same id.
+        var name = flag == Flag.STREAM_DATA || flag == Flag.PARTIAL_RESPONSE
+            ? "%s-s-%u-%u".printf(resource_name, id, ++last_frame_segment)
+            : "%s-%d-%u".printf(resource_name, (int) flag, id);
+        var payload = new Shmem.with_flags(name, size, true, false, segment_shmem_flags);
+        Posix.memcpy(payload.pointer, data, size);
+        payload.close();
+        stats.segment_payloads++;
+        stats.segments_opened++;
+        return Packet(flag, id, name);
+    }
+
+    /**
+     * Store the payloads of a batch and create its packets without queuing them.
+     *
+     * All payloads are stored before any packet is queued, so that a failure does not send a part of the batch.
+     * If storing a payload fails, the payloads stored before are given back.
+     *
+     * @param flag     Packet flag.
+     * @param ids      Packet ids.
+     * @param data     The concatenated data of the batch.
+     * @param sizes    The sizes of individual payloads.
+     * @return The packets.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private Packet[] pack_outgoing_batch(Flag flag, uint[] ids, uint8[] data, int[] sizes) throws Error {
+        var packets = new Packet[sizes.length];
+        var offset = 0;
+        for (var i = 0; i < sizes.length; i++) {
+            try {
+                packets[i] = pack_outgoing_data(flag, ids[i], data[offset:offset + sizes[i]]);
+            } catch (Error e) {
+                for (var j = i - 1; j >= 0; j--) {
+                    discard_outgoing_packet(packets[j]);
+                }
+                throw e;
+            }
+            offset += sizes[i];
+        }
+        return packets;
+    }
+
+    /**
+     * Queue the packets of a batch and publish them.
+     *
+     * @param packets    The packets created by {@link pack_outgoing_batch}.
+     * @param sizes      The sizes of their payloads.
+     */
+    private void push_outgoing_batch(Packet[] packets, int[] sizes) {
+        for (var i = 0; i < packets.length; i++) {
+            push_outgoing_packet(packets[i], sizes[i]);
+        }
+        flush_outgoing_queue();
+    }
+
+    /**
+     * Give the payload of a packet which has not been queued back.
+     *
+     * Packets must be discarded in the reverse order of their creation, so that the space in the payload arena
+     * is rolled back correctly.
+     *
+     * @param packet    The packet.
+     */
+    private void discard_outgoing_packet(Packet packet) {
+        switch (packet.storage) {
+        case Storage.ARENA:
+            outgoing_arena.rollback(packet.offset);
+            break;
+        case Storage.POOL:
+            outgoing_pool.discard((string) packet.shm_name);
+            break;
+        case Storage.SEGMENT:
+            shm_unlink((string) packet.shm_name);
+            break;
+        default:
+            break;
+        }
+    }
+
+    /**
+     * Queue an outgoing packet.
+     *
+     * @param packet    The packet.
+     * @param size      The payload size.
+     */
+    private void push_outgoing_packet(Packet packet, uint size) {
+        uint length;
+        if (tracing) {
+            Packet traced = packet;
+            traced.queued_at = get_monotonic_ns();
+            length = enqueue_outgoing_packet(traced);
+        } else {
+            length = enqueue_outgoing_packet(packet);
+        }
+        sent_packets++;
+        sent_bytes += size;
+        stats.messages_sent++;
+        stats.bytes_sent += size;
+        if (length > stats.outgoing_queue_max) {
+            stats.outgoing_queue_max = length;
+        }
+    }
+
+    /**
+     * Put an outgoing packet to the queue or hand it over to the I/O thread.
+     *
+     * @param packet    The packet.
+     * @return The number of queued outgoing packets.
+     */
+    private uint enqueue_outgoing_packet(Packet packet) {
+        if (io != null) {
+            return io.push(packet);
+        }
+        if (outgoing_queue.is_empty() && incoming_doorbell != null) {
+            incoming_doorbell.ring();  // Wake up our own event loop to send the packet.
+            stats.doorbell_rings++;
+        }
+        outgoing_queue.push_tail(packet);
+        return outgoing_queue.length;
+    }
+
+    /**
+     * Reserve space for an outgoing payload in shared memory.
+     *
+     * The payload is written directly to the buffer of the reservation and published with {@link commit}
+     * or {@link commit_request} without any intermediate copies. A reservation which is not going to be
+     * published must be given back with {@link cancel_reservation}.
+     *
+     * @param size    The size of the payload.
+     * @return The reservation.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.INVALID_SIZE}, {@link Error.SHM_OPEN_FAILED}.
+     */
+    public Reservation reserve(int size) throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel '%s' is closed.", name);
+        }
+        if (size < 0) {
+            throw new Error.INVALID_SIZE("The size of a reservation must not be negative, %d given.", size);
+        }
+        check_credit(1, size);
+        uint position = 0;
+        if (outgoing_arena != null && arena_reservation == null && outgoing_arena.allocate(size, out position)) {
+            arena_reservation = new Reservation.arena(position, outgoing_arena.get_pointer(position), size);
+            return arena_reservation;
+        }
+        var segment = outgoing_pool != null ? outgoing_pool.acquire(size) : null;
+        if (segment != null) {
+            return new Reservation.pooled(segment, size);
+        }
+        var name = "%s-r-%u".printf(resource_name, ++last_reservation_id);
+        return new Reservation.segment(new Shmem.with_flags(name, size, true, false, segment_shmem_flags), size);
+    }
+
+    /**
+     * Publish a reserved payload as a notification.
+     *
+     * @param reservation    The reservation created by {@link reserve}.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void commit(Reservation reservation) throws Error requires (!reservation.finished) {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel '%s' is closed.", name);
+        }
+        var id = ++last_notification_id;  // uint.MAX + 1 wraps to 0
+        var flag = mode == Mode.SERVER ? Flag.SERVER_NOTIFICATION : Flag.CLIENT_NOTIFICATION;
+        push_outgoing_packet(finish_reservation(reservation, flag, id), reservation.size);
+    }
+
+    /**
+     * Publish a reserved payload as a request.
+     *
+     * @param reservation          The reservation created by {@link reserve}.
+     * @param response_callback    The callback to be called when a response arrives. If it is `null`,
+     *                             the response is passed to the callback set by {@link set_batch_callback}.
+     * @return The id of the request.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public uint commit_request(Reservation reservation, owned DataCallback? response_callback) throws Error
+    requires (!reservation.finished) {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel '%s' is closed.", name);
+        }
+        var id = allocate_request_id();
+        var flag = mode == Mode.SERVER ? Flag.SERVER_REQUEST : Flag.CLIENT_REQUEST;
+        var packet = finish_reservation(reservation, flag, id);
+        add_outgoing_request(new OutgoingRequest(id, (owned) response_callback));
+        push_outgoing_packet(packet, reservation.size);
+        return id;
+    }
+
+    /**
+     * Give a reserved payload back without publishing it.
+     *
+     * @param reservation    The reservation created by {@link reserve}.
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void cancel_reservation(Reservation reservation) throws Error requires (!reservation.finished) {
+        reservation.finished = true;
+        switch (reservation.storage) {
+        case Storage.ARENA:
+            if (arena_reservation == reservation) {
+                outgoing_arena.rollback(reservation.position);
+                arena_reservation = null;
+            }
+            break;
+        case Storage.POOL:
+            if (is_opened) {
+                reservation.segment.busy = false;
+            }
+            break;
+        default:
+            var payload = reservation.payload;
+            payload.close();
+            shm_unlink(payload.name);
+            break;
+        }
+    }
+
+    /**
+     * Finish a reservation and create a packet of its payload.
+     *
+     * @param reservation    The reservation.
+     * @param flag           Packet flag.
+     * @param id             Packet id.
+     * @return The packet.
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private Packet finish_reservation(Reservation reservation, Flag flag, uint id) throws Error {
+        reservation.finished = true;
+        switch (reservation.storage) {
+        case Storage.ARENA:
+            arena_reservation = null;
+            stats.arena_payloads++;
+            return Packet.arena(flag, id, reservation.position, reservation.size);
+        case Storage.POOL:
+            stats.pool_payloads++;
+            return Packet.pooled(flag, id, reservation.segment.shmem.name, reservation.size);
+        default:
+            var payload = reservation.payload;
+            payload.close();
+            stats.segment_payloads++;
+            stats.segments_opened++;
+            return Packet(flag, id, payload.name);
+        }
+    }
+
+    /**
+     * Send and receive messages.
+     *
+     * This method does the heavy lifting and should be called whenever {@link get_wakeup_fd} becomes readable
+     * or {@link wait_for_data} returns `true`. Otherwise, no messages are sent nor received.
+     *
+     * Sending and receiving never block each other because each direction has its own lock-free ring.
+     * If the {@link io_thread} is enabled, packets are sent and received by the I/O thread and this method only
+     * dispatches received packets to callbacks.
+     *
+     * @param wait    Unused. Sending and receiving never block. It is kept for compatibility.
+     * @return `True` if any data have been received or sent.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}, {@link Error.CLOSED}.
+     */
+    public bool send_receive(bool wait) throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel '%s' is closed.", name);
+        }
+        stats.send_receive_calls++;
+        if (io != null) {
+            var n_taken = io.take_incoming(incoming_queue);
+            process_incoming_queue();
+            return_credit();
+            expire_requests();
+            return n_taken > 0;
+        }
+        if (hub_name == null) {
+            // The doorbell shared by all clients of a ChannelServer is drained by the server.
+            incoming_doorbell.drain();
+            stats.doorbell_drains++;
+        }
+        bool was_full;
+        var n_received = incoming_ring.read(incoming_queue, out was_full, tracing);
+        var sent = outgoing_ring.write(outgoing_queue, tracing) > 0;
+        if (n_received > stats.incoming_batch_max) {
+            stats.incoming_batch_max = n_received;
+        }
+        if (was_full) {
+            stats.incoming_ring_full++;
+        }
+        if (!outgoing_queue.is_empty()) {
+            stats.outgoing_ring_full++;
+        }
+        if (sent || was_full) {
+            // The other side has either new packets or free slots for its pending packets.
+            outgoing_doorbell.ring();
+            stats.doorbell_rings++;
+        }
+        process_incoming_queue();
+        return_credit();
+        expire_requests();
+        return n_received > 0 || sent;
+    }
+
+    /**
+     * Process incoming queue and fire callbacks.
+     *
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private void process_incoming_queue() throws Error {
+        if (batch_callback != null) {
+            process_incoming_batch();
+            return;
+        }
         Packet? packet = null;
         while ((packet = incoming_queue.pop_head()) != null) {
             var id = packet.id;
-            var payload = new Shmem((string) packet.shm_name, 0, false, true);
-            unowned uint8[] data = payload.get_buffer();
+            Shmem? payload = null;
+            unowned uint8[] data = map_incoming_payload(packet, out payload);
+            dispatched_packet = packet;
+            dispatched_payload = payload;
+            dispatched_data = data;
+            var dispatched_at = tracing ? get_monotonic_ns() : 0;
             switch (packet.flag) {
             case Flag.SERVER_NOTIFICATION:
             case Flag.CLIENT_NOTIFICATION:
@@ -330,51 +1552,514 @@ public class Channel {
             case Flag.SERVER_REQUEST:
             case Flag.CLIENT_REQUEST:
                 if (this.request_callback != null) {
-                    var request = new IncomingRequest(id, data, send_response);
+                    var request = new IncomingRequest(id, data, send_response_frame);
                     this.request_callback(request);
                 }
                 break;
             case Flag.SERVER_RESPONSE:
             case Flag.CLIENT_RESPONSE:
-                var request = outgoing_requests.take(id.to_pointer());
+                var request = take_outgoing_request(id);
                 if (request != null)
                     request.handle_response(data);
                 break;
+            case Flag.PARTIAL_RESPONSE:
+                dispatch_partial_response(id, data);
+                break;
+            case Flag.STREAM_OPEN:
+            case Flag.STREAM_DATA:
+            case Flag.STREAM_END:
+            case Flag.STREAM_ABORT:
+                dispatch_stream_packet(packet, data);
+                break;
             default:
                 assert_not_reached();
             }
+            if (tracing) {
+                record_latencies(packet, dispatched_at);
+            }
+            dispatched_packet = null;
+            dispatched_payload = null;
+            dispatched_data = null;
+            if (dispatched_lease != null) {
+                dispatched_lease = null;
+            } else {
+                release_incoming_payload(packet, payload);
+            }
+        }
+    }
+
+    /**
+     * Process incoming queue and pass the messages to the batch callback at once.
+     *
+     * Responses to requests with a response callback are still passed to that callback.
+     *
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private void process_incoming_batch() throws Error {
+        var batch = new IncomingBatch();
+        // The packets are kept rather than copied, because the data of inline payloads point into them.
+        var packets = new GenericArray<Packet?>();
+        Shmem?[] payloads = {};
+        Packet? packet = null;
+        while ((packet = incoming_queue.pop_head()) != null) {
+            var id = packet.id;
+            Shmem? payload = null;
+            unowned uint8[] data = map_incoming_payload(packet, out payload);
+            if (is_stream_flag(packet.flag)) {
+                var dispatched_at = tracing ? get_monotonic_ns() : 0;
+                dispatch_stream_packet(packet, data);
+                if (tracing) {
+                    record_latencies(packet, dispatched_at);
+                }
+                release_incoming_payload(packet, payload);
+                continue;
+            }
+            if (packet.flag == Flag.PARTIAL_RESPONSE) {
+                var dispatched_at = tracing ? get_monotonic_ns() : 0;
+                dispatch_partial_response(id, data);
+                if (tracing) {
+                    record_latencies(packet, dispatched_at);
+                }
+                release_incoming_payload(packet, payload);
+                continue;
+            }
+            var kind = get_message_kind(packet.flag);
+            if (kind == MessageKind.RESPONSE) {
+                var request = take_outgoing_request(id);
+                if (request == null || request.has_response_callback) {
+                    if (request != null) {
+                        var dispatched_at = tracing ? get_monotonic_ns() : 0;
+                        request.handle_response(data);
+                        if (tracing) {
+                            record_latencies(packet, dispatched_at);
+                        }
+                    }
+                    release_incoming_payload(packet, payload);
+                    continue;
+                }
+            }
+            batch.add(kind, id, data);
+            if (packet.storage == Storage.POOL && incoming_cache != null) {
+                // Mapping later segments of the batch must not evict this one before the batch callback returns.
+                incoming_cache.retain((string) packet.shm_name);
+            }
+            packets.add((owned) packet);
+            payloads += payload;
+        }
+        if (batch.get_length() > 0) {
+            var dispatched_at = tracing ? get_monotonic_ns() : 0;
+            batch_callback(batch);
+            if (tracing) {
+                for (var i = 0; i < packets.length; i++) {
+                    record_latencies(packets[i], dispatched_at);
+                }
+            }
+        }
+        for (var i = 0; i < packets.length; i++) {
+            release_incoming_payload(packets[i], payloads[i]);
+            if (packets[i].storage == Storage.POOL && incoming_cache != null) {
+                incoming_cache.release((string) packets[i].shm_name);
+            }
+        }
+    }
+
+    /**
+     * Pass an incoming partial response to its pending outgoing request.
+     *
+     * @param id      The id of the request.
+     * @param data    The data of the partial response.
+     */
+    private void dispatch_partial_response(uint id, uint8[] data) {
+        var request = outgoing_requests[id.to_pointer()];
+        if (request != null) {
+            extend_deadline(request);
+            request.handle_partial_response(data);
+        }
+    }
+
+    /**
+     * Pass an incoming stream packet to the stream callback.
+     *
+     * @param packet    The incoming packet.
+     * @param data      The payload data.
+     */
+    private void dispatch_stream_packet(Packet packet, uint8[] data) {
+        StreamEvent event;
+        switch (packet.flag) {
+        case Flag.STREAM_OPEN:
+            event = StreamEvent.OPEN;
+            break;
+        case Flag.STREAM_DATA:
+            event = StreamEvent.DATA;
+            break;
+        case Flag.STREAM_END:
+            event = StreamEvent.END;
+            break;
+        default:
+            event = StreamEvent.ABORT;
+            break;
+        }
+        if (stream_callback != null) {
+            stream_callback(packet.id, event, data);
+        }
+        if (event == StreamEvent.DATA && (stream_callback == null || !defer_stream_credit)) {
+            received_packets++;
+            received_bytes += data.length;
+        }
+    }
+
+    /**
+     * Record latencies of an incoming packet once it has been processed.
+     *
+     * @param packet           The incoming packet.
+     * @param dispatched_at    When the packet was passed to a callback.
+     */
+    private void record_latencies(Packet packet, int64 dispatched_at) {
+        var processed_at = get_monotonic_ns();
+        unowned LatencyHistogram[] histograms = get_latency_histograms();
+        histograms[LatencyStage.CALLBACK].record(processed_at - dispatched_at);
+        if (packet.published_at != 0 && packet.received_at != 0) {
+            histograms[LatencyStage.IN_RING].record(packet.received_at - packet.published_at);
+            if (packet.queued_at != 0) {
+                histograms[LatencyStage.QUEUED].record(packet.published_at - packet.queued_at);
+                histograms[LatencyStage.TOTAL].record(processed_at - packet.queued_at);
+            }
+        }
+    }
+
+    /**
+     * Get histograms of latencies of incoming messages and create them if necessary.
+     *
+     * @return The histograms indexed by {@link LatencyStage}.
+     */
+    private unowned LatencyHistogram[] get_latency_histograms() {
+        if (latency_histograms == null) {
+            latency_histograms = {
+                new LatencyHistogram(), new LatencyHistogram(), new LatencyHistogram(), new LatencyHistogram()};
+        }
+        return latency_histograms;
+    }
+
+    /**
+     * Get the kind of message from a packet flag.
+     *
+     * @param flag    The packet flag.
+     * @return The kind of message.
+     */
+    private static MessageKind get_message_kind(Flag flag) {
+        switch (flag) {
+        case Flag.SERVER_NOTIFICATION:
+        case Flag.CLIENT_NOTIFICATION:
+            return MessageKind.NOTIFICATION;
+        case Flag.SERVER_REQUEST:
+        case Flag.CLIENT_REQUEST:
+            return MessageKind.REQUEST;
+        case Flag.SERVER_RESPONSE:
+        case Flag.CLIENT_RESPONSE:
+            return MessageKind.RESPONSE;
+        default:
+            assert_not_reached();
+        }
+    }
+
+    /**
+     * Check whether a packet belongs to a stream.
+     *
+     * @param flag    The packet flag.
+     * @return `true` for stream packets.
+     */
+    private static bool is_stream_flag(Flag flag) {
+        return flag >= Flag.STREAM_OPEN && flag <= Flag.STREAM_ABORT;
+    }
+
+    /**
+     * Map the payload of an incoming packet.
+     *
+     * @param packet     The incoming packet.
+     * @param payload    The shared memory segment of the payload unless it is stored in the payload arena.
+     * @return The payload data.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private unowned uint8[] map_incoming_payload(Packet packet, out Shmem? payload) throws Error {
+        unowned uint8[] data;
+        switch (packet.storage) {
+        case Storage.ARENA:
+            payload = null;
+            data = incoming_arena.get_buffer(packet.offset, packet.size);
+            break;
+        case Storage.NONE:
+            payload = null;
+            data = (uint8[]) packet.shm_name;
+            data.length = 0;
+            break;
+        case Storage.INLINE:
+            payload = null;
+            data = (uint8[]) packet.shm_name;
+            data.length = (int) packet.size;
+            break;
+        case Storage.POOL:
+            var name = (string) packet.shm_name;
+            if (incoming_cache != null) {
+                payload = incoming_cache.get(name);
+            } else {
+                payload = new Shmem.with_flags(name, 0, false, false, segment_shmem_flags);
+                stats.segments_opened++;
+            }
+            data = (uint8[]) ((uint8*) payload.pointer + POOL_HEADER_SIZE);
+            data.length = (int) packet.size;
+            break;
+        default:
+            payload = new Shmem.with_flags((string) packet.shm_name, 0, false, true, segment_shmem_flags);
+            data = payload.get_buffer();
+            stats.segments_opened++;
+            break;
+        }
+        if (packet.flag != Flag.STREAM_DATA) {
+            // The credit for stream chunks is returned by dispatch_stream_packet or consume_stream_chunk.
+            received_packets++;
+            received_bytes += data.length;
+        }
+        stats.messages_received++;
+        stats.bytes_received += data.length;
+        return data;
+    }
+
+    /**
+     * Release the payload of an incoming packet once it has been processed.
+     *
+     * @param packet     The incoming packet.
+     * @param payload    The shared memory segment of the payload unless it is stored in the payload arena.
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private void release_incoming_payload(Packet packet, Shmem? payload) throws Error {
+        switch (packet.storage) {
+        case Storage.ARENA:
+            incoming_arena.release(packet.offset, packet.size);
+            break;
+        case Storage.NONE:
+        case Storage.INLINE:
+            break;
+        case Storage.POOL:
+            pool_segment_release(payload);
+            if (incoming_cache == null) {
+                payload.close();
+            }
+            break;
+        default:
+            payload.close();
+            break;
+        }
+    }
+
+    /**
+     * Get runtime statistics of the channel.
+     *
+     * @return The statistics.
+     */
+    public Stats get_stats() {
+        var result = stats;
+        result.outgoing_queue_length = outgoing_queue.length;
+        result.pending_requests = outgoing_requests.size();
+        if (io != null) {
+            io.add_stats(ref result);
+        }
+        return result;
+    }
+
+    /**
+     * Get a single runtime statistic of the channel.
+     *
+     * @param stat    The statistic.
+     * @return The value of the statistic.
+     */
+    public uint64 get_stat(Stat stat) {
+        return get_stats().get_value(stat);
+    }
+
+    /**
+     * Reset runtime statistics of the channel.
+     */
+    public void reset_stats() {
+        stats = Stats();
+        if (io != null) {
+            io.reset_stats();
+        }
+    }
+
+    /**
+     * Get the histogram of latencies of a stage of incoming messages.
+     *
+     * Latencies are recorded only if {@link tracing} is enabled. The histogram is updated as more messages arrive.
+     *
+     * @param stage    The stage.
+     * @return The histogram owned by the channel.
+     */
+    public unowned LatencyHistogram get_latency_histogram(LatencyStage stage) {
+        return get_latency_histograms()[stage];
+    }
+
+    /**
+     * Remove all recorded latencies.
+     */
+    public void reset_latency_histograms() {
+        if (latency_histograms != null) {
+            foreach (unowned LatencyHistogram histogram in latency_histograms) {
+                histogram.reset();
+            }
+        }
+    }
+
+    /**
+     * Lease the payload being passed to a notification, request or response callback.
+     *
+     * The payload stays valid after the callback returns until the lease is released, so that it can be
+     * processed without making a copy. The sender cannot reuse the memory of the payload in the meantime,
+     * and payloads in the payload arena received after it are not given back until it is released.
+     *
+     * @return The lease of the payload.
+     */
+    public Lease lease_payload() requires (dispatched_packet != null) {
+        if (dispatched_lease == null) {
+            Packet packet = dispatched_packet;
+            switch (packet.storage) {
+            case Storage.ARENA:
+                incoming_arena.retain(packet.offset, packet.size);
+                break;
+            case Storage.POOL:
+                if (incoming_cache != null) {
+                    incoming_cache.retain((string) packet.shm_name);
+                }
+                break;
+            default:
+                break;
+            }
+            dispatched_lease = new Lease(this, packet, dispatched_payload, dispatched_data);
+            n_leases++;
+        }
+        return dispatched_lease;
+    }
+
+    /**
+     * Release a leased payload.
+     *
+     * @param packet     The packet of the payload.
+     * @param payload    The shared memory segment of the payload unless it is stored in the payload arena.
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    internal void release_lease(Packet packet, Shmem? payload) throws Error {
+        n_leases--;
+        switch (packet.storage) {
+        case Storage.ARENA:
+            if (is_opened) {
+                incoming_arena.release_retained(packet.offset);
+            }
+            break;
+        case Storage.POOL:
+            if (is_opened) {
+                pool_segment_release(payload);
+            }
+            if (incoming_cache != null) {
+                incoming_cache.release((string) packet.shm_name);
+            } else {
+                payload.close();
+            }
+            break;
+        case Storage.NONE:
+        case Storage.INLINE:
+            break;
+        default:
             payload.close();
+            break;
         }
     }
 
     /**
      * Send a response back to caller.
      *
-     * @param id    The response id.
+     * Use it to respond to requests received by the callback set by {@link set_batch_callback}.
+     *
+     * @param id    The id of the request.
      * @param data    The response data
      * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
      */
-    private void send_response(uint id, uint8[] data) throws Error {
+    public void send_response(uint id, uint8[] data) throws Error {
        var flag = mode == Mode.SERVER ? Flag.SERVER_RESPONSE : Flag.CLIENT_RESPONSE;
        push_outgoing_data(flag, id, data);
     }
 
+    /**
+     * Send a partial response back to caller.
+     *
+     * Use it to stream responses to requests received by the callback set by {@link set_batch_callback}.
+     * The stream is ended by {@link send_response}.
+     *
+     * @param id      The id of the request.
+     * @param data    The data of the partial response.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void send_partial_response(uint id, uint8[] data) throws Error {
+        push_outgoing_data(Flag.PARTIAL_RESPONSE, id, data);
+    }
+
+    /**
+     * Send a response frame to an incoming request.
+     *
+     * @param id         The id of the request.
+     * @param data       The data of the response.
+     * @param partial    Whether it is a partial response to be followed by more responses.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private void send_response_frame(uint id, uint8[] data, bool partial) throws Error {
+        if (partial) {
+            send_partial_response(id, data);
+        } else {
+            send_response(id, data);
+        }
+    }
+
     /**
      * Close the channel
      *
-     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.SHM_CLOSE_FAILED}.
+     * Leased payloads point to the shared memory of the channel, so the channel cannot be closed until all
+     * leases are released.
+     *
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.BUSY}, {@link Error.SHM_CLOSE_FAILED}.
      */
     public void close() throws Error {
         if (!is_opened) {
             throw new Error.CLOSED("The channel '%s' is closed.", name);
         }
-        if (mode == Mode.SERVER) {
-            slots.semaphore.destroy();
+        if (n_leases > 0) {
+            throw new Error.BUSY("The channel '%s' cannot be closed while %u leases are held.", name, n_leases);
+        }
+        if (io != null) {
+            io.stop();
+            io = null;
         }
-        slots = null;
+        header = null;
+        outgoing_ring = null;
+        incoming_ring = null;
+        outgoing_credit = null;
+        incoming_credit = null;
+        outgoing_arena = null;
+        incoming_arena = null;
+        arena_reservation = null;
+        incoming_doorbell.close();
+        outgoing_doorbell.close();
+        incoming_doorbell = null;
+        outgoing_doorbell = null;
+        leave_registration();
         try {
+            if (outgoing_pool != null) {
+                outgoing_pool.clear();
+            }
+            if (incoming_cache != null) {
+                incoming_cache.clear();
+            }
             shmem.close();
         } finally {
+            outgoing_pool = null;
+            incoming_cache = null;
             shmem = null;
             is_opened = false;
         }
@@ -0,0 +1,183 @@
+/* This file contains a min-heap of deadlines of pending outgoing requests.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * A min-heap of pending outgoing requests ordered by their deadlines.
+ *
+ * Each request keeps its position in the heap, so that it can be removed in logarithmic time when its response
+ * arrives or it is cancelled, and the heap never holds more than the pending requests with a deadline.
+ */
+private class DeadlineQueue {
+    /**
+     * The binary heap of requests. Only the first {@link length} items are used.
+     */
+    private OutgoingRequest?[] heap = new OutgoingRequest?[16];
+    /**
+     * The number of requests in the heap.
+     */
+    private int length = 0;
+
+    /**
+     * Create a new empty queue.
+     */
+    public DeadlineQueue() {
+    }
+
+    /**
+     * Whether there is no request in the queue.
+     *
+     * @return `true` if the queue is empty.
+     */
+    public bool is_empty() {
+        return length == 0;
+    }
+
+    /**
+     * Get the nearest deadline.
+     *
+     * @return The monotonic time of the nearest deadline in microseconds.
+     */
+    public int64 get_next_deadline() requires (length > 0) {
+        return heap[0].deadline;
+    }
+
+    /**
+     * Add a request with a deadline.
+     *
+     * @param request    The request. Its {@link OutgoingRequest.deadline} must be set.
+     */
+    public void push(OutgoingRequest request) requires (request.heap_index < 0) {
+        if (length == heap.length) {
+            heap.resize(2 * length);
+        }
+        heap[length] = request;
+        request.heap_index = length++;
+        sift_up(request.heap_index);
+    }
+
+    /**
+     * Remove and return a request whose deadline has passed.
+     *
+     * @param now    The current monotonic time in microseconds.
+     * @return The request with the nearest deadline if it has passed, `null` otherwise.
+     */
+    public OutgoingRequest? pop_expired(int64 now) {
+        if (length == 0 || heap[0].deadline > now) {
+            return null;
+        }
+        OutgoingRequest request = heap[0];
+        remove(request);
+        return request;
+    }
+
+    /**
+     * Remove a request from the queue.
+     *
+     * @param request    The request. Nothing happens if it is not in the queue.
+     */
+    public void remove(OutgoingRequest request) {
+        var index = request.heap_index;
+        if (index < 0) {
+            return;
+        }
+        var last = --length;
+        if (index != last) {
+            swap(index, last);
+        }
+        heap[last] = null;
+        request.heap_index = -1;
+        if (index != last) {
+            sift_down(index);
+            sift_up(index);
+        }
+    }
+
+    /**
+     * Remove all requests from the queue.
+     */
+    public void clear() {
+        for (var i = 0; i < length; i++) {
+            heap[i].heap_index = -1;
+            heap[i] = null;
+        }
+        length = 0;
+    }
+
+    /**
+     * Move a request up until its parent has an earlier deadline.
+     *
+     * @param index    The index of the request.
+     */
+    private void sift_up(int index) {
+        while (index > 0) {
+            var parent = (index - 1) / 2;
+            if (heap[parent].deadline <= heap[index].deadline) {
+                break;
+            }
+            swap(parent, index);
+            index = parent;
+        }
+    }
+
+    /**
+     * Move a request down until its children have later deadlines.
+     *
+     * @param index    The index of the request.
+     */
+    private void sift_down(int index) {
+        while (true) {
+            var smallest = index;
+            var left = 2 * index + 1;
+            var right = left + 1;
+            if (left < length && heap[left].deadline < heap[smallest].deadline) {
+                smallest = left;
+            }
+            if (right < length && heap[right].deadline < heap[smallest].deadline) {
+                smallest = right;
+            }
+            if (smallest == index) {
+                break;
+            }
+            swap(smallest, index);
+            index = smallest;
+        }
+    }
+
+    /**
+     * Swap two requests in the heap and update their indexes.
+     *
+     * @param a    The index of the first request.
+     * @param b    The index of the second request.
+     */
+    private void swap(int a, int b) {
+        OutgoingRequest first = heap[a];
+        heap[a] = heap[b];
+        heap[b] = first;
+        heap[a].heap_index = a;
+        heap[b].heap_index = b;
+    }
+}
+
+} // namespace Shmch
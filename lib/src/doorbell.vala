@@ -0,0 +1,144 @@
+/* This file contains a doorbell to wake up the other side of a channel using named pipes.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * A doorbell to wake up a process waiting for new packets.
+ *
+ * The doorbell is a named pipe opened by both sides of a channel. The ringing side writes a byte to it and the waiting
+ * side polls its file descriptor, so that it can be integrated with any event loop. Pending rings are coalesced:
+ * if the pipe is full, the doorbell is already ringing.
+ *
+ * Linux allows to open a named pipe for both reading and writing without blocking, which is what we do here.
+ */
+private class Doorbell {
+    /**
+     * The path of the named pipe.
+     */
+    public string path {get; private set;}
+    /**
+     * The file descriptor of the named pipe or `-1` if it is closed.
+     */
+    public int fd {get; private set; default = -1;}
+    /**
+     * Whether to remove the named pipe upon {@link close}.
+     */
+    private bool discard = false;
+
+    /**
+     * Create or open a doorbell.
+     *
+     * @param path       The path of the named pipe.
+     * @param create     Whether to create a new named pipe or to open an existing one.
+     * @param discard    Whether to remove the named pipe upon {@link close}.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}.
+     */
+    public Doorbell(string path, bool create, bool discard) throws Error {
+        this.path = path;
+        this.discard = discard;
+        if (create) {
+            Posix.unlink(path);
+            posix_die_if(Posix.mkfifo(path, Posix.S_IRUSR|Posix.S_IWUSR) < 0, SHM_OF,
+                "Failed to create doorbell '%s'.".printf(path));
+        }
+        fd = Posix.open(path, Posix.O_RDWR|Posix.O_NONBLOCK);
+        try {
+            posix_die_if(fd < 0, SHM_OF, "Failed to open doorbell '%s'.".printf(path));
+        } catch (Error e) {
+            fd = -1;
+            if (create) {
+                Posix.unlink(path);
+            }
+            throw e;
+        }
+    }
+
+    ~Doorbell() {
+        close();
+    }
+
+    /**
+     * Get the path of a doorbell for a channel.
+     *
+     * @param channel      The name of the channel.
+     * @param direction    The direction of the doorbell, e.g. `to-server`.
+     * @return The path of the named pipe.
+     */
+    public static string get_path(string channel, string direction) {
+        return "%s/shmch%s.%s".printf(Environment.get_user_runtime_dir(), channel.replace("/", "-"), direction);
+    }
+
+    /**
+     * Ring the doorbell.
+     */
+    public void ring() {
+        uint8 byte = 1;
+        if (Posix.write(fd, &byte, 1) < 0) {
+            posix_warn_if(Posix.errno != Posix.EAGAIN, "Failed to ring doorbell '%s'.".printf(path));
+        }
+    }
+
+    /**
+     * Consume all pending rings.
+     */
+    public void drain() {
+        uint8 buffer[64];
+        while (Posix.read(fd, buffer, buffer.length) > 0) {
+        }
+    }
+
+    /**
+     * Wait until the doorbell rings.
+     *
+     * @param timeout    The timeout in milliseconds. A negative value means an infinite timeout.
+     * @return `true` if the doorbell is ringing, `false` on timeout.
+     */
+    public bool wait(int timeout) {
+        Posix.pollfd fds[1];
+        fds[0].fd = fd;
+        fds[0].events = Posix.POLLIN;
+        fds[0].revents = 0;
+        var result = Posix.poll(fds, timeout);
+        posix_warn_if(result < 0 && Posix.errno != Posix.EINTR, "Failed to wait for doorbell '%s'.".printf(path));
+        return result > 0;
+    }
+
+    /**
+     * Close the doorbell.
+     *
+     * If it was opened with `discard` = `true`, the named pipe is removed.
+     */
+    public void close() {
+        if (fd >= 0) {
+            posix_warn_if(Posix.close(fd) < 0, "Failed to close doorbell '%s'.".printf(path));
+            fd = -1;
+        }
+        if (discard) {
+            Posix.unlink(path);
+            discard = false;
+        }
+    }
+}
+
+} // namespace Shmch
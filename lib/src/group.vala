@@ -0,0 +1,281 @@
+/* A group of channels serviced by a single epoll loop.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * A group of channels serviced together.
+ *
+ * The group waits for the wakeup file descriptors of all its channels at once with a single epoll instance and calls
+ * {@link Channel.send_receive} only for the channels which are ready or whose request deadline has passed, so that
+ * a single thread can service thousands of channels. Channels can be added and removed at any time.
+ *
+ * Use either {@link wait_for_data} or watch {@link get_wakeup_fd} in an event loop and then call
+ * {@link send_receive}. Channels of the group should not be serviced individually.
+ */
+public class ChannelGroup {
+    /**
+     * The number of channels in the group.
+     */
+    public uint size {
+        get {
+            return channels.size();
+        }
+    }
+    /**
+     * The maximal number of ready channels fetched by a single epoll call.
+     */
+    private const int MAX_EVENTS = 64;
+    /**
+     * The epoll file descriptor.
+     */
+    private int fd = -1;
+    /**
+     * The channels of the group, keyed by their address.
+     */
+    private HashTable<void*, Channel> channels = new HashTable<void*, Channel>(null, null);
+    /**
+     * The buffer of ready events.
+     */
+    private EpollEvent[] events = new EpollEvent[MAX_EVENTS];
+    /**
+     * The callback to be called after a channel has been serviced.
+     */
+    private ChannelCallback? serviced_callback = null;
+
+    /**
+     * Create a new empty channel group.
+     *
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}.
+     */
+    public ChannelGroup() throws Error {
+        fd = epoll_create1(EPOLL_CLOEXEC);
+        posix_die_if(fd < 0, SHM_OF, "Failed to create an epoll instance of a channel group.");
+    }
+
+    ~ChannelGroup() {
+        if (fd >= 0) {
+            posix_warn_if(Posix.close(fd) < 0, "Failed to close the epoll instance of a channel group.");
+            fd = -1;
+        }
+    }
+
+    /**
+     * Add a channel to the group.
+     *
+     * The channel must be open. Remove it from the group before it is {@link Channel.close}d.
+     *
+     * @param channel    The channel to add.
+     * @return `true` if the channel has been added, `false` if it is already in the group.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.RESOURCE_LIMIT}.
+     */
+    public bool add(Channel channel) throws Error {
+        if (channels.contains((void*) channel)) {
+            return false;
+        }
+        var event = EpollEvent();
+        event.events = EPOLLIN;
+        event.data.ptr = (void*) channel;
+        if (epoll_ctl(fd, EPOLL_CTL_ADD, channel.get_wakeup_fd(), &event) < 0) {
+            throw new Error.RESOURCE_LIMIT("Failed to add channel '%s' to a channel group. %s",
+                channel.name, Posix.strerror(Posix.errno));
+        }
+        channels.insert((void*) channel, channel);
+        return true;
+    }
+
+    /**
+     * Remove a channel from the group.
+     *
+     * @param channel    The channel to remove.
+     * @return `true` if the channel has been removed, `false` if it is not in the group.
+     */
+    public bool remove(Channel channel) {
+        if (!channels.contains((void*) channel)) {
+            return false;
+        }
+        if (channel.is_opened) {
+            try {
+                // A closed file descriptor has already been removed from the epoll instance by the kernel.
+                posix_warn_if(epoll_ctl(fd, EPOLL_CTL_DEL, channel.get_wakeup_fd(), null) < 0,
+                    "Failed to remove channel '%s' from a channel group.".printf(channel.name));
+            } catch (Error e) {
+                assert_not_reached();
+            }
+        }
+        channels.remove((void*) channel);
+        return true;
+    }
+
+    /**
+     * Check whether a channel is in the group.
+     *
+     * @param channel    The channel.
+     * @return `true` if the channel is in the group, `false` otherwise.
+     */
+    public bool contains(Channel channel) {
+        return channels.contains((void*) channel);
+    }
+
+    /**
+     * Set callback to be called after a channel has been serviced by {@link send_receive}.
+     *
+     * The callback is executed in the thread the {@link send_receive} method is called in.
+     *
+     * @param callback    The callback or `null` to unset it.
+     */
+    public void set_serviced_callback(owned ChannelCallback? callback) {
+        this.serviced_callback = (owned) callback;
+    }
+
+    /**
+     * Get the file descriptor to watch for incoming data.
+     *
+     * It is the epoll file descriptor, which becomes readable when any channel of the group is ready. Then call
+     * {@link send_receive}. It is owned by the group and it is valid as long as the group exists.
+     *
+     * @return The file descriptor.
+     */
+    public int get_wakeup_fd() {
+        return fd;
+    }
+
+    /**
+     * Get the time until the nearest deadline of a pending request of any channel of the group.
+     *
+     * Event loops which watch {@link get_wakeup_fd} should call {@link send_receive} after this timeout.
+     *
+     * @return The timeout in milliseconds or `-1` if no pending request has a deadline.
+     */
+    public int get_next_timeout() {
+        var result = -1;
+        channels.foreach((key, channel) => {
+            if (channel.is_opened) {
+                var timeout = channel.get_next_timeout();
+                if (timeout >= 0 && (result < 0 || timeout < result)) {
+                    result = timeout;
+                }
+            }
+        });
+        return result;
+    }
+
+    /**
+     * Wait until there is any work for {@link send_receive}.
+     *
+     * The wait ends early when the deadline of a pending request passes, see {@link Channel.request_timeout}.
+     *
+     * @param timeout    The timeout in milliseconds. A negative value means an infinite timeout.
+     * @return `true` if there is any work, `false` on timeout.
+     */
+    public bool wait_for_data(int timeout) {
+        var next_timeout = get_next_timeout();
+        if (next_timeout >= 0 && (timeout < 0 || next_timeout <= timeout)) {
+            poll(next_timeout);
+            return true;
+        }
+        return poll(timeout);
+    }
+
+    /**
+     * Wait until any channel of the group is ready.
+     *
+     * @param timeout    The timeout in milliseconds. A negative value means an infinite timeout.
+     * @return `true` if any channel is ready, `false` on timeout.
+     */
+    private bool poll(int timeout) {
+        Posix.pollfd fds[1];
+        fds[0].fd = fd;
+        fds[0].events = Posix.POLLIN;
+        fds[0].revents = 0;
+        var result = Posix.poll(fds, timeout);
+        posix_warn_if(result < 0 && Posix.errno != Posix.EINTR, "Failed to wait for a channel group.");
+        return result > 0;
+    }
+
+    /**
+     * Send and receive messages of channels which are ready.
+     *
+     * The channels whose wakeup file descriptor is readable or whose request deadline has passed are serviced with
+     * {@link Channel.send_receive}. It does not block.
+     *
+     * @return The number of channels which have received or sent any data.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}, {@link Error.CLOSED}.
+     */
+    public uint send_receive() throws Error {
+        uint n_active = 0;
+        int n_ready;
+        do {
+            n_ready = epoll_wait(fd, events, MAX_EVENTS, 0);
+            if (n_ready < 0) {
+                posix_warn_if(Posix.errno != Posix.EINTR, "Failed to poll a channel group.");
+                break;
+            }
+            for (var i = 0; i < n_ready; i++) {
+                unowned Channel? channel = channels.lookup(events[i].data.ptr);
+                if (channel != null && service(channel)) {
+                    n_active++;
+                }
+            }
+            // Level-triggered channels which are still ready are reported again, so stop once the buffer is not full.
+        } while (n_ready == MAX_EVENTS);
+        if (get_next_timeout() == 0) {
+            Error? error = null;
+            channels.foreach((key, channel) => {
+                if (error == null && channel.is_opened && channel.get_next_timeout() == 0) {
+                    try {
+                        if (service(channel)) {
+                            n_active++;
+                        }
+                    } catch (Error e) {
+                        error = e.copy();
+                    }
+                }
+            });
+            if (error != null) {
+                throw (owned) error;
+            }
+        }
+        return n_active;
+    }
+
+    /**
+     * Service a single channel.
+     *
+     * @param channel    The channel.
+     * @return `true` if the channel has received or sent any data.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}, {@link Error.CLOSED}.
+     */
+    private bool service(Channel channel) throws Error {
+        if (!channel.is_opened) {
+            return false;
+        }
+        var result = channel.send_receive(false);
+        if (serviced_callback != null) {
+            serviced_callback(channel);
+        }
+        return result;
+    }
+}
+
+} // namespace Shmch
@@ -0,0 +1,190 @@
+/* This file contains HDR-style histograms of message latencies recorded by a traced channel.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * A stage of the life of a message measured by a traced {@link Channel}.
+ */
+public enum LatencyStage {
+    /**
+     * From queuing the message by the sender until it is published in the ring.
+     */
+    QUEUED,
+    /**
+     * From publishing the message in the ring until the receiver picks it up in {@link Channel.send_receive}.
+     */
+    IN_RING,
+    /**
+     * From passing the message to a callback of the receiver until the callback returns.
+     */
+    CALLBACK,
+    /**
+     * From queuing the message by the sender until the callback of the receiver returns.
+     */
+    TOTAL;
+}
+
+/**
+ * The number of bits of a value which select a sub-bucket. Values are recorded with a relative error
+ * below 1 / 2^(SUB_BUCKET_BITS - 1), i.e. about 3 %.
+ */
+private const int SUB_BUCKET_BITS = 6;
+/**
+ * The maximal recordable value in nanoseconds, about 18 minutes. Larger values are clamped.
+ */
+private const int64 MAX_LATENCY = ((int64) 1 << 40) - 1;
+
+/**
+ * An HDR-style histogram of latencies in nanoseconds.
+ *
+ * Values lower than 2^SUB_BUCKET_BITS are counted exactly. Larger values are counted in buckets of the same
+ * relative width, 2^(SUB_BUCKET_BITS - 1) buckets for every power of two, so that recording a value is just
+ * a few bit operations and an increment and the whole histogram takes a fixed amount of memory.
+ */
+public class LatencyHistogram {
+    /**
+     * The number of recorded values.
+     */
+    public uint64 count {get; private set; default = 0;}
+    /**
+     * The minimal recorded value or zero if there is none.
+     */
+    public int64 min {get; private set; default = 0;}
+    /**
+     * The maximal recorded value or zero if there is none.
+     */
+    public int64 max {get; private set; default = 0;}
+    /**
+     * The sum of recorded values.
+     */
+    private int64 sum = 0;
+    /**
+     * The counts of values in buckets.
+     */
+    private uint64[] buckets;
+
+    /**
+     * Create a new empty histogram.
+     */
+    public LatencyHistogram() {
+        buckets = new uint64[get_bucket_index(MAX_LATENCY) + 1];
+    }
+
+    /**
+     * Record a value.
+     *
+     * @param value    The value in nanoseconds. Negative values are recorded as zero.
+     */
+    public void record(int64 value) {
+        value = value.clamp(0, MAX_LATENCY);
+        buckets[get_bucket_index(value)]++;
+        if (count == 0 || value < min) {
+            min = value;
+        }
+        if (value > max) {
+            max = value;
+        }
+        count++;
+        sum += value;
+    }
+
+    /**
+     * Get the mean of recorded values.
+     *
+     * @return The mean in nanoseconds or zero if there are no values.
+     */
+    public double get_mean() {
+        return count > 0 ? (double) sum / count : 0.0;
+    }
+
+    /**
+     * Get the value at a percentile.
+     *
+     * @param percentile    The percentile from 0 to 100.
+     * @return The highest value equivalent to the value at the percentile within the precision of the histogram,
+     *     or zero if there are no values.
+     */
+    public int64 get_value_at_percentile(double percentile) {
+        if (count == 0) {
+            return 0;
+        }
+        var exact_rank = percentile.clamp(0.0, 100.0) / 100.0 * count;
+        var rank = (uint64) exact_rank;
+        if (rank < exact_rank || rank == 0) {
+            rank++;
+        }
+        uint64 seen = 0;
+        for (var i = 0; i < buckets.length; i++) {
+            seen += buckets[i];
+            if (seen >= rank) {
+                return get_bucket_end(i).clamp(min, max);
+            }
+        }
+        return max;
+    }
+
+    /**
+     * Remove all recorded values.
+     */
+    public void reset() {
+        for (var i = 0; i < buckets.length; i++) {
+            buckets[i] = 0;
+        }
+        count = 0;
+        min = 0;
+        max = 0;
+        sum = 0;
+    }
+
+    /**
+     * Get the index of the bucket of a value.
+     *
+     * @param value    The value. It must be within 0 and {@link MAX_LATENCY}.
+     * @return The index of the bucket.
+     */
+    private static int get_bucket_index(int64 value) {
+        if (value < (1 << SUB_BUCKET_BITS)) {
+            return (int) value;
+        }
+        var shift = 64 - count_leading_zeros(value) - SUB_BUCKET_BITS;
+        return (shift << (SUB_BUCKET_BITS - 1)) + (int) (value >> shift);
+    }
+
+    /**
+     * Get the highest value of a bucket.
+     *
+     * @param index    The index of the bucket.
+     * @return The highest value counted in the bucket.
+     */
+    private static int64 get_bucket_end(int index) {
+        if (index < (1 << SUB_BUCKET_BITS)) {
+            return index;
+        }
+        var shift = (index >> (SUB_BUCKET_BITS - 1)) - 1;
+        var sub_bucket = index - (shift << (SUB_BUCKET_BITS - 1));
+        return (((int64) sub_bucket + 1) << shift) - 1;
+    }
+}
+
+} // namespace Shmch
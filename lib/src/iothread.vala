@@ -0,0 +1,251 @@
+/* A dedicated I/O thread of a channel.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * A dedicated thread which moves packets between the rings of a {@link Channel} and the thread which uses it.
+ *
+ * The I/O thread blocks on the incoming doorbell, publishes outgoing packets handed over by {@link push}, reads
+ * incoming packets into a queue protected by a mutex and rings a local wakeup doorbell, so that the thread which
+ * uses the channel only takes the incoming packets with {@link take_incoming} and fires callbacks. Channel I/O
+ * then progresses even if that thread is busy.
+ */
+private class IoThread {
+    /**
+     * The doorbell rung by the I/O thread when there is any work for the thread which uses the channel.
+     */
+    public Doorbell wakeup {get; private set;}
+    /**
+     * The ring of incoming packets.
+     */
+    private Ring incoming_ring;
+    /**
+     * The ring of outgoing packets.
+     */
+    private Ring outgoing_ring;
+    /**
+     * The doorbell rung by the other side or by {@link push}.
+     */
+    private Doorbell incoming_doorbell;
+    /**
+     * The doorbell to ring when the I/O thread has published packets or freed slots.
+     */
+    private Doorbell outgoing_doorbell;
+    /**
+     * Whether to stamp packets with the time of publishing and receiving.
+     */
+    private bool tracing;
+    /**
+     * The mutex protecting the queues and statistics.
+     */
+    private Mutex mutex = Mutex();
+    /**
+     * Outgoing packets waiting for the I/O thread.
+     */
+    private Queue<Packet?> outgoing_queue = new Queue<Packet?>();
+    /**
+     * Incoming packets waiting for the thread which uses the channel.
+     */
+    private Queue<Packet?> incoming_queue = new Queue<Packet?>();
+    /**
+     * Statistics of ring and doorbell operations of the I/O thread.
+     */
+    private Stats stats = Stats();
+    /**
+     * `1` while the thread should run. Accessed atomically.
+     */
+    private uint running = 0;
+    /**
+     * The thread.
+     */
+    private Thread<void*>? thread = null;
+
+    /**
+     * Start an I/O thread.
+     *
+     * @param wakeup_path          The path of the wakeup doorbell.
+     * @param incoming_ring        The ring of incoming packets.
+     * @param outgoing_ring        The ring of outgoing packets.
+     * @param incoming_doorbell    The doorbell rung by the other side.
+     * @param outgoing_doorbell    The doorbell to ring when packets are published or slots freed.
+     * @param tracing              Whether to stamp packets with the time of publishing and receiving.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}.
+     */
+    public IoThread(string wakeup_path, Ring incoming_ring, Ring outgoing_ring, Doorbell incoming_doorbell,
+        Doorbell outgoing_doorbell, bool tracing) throws Error {
+        this.wakeup = new Doorbell(wakeup_path, true, true);
+        this.incoming_ring = incoming_ring;
+        this.outgoing_ring = outgoing_ring;
+        this.incoming_doorbell = incoming_doorbell;
+        this.outgoing_doorbell = outgoing_doorbell;
+        this.tracing = tracing;
+        atomic_uint_set(&running, 1);
+        try {
+            thread = new Thread<void*>.try("shmch-io", run);
+        } catch (GLib.Error e) {
+            wakeup.close();
+            throw new Error.SHM_OPEN_FAILED("Failed to start an I/O thread. %s", e.message);
+        }
+    }
+
+    /**
+     * Hand an outgoing packet over to the I/O thread.
+     *
+     * @param packet    The packet.
+     * @return The number of packets waiting for the I/O thread.
+     */
+    public uint push(Packet packet) {
+        mutex.lock();
+        var was_empty = outgoing_queue.is_empty();
+        outgoing_queue.push_tail(packet);
+        var length = outgoing_queue.length;
+        if (was_empty) {
+            stats.doorbell_rings++;
+        }
+        mutex.unlock();
+        if (was_empty) {
+            incoming_doorbell.ring();
+        }
+        return length;
+    }
+
+    /**
+     * Take incoming packets received by the I/O thread.
+     *
+     * @param queue    The queue to append the packets to.
+     * @return The number of packets.
+     */
+    public uint take_incoming(Queue<Packet?> queue) {
+        wakeup.drain();
+        mutex.lock();
+        var count = incoming_queue.length;
+        Packet? packet = null;
+        while ((packet = incoming_queue.pop_head()) != null) {
+            queue.push_tail(packet);
+        }
+        stats.doorbell_drains++;
+        mutex.unlock();
+        return count;
+    }
+
+    /**
+     * Get the number of outgoing packets waiting for the I/O thread or for free slots.
+     *
+     * @return The number of packets.
+     */
+    public uint get_outgoing_length() {
+        mutex.lock();
+        var length = outgoing_queue.length;
+        mutex.unlock();
+        return length;
+    }
+
+    /**
+     * Add statistics of the I/O thread.
+     *
+     * @param result    The statistics of the channel.
+     */
+    public void add_stats(ref Stats result) {
+        mutex.lock();
+        result.outgoing_ring_full += stats.outgoing_ring_full;
+        result.incoming_ring_full += stats.incoming_ring_full;
+        result.doorbell_rings += stats.doorbell_rings;
+        result.doorbell_drains += stats.doorbell_drains;
+        result.outgoing_queue_length = outgoing_queue.length;
+        if (stats.incoming_batch_max > result.incoming_batch_max) {
+            result.incoming_batch_max = stats.incoming_batch_max;
+        }
+        mutex.unlock();
+    }
+
+    /**
+     * Reset statistics of the I/O thread.
+     */
+    public void reset_stats() {
+        mutex.lock();
+        stats = Stats();
+        mutex.unlock();
+    }
+
+    /**
+     * Stop the I/O thread.
+     *
+     * Outgoing packets which fit into the ring are published before the thread exits.
+     */
+    public void stop() {
+        if (thread == null) {
+            return;
+        }
+        atomic_uint_set(&running, 0);
+        incoming_doorbell.ring();
+        thread.join();
+        thread = null;
+        wakeup.close();
+    }
+
+    /**
+     * The main loop of the I/O thread.
+     */
+    private void* run() {
+        while (atomic_uint_get(&running) != 0) {
+            incoming_doorbell.wait(-1);
+            incoming_doorbell.drain();
+            transfer();
+        }
+        transfer();
+        return null;
+    }
+
+    /**
+     * Move packets between the rings and the queues.
+     */
+    private void transfer() {
+        bool was_full;
+        mutex.lock();
+        var n_received = incoming_ring.read(incoming_queue, out was_full, tracing);
+        var sent = outgoing_ring.write(outgoing_queue, tracing) > 0;
+        stats.doorbell_drains++;
+        if (n_received > stats.incoming_batch_max) {
+            stats.incoming_batch_max = n_received;
+        }
+        if (was_full) {
+            stats.incoming_ring_full++;
+        }
+        if (!outgoing_queue.is_empty()) {
+            stats.outgoing_ring_full++;
+        }
+        if (sent || was_full) {
+            stats.doorbell_rings++;
+        }
+        mutex.unlock();
+        if (sent || was_full) {
+            // The other side has either new packets or free slots for its pending packets.
+            outgoing_doorbell.ring();
+        }
+        // Besides incoming packets, the other side might have returned credit.
+        wakeup.ring();
+    }
+}
+
+} // namespace Shmch
@@ -0,0 +1,120 @@
+/* Leases of incoming payloads.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+
+namespace Shmch {
+
+/**
+ * A lease of the payload of an incoming message.
+ *
+ * The payload passed to a notification, request or response callback is valid only until the callback returns.
+ * A lease obtained with {@link Channel.lease_payload} keeps the payload mapped and reserved after that, so that
+ * it can be processed without making a copy. The payload is given back to the sender by {@link release}.
+ * The channel cannot be closed until all leases are released.
+ */
+public class Lease {
+    /**
+     * Whether the payload has been released.
+     */
+    public bool released {get; private set; default = false;}
+    /**
+     * The channel the payload has been received from.
+     */
+    private Channel? channel;
+    /**
+     * The packet of the payload.
+     */
+    private Packet packet;
+    /**
+     * The shared memory segment of the payload unless it is stored in the payload arena.
+     */
+    private Shmem? payload;
+    /**
+     * The payload data.
+     */
+    private unowned uint8[] data;
+
+    /**
+     * Create a new lease.
+     *
+     * @param channel    The channel the payload has been received from.
+     * @param packet     The packet of the payload.
+     * @param payload    The shared memory segment of the payload unless it is stored in the payload arena.
+     * @param data       The payload data.
+     */
+    internal Lease(Channel channel, Packet packet, Shmem? payload, uint8[] data) {
+        this.channel = channel;
+        this.packet = packet;
+        this.payload = payload;
+        if (packet.storage == Storage.INLINE) {
+            // The dispatched packet the data point to is freed once the callback returns.
+            this.data = (uint8[]) this.packet.shm_name;
+            this.data.length = data.length;
+        } else {
+            this.data = data;
+        }
+    }
+
+    ~Lease() {
+        if (!released) {
+            warning("A lease of channel '%s' has not been released.", channel.name);
+            try {
+                release();
+            } catch (Error e) {
+                warning("Failed to release a lease: %s", e.message);
+            }
+        }
+    }
+
+    /**
+     * Get the payload data.
+     *
+     * The data must not be used after the lease is released.
+     *
+     * @return The payload data or `null` if the lease has been released.
+     */
+    public unowned uint8[]? get_data() {
+        return_val_if_fail(!released, null);
+        return data;
+    }
+
+    /**
+     * Give the payload back to the sender.
+     *
+     * Releasing a lease which has already been released does nothing.
+     *
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void release() throws Error {
+        if (released) {
+            return;
+        }
+        released = true;
+        data = null;
+        Channel channel = (owned) this.channel;
+        Shmem? payload = (owned) this.payload;
+        channel.release_lease(packet, payload);
+    }
+}
+
+} // namespace Shmch
@@ -0,0 +1,448 @@
+/* This file contains a pool of reusable shared memory segments for payloads and a cache of their mappings.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * The size of the header at the beginning of a pooled segment. The payload follows the header.
+ */
+private const ulong POOL_HEADER_SIZE = 64;
+/**
+ * The size of the smallest pooled segment including its header.
+ */
+private const ulong POOL_MIN_SEGMENT_SIZE = 4096;
+
+
+/**
+ * The header at the beginning of a pooled segment.
+ */
+private struct PoolHeader {
+    /**
+     * Whether the segment holds a payload not yet consumed by the receiver. Accessed atomically.
+     */
+    public uint busy;
+}
+
+
+/**
+ * A shared memory segment owned by {@link SegmentPool}.
+ */
+private class PoolSegment {
+    /**
+     * The shared memory of the segment.
+     */
+    public Shmem shmem;
+    /**
+     * The logical time of the last use, see {@link SegmentPool}.
+     */
+    public uint64 last_used = 0;
+
+    /**
+     * Create a new pooled segment.
+     *
+     * @param shmem    The shared memory of the segment.
+     */
+    public PoolSegment(Shmem shmem) {
+        this.shmem = shmem;
+    }
+
+    /**
+     * Whether the segment holds a payload not yet consumed by the receiver.
+     */
+    public bool busy {
+        get {
+            unowned PoolHeader? header = (PoolHeader?) shmem.pointer;
+            return atomic_uint_get(&header.busy) != 0;
+        }
+        set {
+            unowned PoolHeader? header = (PoolHeader?) shmem.pointer;
+            atomic_uint_set(&header.busy, value ? 1 : 0);
+        }
+    }
+
+    /**
+     * The pointer to the payload area.
+     */
+    public uint8* payload {
+        get {
+            return (uint8*) shmem.pointer + POOL_HEADER_SIZE;
+        }
+    }
+}
+
+
+/**
+ * A pool of shared memory segments with power-of-two size classes.
+ *
+ * The pool is owned by the sender. A segment is marked busy when a payload is written to it and
+ * the receiver marks it idle again once the payload has been consumed, so that it can be reused
+ * for another payload of the same size class. The total size of segments is capped and the least
+ * recently used idle segments are evicted to make room for new ones.
+ */
+private class SegmentPool {
+    /**
+     * The prefix of segment names.
+     */
+    private string prefix;
+    /**
+     * The maximal total size of segments in bytes.
+     */
+    private ulong max_bytes;
+    /**
+     * The options of the mappings of segments.
+     */
+    private ShmemFlags flags;
+    /**
+     * The total size of segments in bytes.
+     */
+    private ulong retained = 0;
+    /**
+     * The serial number of the last segment. Names are never reused.
+     */
+    private uint serial = 0;
+    /**
+     * The logical clock incremented on every acquisition.
+     */
+    private uint64 clock = 0;
+    /**
+     * All segments of the pool.
+     */
+    private GenericArray<PoolSegment> segments = new GenericArray<PoolSegment>();
+
+    /**
+     * Create a new segment pool.
+     *
+     * @param prefix       The prefix of segment names. It must be a valid shared memory name.
+     * @param max_bytes    The maximal total size of segments in bytes.
+     * @param flags        The options of the mappings of segments.
+     */
+    public SegmentPool(string prefix, ulong max_bytes, ShmemFlags flags) {
+        this.prefix = prefix;
+        this.max_bytes = max_bytes;
+        this.flags = flags;
+    }
+
+    /**
+     * Acquire an idle segment for a payload and mark it busy.
+     *
+     * @param size    The payload size.
+     * @return A segment or `null` if the size limit of the pool has been reached.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}.
+     */
+    public PoolSegment? acquire(ulong size) throws Error {
+        var segment_size = get_segment_size(size);
+        if (segment_size > max_bytes) {
+            return null;
+        }
+        clock++;
+        PoolSegment? found = null;
+        for (var i = 0; i < segments.length; i++) {
+            var segment = segments[i];
+            if (segment.shmem.size == segment_size && (found == null || segment.last_used > found.last_used)
+            && !segment.busy) {
+                found = segment;
+            }
+        }
+        if (found == null) {
+            while (retained + segment_size > max_bytes && evict_least_recently_used()) {
+            }
+            if (retained + segment_size > max_bytes) {
+                return null;
+            }
+            var name = "%s-pool-%u".printf(prefix, ++serial);
+            found = new PoolSegment(new Shmem.with_flags(name, segment_size, true, true, flags));
+            segments.add(found);
+            retained += segment_size;
+        }
+        found.last_used = clock;
+        found.busy = true;
+        return found;
+    }
+
+    /**
+     * Mark a segment idle again if its payload is not going to be published.
+     *
+     * @param name    The name of the segment.
+     */
+    public void discard(string name) {
+        for (var i = 0; i < segments.length; i++) {
+            if (segments[i].shmem.name == name) {
+                segments[i].busy = false;
+                return;
+            }
+        }
+    }
+
+    /**
+     * Close and discard all segments.
+     *
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void clear() throws Error {
+        Error? error = null;
+        for (var i = 0; i < segments.length; i++) {
+            try {
+                segments[i].shmem.close();
+            } catch (Error e) {
+                error = e;
+            }
+        }
+        segments = new GenericArray<PoolSegment>();
+        retained = 0;
+        if (error != null) {
+            throw error;
+        }
+    }
+
+    /**
+     * Evict the least recently used idle segment.
+     *
+     * @return `true` if a segment has been evicted.
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private bool evict_least_recently_used() throws Error {
+        PoolSegment? victim = null;
+        for (var i = 0; i < segments.length; i++) {
+            var segment = segments[i];
+            if ((victim == null || segment.last_used < victim.last_used) && !segment.busy) {
+                victim = segment;
+            }
+        }
+        if (victim == null) {
+            return false;
+        }
+        retained -= victim.shmem.size;
+        segments.remove(victim);
+        victim.shmem.close();
+        return true;
+    }
+
+    /**
+     * Get the size of the segment for a payload.
+     *
+     * @param size    The payload size.
+     * @return The size of the segment including its header, a power of two.
+     */
+    private static ulong get_segment_size(ulong size) {
+        ulong segment_size = POOL_MIN_SEGMENT_SIZE;
+        while (segment_size < size + POOL_HEADER_SIZE) {
+            segment_size <<= 1;
+        }
+        return segment_size;
+    }
+}
+
+
+/**
+ * A mapped pooled segment cached by {@link SegmentCache}.
+ */
+private class CachedSegment {
+    /**
+     * The shared memory of the segment.
+     */
+    public Shmem shmem;
+    /**
+     * The logical time of the last use.
+     */
+    public uint64 last_used = 0;
+    /**
+     * The number of leased payloads in the segment. A leased segment is never evicted.
+     */
+    public uint leases = 0;
+
+    /**
+     * Create a new cached segment.
+     *
+     * @param shmem    The shared memory of the segment.
+     */
+    public CachedSegment(Shmem shmem) {
+        this.shmem = shmem;
+    }
+}
+
+
+/**
+ * A cache of pooled segments mapped by the receiver.
+ *
+ * The cache is keyed by segment names, which are never reused by {@link SegmentPool}, so that receiving
+ * a payload in a segment seen before costs no syscalls. The total size of mapped segments is capped and
+ * the least recently used mappings are evicted.
+ */
+private class SegmentCache {
+    /**
+     * The maximal total size of mapped segments in bytes.
+     */
+    private ulong max_bytes;
+    /**
+     * The options of the mappings of segments.
+     */
+    private ShmemFlags flags;
+    /**
+     * The total size of mapped segments in bytes.
+     */
+    private ulong retained = 0;
+    /**
+     * The logical clock incremented on every lookup.
+     */
+    private uint64 clock = 0;
+    /**
+     * Mapped segments by name.
+     */
+    private HashTable<string, CachedSegment> segments = new HashTable<string, CachedSegment>(str_hash, str_equal);
+    /**
+     * Segments evicted while they were leased. They are closed once their leases are released.
+     */
+    private HashTable<string, CachedSegment> evicted = new HashTable<string, CachedSegment>(str_hash, str_equal);
+
+    /**
+     * Create a new segment cache.
+     *
+     * @param max_bytes    The maximal total size of mapped segments in bytes.
+     * @param flags        The options of the mappings of segments.
+     */
+    public SegmentCache(ulong max_bytes, ShmemFlags flags) {
+        this.max_bytes = max_bytes;
+        this.flags = flags;
+    }
+
+    /**
+     * Get a mapped segment and open it if necessary.
+     *
+     * @param name    The segment name.
+     * @return The shared memory of the segment.
+     * @throws Error on failure: {@link Error.INVALID_NAME}, {@link Error.SHM_OPEN_FAILED},
+     *     {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public Shmem get(string name) throws Error {
+        clock++;
+        var segment = segments[name];
+        if (segment == null) {
+            var shmem = new Shmem.with_flags(name, 0, false, false, flags);
+            while (retained + shmem.size > max_bytes && evict_least_recently_used()) {
+            }
+            segment = new CachedSegment(shmem);
+            segments[name] = segment;
+            retained += shmem.size;
+        }
+        segment.last_used = clock;
+        return segment.shmem;
+    }
+
+    /**
+     * Prevent a mapped segment from being closed until {@link release} is called.
+     *
+     * @param name    The segment name.
+     */
+    public void retain(string name) {
+        var segment = segments[name];
+        return_if_fail(segment != null);
+        segment.leases++;
+    }
+
+    /**
+     * Release a segment retained with {@link retain}.
+     *
+     * @param name    The segment name.
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void release(string name) throws Error {
+        var segment = segments[name] ?? evicted[name];
+        return_if_fail(segment != null && segment.leases > 0);
+        if (--segment.leases == 0 && evicted.remove(name)) {
+            segment.shmem.close();
+        }
+    }
+
+    /**
+     * Close all mapped segments.
+     *
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void clear() throws Error {
+        Error? error = null;
+        segments.foreach((name, segment) => {
+            try {
+                segment.shmem.close();
+            } catch (Error e) {
+                error = e;
+            }
+        });
+        evicted.foreach((name, segment) => {
+            try {
+                segment.shmem.close();
+            } catch (Error e) {
+                error = e;
+            }
+        });
+        segments.remove_all();
+        evicted.remove_all();
+        retained = 0;
+        if (error != null) {
+            throw error;
+        }
+    }
+
+    /**
+     * Evict the least recently used mapping.
+     *
+     * @return `true` if a mapping has been evicted.
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private bool evict_least_recently_used() throws Error {
+        string? victim_name = null;
+        CachedSegment? victim = null;
+        var iter = HashTableIter<string, CachedSegment>(segments);
+        unowned string name;
+        unowned CachedSegment segment;
+        while (iter.next(out name, out segment)) {
+            if (victim == null || segment.last_used < victim.last_used) {
+                victim_name = name;
+                victim = segment;
+            }
+        }
+        if (victim == null) {
+            return false;
+        }
+        retained -= victim.shmem.size;
+        segments.remove(victim_name);
+        if (victim.leases > 0) {
+            evicted[victim_name] = victim;
+        } else {
+            victim.shmem.close();
+        }
+        return true;
+    }
+}
+
+
+/**
+ * Mark a pooled segment as consumed so that the sender can reuse it.
+ *
+ * @param shmem    The shared memory of the segment.
+ */
+private inline void pool_segment_release(Shmem shmem) {
+    unowned PoolHeader? header = (PoolHeader?) shmem.pointer;
+    atomic_uint_set(&header.busy, 0);
+}
+
+} // namespace Shmch
@@ -0,0 +1,144 @@
+/* Registration of clients of a channel server.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * The registration of a client in the registry of a {@link ChannelServer}.
+ *
+ * The client claims a free entry of the registry, which gives it a channel of its own. Leaving the registration
+ * asks the server to recreate the channel for the next client.
+ */
+private class ClientRegistration {
+    /**
+     * The index of the claimed entry.
+     */
+    public uint index {get; private set; default = 0;}
+    /**
+     * The name of the channel of the claimed entry.
+     */
+    public string channel_name {get; private set; default = null;}
+    /**
+     * The shared memory of the registry.
+     */
+    private Shmem? shmem = null;
+    /**
+     * The claimed entry or `null` after {@link leave}.
+     */
+    private ClientEntry* entry = null;
+    /**
+     * The doorbell of the server.
+     */
+    private Doorbell? doorbell = null;
+
+    /**
+     * Claim a free entry of the registry.
+     *
+     * @param name     The name of the server.
+     * @param shmem    The shared memory of the registry. The registration takes its ownership.
+     * @throws Error on failure: {@link Error.INCOMPATIBLE}, {@link Error.RESOURCE_LIMIT},
+     *     {@link Error.SHM_OPEN_FAILED}.
+     */
+    public ClientRegistration(string name, Shmem shmem) throws Error {
+        this.shmem = shmem;
+        try {
+            RegistryHeader* header = (RegistryHeader*) shmem.pointer;
+            if (header->version != PROTOCOL_VERSION) {
+                throw new Error.INCOMPATIBLE("The server '%s' uses protocol version %u but %u is supported.",
+                    name, header->version, PROTOCOL_VERSION);
+            }
+            var max_clients = header->max_clients;
+            if (shmem.size < ChannelServer.get_registry_size(max_clients)) {
+                throw new Error.INCOMPATIBLE("The registry of server '%s' is corrupted.", name);
+            }
+            ClientEntry* entries = (ClientEntry*) ((uint8*) shmem.pointer + sizeof(RegistryHeader));
+            for (uint i = 0; i < max_clients; i++) {
+                var state = &entries[i].state;
+                if (atomic_uint_compare_and_exchange(state, (uint) ClientState.FREE, (uint) ClientState.CONNECTED)) {
+                    entry = &entries[i];
+                    index = i;
+                    break;
+                }
+            }
+            if (entry == null) {
+                throw new Error.RESOURCE_LIMIT("The server '%s' cannot accept more than %u clients.",
+                    name, max_clients);
+            }
+            var pid = Posix.getpid();
+            entry->start_time = get_process_start_time(pid);
+            atomic_uint_set(&entry->pid, (uint) pid);
+            channel_name = ChannelServer.get_client_channel_name(name, index);
+            doorbell = new Doorbell(Doorbell.get_path(name, "to-server"), false, false);
+        } catch (Error e) {
+            leave();
+            throw e;
+        }
+    }
+
+    ~ClientRegistration() {
+        leave();
+    }
+
+    /**
+     * Check whether the shared memory contains a client registry.
+     *
+     * @param shmem    The shared memory.
+     * @return `true` if it is a registry of a {@link ChannelServer}, `false` otherwise.
+     */
+    public static bool is_registry(Shmem shmem) {
+        if (shmem.size < sizeof(RegistryHeader)) {
+            return false;
+        }
+        RegistryHeader* header = (RegistryHeader*) shmem.pointer;
+        return atomic_uint_load(&header->magic, ATOMIC_ACQUIRE) == REGISTRY_MAGIC;
+    }
+
+    /**
+     * Leave the registry.
+     *
+     * The entry is marked as leaving and the server is woken up to recreate its channel.
+     */
+    public void leave() {
+        if (entry != null) {
+            atomic_uint_set(&entry->state, (uint) ClientState.LEAVING);
+            entry = null;
+            if (doorbell != null) {
+                doorbell.ring();
+            }
+        }
+        if (doorbell != null) {
+            doorbell.close();
+            doorbell = null;
+        }
+        if (shmem != null) {
+            try {
+                shmem.close();
+            } catch (Error e) {
+                warning("Failed to close the registry '%s'. %s", shmem.name, e.message);
+            }
+            shmem = null;
+        }
+    }
+}
+
+} // namespace Shmch
@@ -0,0 +1,117 @@
+/* Reservations of outgoing payloads.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+
+namespace Shmch {
+
+/**
+ * A payload reserved in shared memory by {@link Channel.reserve}.
+ *
+ * Write the payload directly to the buffer returned by {@link get_buffer} and publish it with
+ * {@link Channel.commit} or {@link Channel.commit_request}, or give it back with {@link Channel.cancel_reservation}.
+ * The buffer must not be used afterwards.
+ */
+public class Reservation {
+    /**
+     * The size of the reserved payload.
+     */
+    public int size {get; private set;}
+    /**
+     * Whether the reservation has been committed or cancelled.
+     */
+    public bool finished {get; internal set; default = false;}
+    /**
+     * The storage of the payload.
+     */
+    internal Storage storage;
+    /**
+     * The position of the payload in the payload arena.
+     */
+    internal uint position = 0;
+    /**
+     * The pooled segment of the payload.
+     */
+    internal PoolSegment? segment = null;
+    /**
+     * The dedicated shared memory segment of the payload.
+     */
+    internal Shmem? payload = null;
+    /**
+     * The pointer to the payload.
+     */
+    private uint8* pointer;
+
+    /**
+     * Create a reservation in the payload arena.
+     *
+     * @param position    The position of the payload.
+     * @param pointer     The pointer to the payload.
+     * @param size        The size of the payload.
+     */
+    internal Reservation.arena(uint position, uint8* pointer, int size) {
+        this.storage = Storage.ARENA;
+        this.position = position;
+        this.pointer = pointer;
+        this.size = size;
+    }
+
+    /**
+     * Create a reservation in a pooled segment.
+     *
+     * @param segment    The pooled segment.
+     * @param size       The size of the payload.
+     */
+    internal Reservation.pooled(PoolSegment segment, int size) {
+        this.storage = Storage.POOL;
+        this.segment = segment;
+        this.pointer = segment.payload;
+        this.size = size;
+    }
+
+    /**
+     * Create a reservation in a dedicated shared memory segment.
+     *
+     * @param payload    The shared memory segment.
+     * @param size       The size of the payload.
+     */
+    internal Reservation.segment(Shmem payload, int size) {
+        this.storage = Storage.SEGMENT;
+        this.payload = payload;
+        this.pointer = (uint8*) payload.pointer;
+        this.size = size;
+    }
+
+    /**
+     * Get the writable buffer of the payload.
+     *
+     * @return The buffer of the payload or `null` if the reservation has been finished.
+     */
+    public unowned uint8[]? get_buffer() {
+        return_val_if_fail(!finished, null);
+        unowned uint8[] buffer = (uint8[]) pointer;
+        buffer.length = size;
+        return buffer;
+    }
+}
+
+} // namespace Shmch
@@ -0,0 +1,113 @@
+/* This file contains a lock-free single-producer/single-consumer ring of packets in shared memory.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * A lock-free single-producer/single-consumer ring of packets in shared memory.
+ *
+ * Each direction of a {@link Channel} has its own ring. The producer publishes packets by advancing the head position
+ * with release semantics after the packets have been written and the consumer frees slots by advancing the tail
+ * position after the packets have been copied out. Positions grow monotonically (wrapping around `uint.MAX`) and
+ * the capacity is a power of two, so that a position maps to a slot by a simple mask.
+ */
+private class Ring {
+    /**
+     * The shared positions of the ring.
+     */
+    private RingHeader* header;
+    /**
+     * The slots of the ring.
+     */
+    private Packet* packets;
+    /**
+     * The number of slots. It is a power of two.
+     */
+    private uint capacity;
+
+    /**
+     * Create a new ring view.
+     *
+     * @param header      The shared positions of the ring.
+     * @param packets     The slots of the ring.
+     * @param capacity    The number of slots. It must be a power of two.
+     */
+    public Ring(RingHeader* header, Packet* packets, uint capacity) {
+        assert(capacity > 0 && (capacity & (capacity - 1)) == 0);
+        this.header = header;
+        this.packets = packets;
+        this.capacity = capacity;
+    }
+
+    /**
+     * Move packets from the queue to the ring. Used only by the producer.
+     *
+     * @param queue    The queue of outgoing packets.
+     * @param trace    Whether to stamp {@link Packet.published_at}.
+     * @return The number of packets written.
+     */
+    public uint write(Queue<Packet?> queue, bool trace) {
+        var head = atomic_uint_load(&header->head, ATOMIC_RELAXED);
+        var tail = atomic_uint_load(&header->tail, ATOMIC_ACQUIRE);
+        var free = capacity - (head - tail);
+        var now = trace ? get_monotonic_ns() : 0;
+        uint count = 0;
+        while (count < free && !queue.is_empty()) {
+            Packet* slot = &packets[(head + count) & (capacity - 1)];
+            *slot = queue.pop_head();
+            slot->published_at = now;
+            count++;
+        }
+        if (count > 0) {
+            atomic_uint_store(&header->head, head + count, ATOMIC_RELEASE);
+        }
+        return count;
+    }
+
+    /**
+     * Move packets from the ring to the queue. Used only by the consumer.
+     *
+     * @param queue       The queue of incoming packets.
+     * @param was_full    Whether the ring was full, so that the producer may be waiting for free slots.
+     * @param trace       Whether to stamp {@link Packet.received_at}.
+     * @return The number of packets read.
+     */
+    public uint read(Queue<Packet?> queue, out bool was_full, bool trace) {
+        var tail = atomic_uint_load(&header->tail, ATOMIC_RELAXED);
+        var head = atomic_uint_load(&header->head, ATOMIC_ACQUIRE);
+        var count = head - tail;
+        was_full = count >= capacity;
+        var now = trace ? get_monotonic_ns() : 0;
+        for (uint i = 0; i < count; i++) {
+            Packet packet = packets[(tail + i) & (capacity - 1)];
+            packet.received_at = now;
+            queue.push_tail(packet);
+        }
+        if (count > 0) {
+            atomic_uint_store(&header->tail, head, ATOMIC_RELEASE);
+        }
+        return count;
+    }
+}
+
+} // namespace Shmch
@@ -0,0 +1,564 @@
+/* A channel server with multiple clients.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * A server of binary message channels with multiple clients.
+ *
+ * A single {@link Channel} connects exactly one client with one server. The channel server creates a client
+ * registry in the shared memory of its name and a channel of its own for each of {@link max_clients} entries
+ * of the registry. A client opens a {@link Channel} in {@link Mode.CLIENT} with the name of the server as usual,
+ * it claims a free entry of the registry and talks to the server over the channel of that entry. All clients ring
+ * the same doorbell, so that a single {@link send_receive} call services all of them.
+ *
+ * Incoming requests and notifications are passed to the callbacks together with the index of the client.
+ * Responses are routed to the channel of the client the request came from. When a client closes its channel,
+ * the server recreates the channel of its entry for the next client.
+ *
+ * The server holds references to the channels of clients, which hold references to the server in turn,
+ * so it must be {@link close}d to be released.
+ */
+public class ChannelServer {
+    /**
+     * The name of the server.
+     */
+    public string name {get; private set;}
+    /**
+     * The maximal number of connected clients.
+     */
+    public uint max_clients {get; private set;}
+    /**
+     * The number of connected clients.
+     */
+    public uint n_clients {get; private set; default = 0;}
+    /**
+     * Whether the server is open.
+     */
+    public bool is_opened {get; private set; default = false;}
+    /**
+     * The capacity of the payload arena of the channel of each client, see {@link Channel.arena_size}.
+     */
+    public uint arena_size {get; set; default = 0;}
+    /**
+     * The number of slots of the channel of each client, see {@link Channel.slot_capacity}.
+     */
+    public uint slot_capacity {get; set; default = 0;}
+    /**
+     * The size of the segment pool of the channel of each client, see {@link Channel.pool_size}.
+     */
+    public uint pool_size {get; set; default = 0;}
+    /**
+     * The shared memory of the registry.
+     */
+    private Shmem? shmem = null;
+    /**
+     * The header of the registry.
+     */
+    private RegistryHeader* header = null;
+    /**
+     * The entries of the registry.
+     */
+    private ClientEntry* entries = null;
+    /**
+     * The doorbell rung by all clients.
+     */
+    private Doorbell? doorbell = null;
+    /**
+     * The channels of clients indexed by the entries of the registry.
+     */
+    private Channel?[]? channels = null;
+    /**
+     * Whether the client of each entry is known to be connected.
+     */
+    private bool[]? connected = null;
+    /**
+     * The callback to process incoming requests.
+     */
+    private ClientRequestCallback? request_callback = null;
+    /**
+     * The callback to process incoming notifications.
+     */
+    private ClientDataCallback? notification_callback = null;
+    /**
+     * The callback to be called when a client connects or disconnects.
+     */
+    private ClientStateCallback? client_callback = null;
+
+    /**
+     * Create a new closed channel server.
+     *
+     * @param name           The name of the server. It must contains only a single `/` at the very beginning
+     *                       and not exceed 240 characters.
+     * @param max_clients    The maximal number of connected clients.
+     */
+    public ChannelServer(string name, uint max_clients) requires (max_clients > 0) {
+        this.name = name;
+        this.max_clients = max_clients;
+    }
+
+    ~ChannelServer() {
+        if (is_opened) {
+            try {
+                close();
+            } catch (Error e) {
+                debug("Failed to close the channel server '%s' in the destructor. %s", name, e.message);
+            }
+        }
+    }
+
+    /**
+     * Get the size of the shared memory of a registry.
+     *
+     * @param max_clients    The number of entries.
+     * @return The size in bytes.
+     */
+    internal static ulong get_registry_size(uint max_clients) {
+        return sizeof(RegistryHeader) + (ulong) max_clients * sizeof(ClientEntry);
+    }
+
+    /**
+     * Get the name of the channel of a client.
+     *
+     * @param name     The name of the server.
+     * @param index    The index of the client.
+     * @return The name of the channel.
+     */
+    internal static string get_client_channel_name(string name, uint index) {
+        return "%s.%u".printf(name, index);
+    }
+
+    /**
+     * Open the server.
+     *
+     * The registry and the channels of all entries are created. Clients can connect once it returns.
+     *
+     * @throws Error on failure: {@link Error.ALREADY_OPEN}, {@link Error.INVALID_NAME}, {@link Error.INVALID_SIZE},
+     *     {@link Error.SHM_OPEN_FAILED}.
+     */
+    public void open() throws Error {
+        if (is_opened) {
+            throw new Error.ALREADY_OPEN("The channel server '%s' has already been opened.", name);
+        }
+        shmem = new Shmem(name, get_registry_size(max_clients), true, true);
+        header = (RegistryHeader*) shmem.pointer;
+        entries = (ClientEntry*) ((uint8*) shmem.pointer + sizeof(RegistryHeader));
+        channels = new Channel?[max_clients];
+        connected = new bool[max_clients];
+        try {
+            doorbell = new Doorbell(Doorbell.get_path(name, "to-server"), true, true);
+            for (uint i = 0; i < max_clients; i++) {
+                channels[i] = create_client_channel(i);
+                entries[i].state = (uint) ClientState.FREE;
+            }
+        } catch (Error e) {
+            close_channels();
+            if (doorbell != null) {
+                doorbell.close();
+                doorbell = null;
+            }
+            header = null;
+            entries = null;
+            shmem.close();
+            shmem = null;
+            throw e;
+        }
+        header->version = PROTOCOL_VERSION;
+        header->max_clients = max_clients;
+        atomic_uint_store(&header->magic, REGISTRY_MAGIC, ATOMIC_RELEASE);
+        is_opened = true;
+    }
+
+    /**
+     * Create and open the channel of a client.
+     *
+     * @param index    The index of the client.
+     * @return The channel.
+     * @throws Error on failure: {@link Error.INVALID_NAME}, {@link Error.INVALID_SIZE},
+     *     {@link Error.SHM_OPEN_FAILED}.
+     */
+    private Channel create_client_channel(uint index) throws Error {
+        var channel = new Channel(get_client_channel_name(name, index), Mode.SERVER);
+        channel.hub_name = name;
+        channel.arena_size = arena_size;
+        channel.slot_capacity = slot_capacity;
+        channel.pool_size = pool_size;
+        channel.set_request_callback((request) => {
+            if (request_callback != null) {
+                request_callback(index, request);
+            }
+        });
+        channel.set_notification_callback((data) => {
+            if (notification_callback != null) {
+                notification_callback(index, data);
+            }
+        });
+        channel.open();
+        return channel;
+    }
+
+    /**
+     * Close the channels of all clients.
+     *
+     * @throws Error on failure: {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private void close_channels() throws Error {
+        Error? error = null;
+        for (uint i = 0; i < channels.length; i++) {
+            var channel = (owned) channels[i];
+            if (channel != null && channel.is_opened) {
+                try {
+                    channel.close();
+                } catch (Error e) {
+                    error = e.copy();
+                }
+            }
+        }
+        channels = null;
+        connected = null;
+        n_clients = 0;
+        if (error != null) {
+            throw (owned) error;
+        }
+    }
+
+    /**
+     * Get the channel of a client.
+     *
+     * The channel can be used to send notifications and requests to the client and to inspect its statistics.
+     * It is recreated when the client disconnects.
+     *
+     * @param index    The index of the client.
+     * @return The channel or `null` if the client is not connected.
+     * @throws Error on failure: {@link Error.CLOSED}.
+     */
+    public unowned Channel? get_client(uint index) throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel server '%s' is closed.", name);
+        }
+        return index < max_clients && connected[index] ? channels[index] : null;
+    }
+
+    /**
+     * Get the file descriptor to watch for incoming data.
+     *
+     * The file descriptor becomes readable when any client has published packets or connected or disconnected.
+     * Then call {@link send_receive}. The file descriptor is owned by the server and it is valid until the server
+     * is {@link close}d.
+     *
+     * @return The file descriptor.
+     * @throws Error on failure: {@link Error.CLOSED}.
+     */
+    public int get_wakeup_fd() throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel server '%s' is closed.", name);
+        }
+        return doorbell.fd;
+    }
+
+    /**
+     * Get a duplicate of the file descriptor to watch for incoming data.
+     *
+     * Same as {@link get_wakeup_fd} but the caller owns the returned file descriptor and is responsible to close it.
+     *
+     * @return The file descriptor.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.SHM_OPEN_FAILED}.
+     */
+    public int dup_wakeup_fd() throws Error {
+        var fd = Posix.dup(get_wakeup_fd());
+        posix_die_if(fd < 0, SHM_OF, "Failed to duplicate the wakeup fd of channel server '%s'.".printf(name));
+        return fd;
+    }
+
+    /**
+     * Wait until there is any work for {@link send_receive}.
+     *
+     * The wait ends early when the deadline of a pending request passes, see {@link get_next_timeout}.
+     *
+     * @param timeout    The timeout in milliseconds. A negative value means an infinite timeout.
+     * @return `true` if there is any work, `false` on timeout.
+     * @throws Error on failure: {@link Error.CLOSED}.
+     */
+    public bool wait_for_data(int timeout) throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel server '%s' is closed.", name);
+        }
+        var next_timeout = get_next_timeout();
+        if (next_timeout >= 0 && (timeout < 0 || next_timeout <= timeout)) {
+            doorbell.wait(next_timeout);
+            return true;
+        }
+        return doorbell.wait(timeout);
+    }
+
+    /**
+     * Get the time until the nearest deadline of a pending request to any client.
+     *
+     * @return The timeout in milliseconds or `-1` if no pending request has a deadline.
+     */
+    public int get_next_timeout() {
+        var result = -1;
+        if (is_opened) {
+            for (uint i = 0; i < max_clients; i++) {
+                if (connected[i]) {
+                    var timeout = channels[i].get_next_timeout();
+                    if (timeout >= 0 && (result < 0 || timeout < result)) {
+                        result = timeout;
+                    }
+                }
+            }
+        }
+        return result;
+    }
+
+    /**
+     * Set callback to be called to handle incoming requests.
+     *
+     * The response is sent to the client the request came from.
+     * The callback is executed in the thread the {@link send_receive} method is called in.
+     *
+     * @param callback    The request callback.
+     */
+    public void set_request_callback(owned ClientRequestCallback? callback) {
+        this.request_callback = (owned) callback;
+    }
+
+    /**
+     * Set callback to be called to handle incoming notifications.
+     *
+     * The data of the notification must be used immediately or a copy must be made.
+     * The callback is executed in the thread the {@link send_receive} method is called in.
+     *
+     * @param callback    The notification callback.
+     */
+    public void set_notification_callback(owned ClientDataCallback? callback) {
+        this.notification_callback = (owned) callback;
+    }
+
+    /**
+     * Set callback to be called when a client connects or disconnects.
+     *
+     * The callback is executed in the thread the {@link send_receive} method is called in.
+     *
+     * @param callback    The client callback.
+     */
+    public void set_client_callback(owned ClientStateCallback? callback) {
+        this.client_callback = (owned) callback;
+    }
+
+    /**
+     * Send a notification to a client.
+     *
+     * @param client    The index of the client.
+     * @param data      The notification data.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.WOULD_BLOCK}, {@link Error.SHM_OPEN_FAILED},
+     *     {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void notify(uint client, uint8[] data) throws Error {
+        get_connected_client(client).notify(data);
+    }
+
+    /**
+     * Send a request to a client.
+     *
+     * The callback is executed in the thread the {@link send_receive} method is called in.
+     *
+     * @param client               The index of the client.
+     * @param data                 The request data.
+     * @param response_callback    The callback to be called when a response arrives.
+     * @return The request id, which is unique for the client.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.RESOURCE_LIMIT}, {@link Error.WOULD_BLOCK},
+     *     {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public uint request(uint client, uint8[] data, owned DataCallback response_callback) throws Error {
+        return get_connected_client(client).request(data, (owned) response_callback);
+    }
+
+    /**
+     * Get the channel of a connected client.
+     *
+     * @param client    The index of the client.
+     * @return The channel.
+     * @throws Error on failure: {@link Error.CLOSED}.
+     */
+    private unowned Channel get_connected_client(uint client) throws Error {
+        unowned Channel? channel = get_client(client);
+        if (channel == null) {
+            throw new Error.CLOSED("The client %u of channel server '%s' is not connected.", client, name);
+        }
+        return channel;
+    }
+
+    /**
+     * Send and receive messages of all clients.
+     *
+     * This method should be called whenever {@link get_wakeup_fd} becomes readable or {@link wait_for_data} returns
+     * `true`. It also handles clients which have connected or disconnected since the last call.
+     *
+     * A failure of one client does not stall the others: it is logged and the client is disconnected. A client
+     * which cannot be disconnected yet, e.g. because leases of its payloads are held, is retried in the next call.
+     *
+     * @return `True` if any data have been received or sent.
+     * @throws Error on failure: {@link Error.CLOSED}.
+     */
+    public bool send_receive() throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel server '%s' is closed.", name);
+        }
+        doorbell.drain();
+        var result = false;
+        for (uint i = 0; i < max_clients; i++) {
+            switch ((ClientState) atomic_uint_get(&entries[i].state)) {
+            case ClientState.CONNECTED:
+                if (!connected[i]) {
+                    connected[i] = true;
+                    n_clients++;
+                    if (client_callback != null) {
+                        client_callback(i, true);
+                    }
+                }
+                try {
+                    if (channels[i].send_receive(false)) {
+                        result = true;
+                    }
+                } catch (Error e) {
+                    warning("Disconnecting client %u of channel server '%s': %s", i, name, e.message);
+                    if (atomic_uint_compare_and_exchange(
+                        &entries[i].state, (uint) ClientState.CONNECTED, (uint) ClientState.LEAVING)) {
+                        // The doorbell has already been drained, so the next call has to be triggered.
+                        doorbell.ring();
+                    }
+                }
+                break;
+            case ClientState.LEAVING:
+                try {
+                    if (channels[i] != null && channels[i].is_opened && channels[i].send_receive(false)) {
+                        result = true;
+                    }
+                } catch (Error e) {
+                    warning("Failed to receive from client %u of channel server '%s': %s", i, name, e.message);
+                }
+                try {
+                    disconnect_client(i);
+                } catch (Error e) {
+                    if (!(e is Error.BUSY)) {
+                        warning("Failed to disconnect client %u of channel server '%s': %s", i, name, e.message);
+                    }
+                }
+                break;
+            default:
+                break;
+            }
+        }
+        return result;
+    }
+
+    /**
+     * Disconnect a client which has left and recreate its channel for the next one.
+     *
+     * Pending requests to the client are dropped.
+     *
+     * @param index    The index of the client.
+     * @throws Error on failure: {@link Error.BUSY}, {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    private void disconnect_client(uint index) throws Error {
+        if (connected[index]) {
+            connected[index] = false;
+            n_clients--;
+            if (client_callback != null) {
+                client_callback(index, false);
+            }
+        }
+        if (channels[index] != null) {
+            if (channels[index].is_opened) {
+                // Fails with Error.BUSY until the leases of payloads from the client are released.
+                channels[index].close();
+            }
+            channels[index] = null;
+        }
+        // If it fails, it is retried in the next send_receive call because the entry is still leaving.
+        channels[index] = create_client_channel(index);
+        // The next client must not be mistaken for the dead process before it stores its own pid.
+        atomic_uint_set(&entries[index].pid, 0);
+        atomic_uint_set(&entries[index].state, (uint) ClientState.FREE);
+    }
+
+    /**
+     * Disconnect clients whose processes no longer exist.
+     *
+     * A client which crashes cannot leave the registry, so call this method from time to time to free its entry.
+     * The clients are disconnected in the next {@link send_receive} call.
+     *
+     * @return The number of dead clients.
+     * @throws Error on failure: {@link Error.CLOSED}.
+     */
+    public uint collect_dead_clients() throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel server '%s' is closed.", name);
+        }
+        uint n_dead = 0;
+        for (uint i = 0; i < max_clients; i++) {
+            var pid = (Posix.pid_t) atomic_uint_get(&entries[i].pid);
+            // The pid of a dead client may have been reused by another process, so the start time is compared too.
+            if (pid > 0 && is_process_gone(pid, entries[i].start_time)
+            && atomic_uint_compare_and_exchange(
+                &entries[i].state, (uint) ClientState.CONNECTED, (uint) ClientState.LEAVING)) {
+                n_dead++;
+            }
+        }
+        if (n_dead > 0) {
+            doorbell.ring();
+        }
+        return n_dead;
+    }
+
+    /**
+     * Close the server.
+     *
+     * The registry and the channels of all clients are destroyed.
+     *
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public void close() throws Error {
+        if (!is_opened) {
+            throw new Error.CLOSED("The channel server '%s' is closed.", name);
+        }
+        atomic_uint_store(&header->magic, 0, ATOMIC_RELEASE);
+        header = null;
+        entries = null;
+        try {
+            close_channels();
+        } finally {
+            doorbell.close();
+            doorbell = null;
+            try {
+                shmem.close();
+            } finally {
+                shmem = null;
+                is_opened = false;
+            }
+        }
+    }
+}
+
+} // namespace Shmch
@@ -22,6 +22,35 @@
 
 namespace Shmch {
 
+/**
+ * The size of the header at the beginning of a growable {@link Shmem}. The data follow the header.
+ */
+private const ulong SHMEM_HEADER_SIZE = 64;
+/**
+ * The magic number of the header of a growable {@link Shmem}.
+ */
+private const uint SHMEM_MAGIC = 0x53484d47; // "SHMG"
+
+
+/**
+ * The header at the beginning of a growable {@link Shmem}.
+ */
+private struct ShmemHeader {
+    /**
+     * The magic number {@link SHMEM_MAGIC}. Accessed atomically.
+     */
+    public uint magic;
+    /**
+     * The generation incremented by every {@link Shmem.resize}. Accessed atomically.
+     */
+    public uint generation;
+    /**
+     * The size of the data. It is written before the generation is incremented.
+     */
+    public uint64 size;
+}
+
+
 /**
  * A wrapper around POSIX shared memory primitives.
  */
@@ -38,6 +67,24 @@ public class Shmem {
      * The pointer to the shared memory buffer.
      */
     public void* pointer {get; private set; default = null;}
+    /**
+     * The options of the mapping.
+     */
+    public ShmemFlags flags {get; private set; default = ShmemFlags.NONE;}
+    /**
+     * The generation of a growable shared memory this mapping corresponds to.
+     *
+     * It is incremented by every {@link resize} and other peers catch up with {@link refresh}.
+     */
+    public uint generation {get; private set; default = 0;}
+    /**
+     * The whole mapping. It differs from {@link pointer} if there is a header of a growable shared memory.
+     */
+    private void* mapping = null;
+    /**
+     * The size of {@link mapping}.
+     */
+    private ulong mapped_size = 0;
     /**
      * The shared memory fd.
      */
@@ -64,12 +111,31 @@ public class Shmem {
      *     {@link Error.SHM_OPEN_FAILED}.
      */
     public Shmem(string name, ulong size, bool create, bool discard) throws Error {
+        this.with_flags(name, size, create, discard, ShmemFlags.NONE);
+    }
+
+    /**
+     * Create or open POSIX shared memory with extra mapping options.
+     *
+     * Prefaulting and hugepages pay off for large regions, which would otherwise take a page fault on the first
+     * touch of every page.
+     *
+     * @param name       The shared memory name. See {@link Shmem.Shmem}.
+     * @param size       The shared memory size. See {@link Shmem.Shmem}.
+     * @param create     Whether to create new shared memory region or to open an existing one.
+     * @param discard    Whether to discard the shared memory region or let it be alive upon {@link close}.
+     * @param flags      The options of the mapping. Both sides must agree on {@link ShmemFlags.GROWABLE}.
+     * @throws Error on failure: {@link Error.INVALID_NAME}, {@link Error.INVALID_SIZE},
+     *     {@link Error.SHM_OPEN_FAILED}, {@link Error.INCOMPATIBLE}.
+     */
+    public Shmem.with_flags(string name, ulong size, bool create, bool discard, ShmemFlags flags) throws Error {
         if (name == null || name[0] != '/' || name.index_of_char('/', 1) >= 0 || name.length > 255) {
             throw new Error.INVALID_NAME("The shmem name '%s' is invalid.", name);
         }
         this.name = name;
         this.size = size;
         this.discard = discard;
+        this.flags = flags;
         if (create) {
             if (size == 0) {
                 throw new Error.INVALID_SIZE("Size > 0 must be specified to create shmem '%s'.", name);
@@ -79,10 +145,17 @@ public class Shmem {
             posix_die_if(fd < 0, 1, "Failed to open shmem '%s'.".printf(name));
             try {
                 try {
-                    posix_die_if(Posix.ftruncate(fd, size) < 0, SHM_OF, "Failed to set shmem '%s' size.".printf(name));
-                    void* buf = Posix.mmap(null, size, Posix.PROT_READ|Posix.PROT_WRITE, Posix.MAP_SHARED, fd, 0);
-                    posix_die_if(Posix.MAP_FAILED == buf, SHM_OF, "Failed to map shmem '%s' size.".printf(name));
-                    this.pointer = buf;
+                    var header_size = ShmemFlags.GROWABLE in flags ? SHMEM_HEADER_SIZE : 0;
+                    mapped_size = size + header_size;
+                    posix_die_if(
+                        Posix.ftruncate(fd, mapped_size) < 0, SHM_OF, "Failed to set shmem '%s' size.".printf(name));
+                    mapping = map(fd, mapped_size);
+                    this.pointer = (uint8*) mapping + header_size;
+                    if (header_size > 0) {
+                        unowned ShmemHeader? header = (ShmemHeader?) mapping;
+                        header.size = size;
+                        atomic_uint_store(&header.magic, SHMEM_MAGIC, ATOMIC_RELEASE);
+                    }
                 } finally {
                     posix_warn_if(Posix.close(fd) < 0, "Failed to close shmem '%s' fd.".printf(name));
                     fd = -1;
@@ -90,6 +163,7 @@ public class Shmem {
             } catch (Error e) {
                 size = 0;
                 pointer = null;
+                mapped_size = 0;
                 shm_unlink(name);
                 throw e;
             }
@@ -100,16 +174,20 @@ public class Shmem {
                 try {
                     Posix.Stat stat;
                     posix_die_if(Posix.fstat(fd, out stat) < 0, SHM_OF, "Failed to stat shm '%s'.".printf(name));
-                    if (size == 0) {
+                    if (ShmemFlags.GROWABLE in flags) {
+                        open_growable(fd, (ulong) stat.st_size, size);
+                    } else if (size == 0) {
                         this.size = size = stat.st_size;
                     } else if (size > stat.st_size) {
                         throw new Error.INVALID_SIZE(
                             "The specified size %s of shmem '%s' is greater than the actual size %d.",
                             size.to_string(), name, (int) stat.st_size);
                     }
-                    void* buf = Posix.mmap(null, size, Posix.PROT_READ|Posix.PROT_WRITE, Posix.MAP_SHARED, fd, 0);
-                    posix_die_if(Posix.MAP_FAILED == buf, SHM_OF, "Failed to map shmem '%s'.".printf(name));
-                    this.pointer = buf;
+                    if (!(ShmemFlags.GROWABLE in flags)) {
+                        mapped_size = size;
+                        mapping = map(fd, size);
+                        this.pointer = mapping;
+                    }
                 } finally {
                     posix_warn_if(Posix.close(fd) < 0, "Failed to close shmem '%s' fd.".printf(name));
                     fd = -1;
@@ -130,6 +208,202 @@ public class Shmem {
         }
     }
 
+    /**
+     * Map an existing growable shared memory and validate its header.
+     *
+     * The whole file is mapped, because it may have been already extended for a resize in progress.
+     *
+     * @param fd           The shared memory fd.
+     * @param file_size    The size of the shared memory file.
+     * @param size         The requested size or 0 to use the size from the header.
+     * @throws Error on failure: {@link Error.INVALID_SIZE}, {@link Error.SHM_OPEN_FAILED},
+     *     {@link Error.INCOMPATIBLE}.
+     */
+    private void open_growable(int fd, ulong file_size, ulong size) throws Error {
+        if (file_size < SHMEM_HEADER_SIZE) {
+            throw new Error.INCOMPATIBLE("The shmem '%s' is not growable.", name);
+        }
+        mapping = map(fd, file_size);
+        mapped_size = file_size;
+        unowned ShmemHeader? header = (ShmemHeader?) mapping;
+        try {
+            if (atomic_uint_load(&header.magic, ATOMIC_ACQUIRE) != SHMEM_MAGIC) {
+                throw new Error.INCOMPATIBLE("The shmem '%s' is not growable.", name);
+            }
+            generation = atomic_uint_load(&header.generation, ATOMIC_ACQUIRE);
+            var actual_size = (ulong) header.size;
+            if (actual_size > file_size - SHMEM_HEADER_SIZE) {
+                throw new Error.INCOMPATIBLE("The header of shmem '%s' is corrupted.", name);
+            }
+            if (size > actual_size) {
+                throw new Error.INVALID_SIZE(
+                    "The specified size %s of shmem '%s' is greater than the actual size %s.",
+                    size.to_string(), name, actual_size.to_string());
+            }
+            this.size = size == 0 ? actual_size : size;
+            this.pointer = (uint8*) mapping + SHMEM_HEADER_SIZE;
+        } catch (Error e) {
+            posix_warn_if(Posix.munmap(mapping, mapped_size) < 0, "Failed to unmap shmem '%s'.".printf(name));
+            mapping = null;
+            mapped_size = 0;
+            throw e;
+        }
+    }
+
+    /**
+     * Grow a shared memory created or opened with {@link ShmemFlags.GROWABLE}.
+     *
+     * The shared memory file is extended and the mapping is remapped in place if possible. Otherwise it is moved,
+     * which invalidates {@link pointer} and buffers returned by {@link get_buffer}. The generation in the header
+     * is incremented, so that other peers can pick up the new size with {@link refresh}. Only one peer
+     * may resize the shared memory.
+     *
+     * @param new_size    The new size. It must not be smaller than the current {@link size}.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.INVALID_SIZE}, {@link Error.SHM_OPEN_FAILED}.
+     */
+    public void resize(ulong new_size) throws Error {
+        if (mapping == null) {
+            throw new Error.CLOSED("The shmem '%s' is closed.", name);
+        }
+        if (!(ShmemFlags.GROWABLE in flags)) {
+            throw new Error.INVALID_SIZE("The shmem '%s' is not growable.", name);
+        }
+        if (new_size < size) {
+            throw new Error.INVALID_SIZE(
+                "The shmem '%s' cannot shrink from %s to %s.", name, size.to_string(), new_size.to_string());
+        }
+        refresh();
+        if (new_size == size) {
+            return;
+        }
+        var file_size = new_size + SHMEM_HEADER_SIZE;
+        var shm_fd = shm_open(name, Posix.O_RDWR, 0);
+        posix_die_if(shm_fd < 0, SHM_OF, "Failed to open shmem '%s'.".printf(name));
+        try {
+            Posix.Stat stat;
+            posix_die_if(Posix.fstat(shm_fd, out stat) < 0, SHM_OF, "Failed to stat shm '%s'.".printf(name));
+            if ((ulong) stat.st_size < file_size) {
+                posix_die_if(
+                    Posix.ftruncate(shm_fd, file_size) < 0, SHM_OF, "Failed to set shmem '%s' size.".printf(name));
+            }
+        } finally {
+            posix_warn_if(Posix.close(shm_fd) < 0, "Failed to close shmem '%s' fd.".printf(name));
+        }
+        remap(new_size);
+        unowned ShmemHeader? header = (ShmemHeader?) mapping;
+        header.size = new_size;
+        atomic_uint_store(&header.generation, ++generation, ATOMIC_RELEASE);
+    }
+
+    /**
+     * Whether a growable shared memory has been resized by another peer and {@link refresh} is necessary.
+     *
+     * @return `true` if the generation in the header differs from {@link generation}.
+     */
+    public bool is_stale() {
+        if (mapping == null || !(ShmemFlags.GROWABLE in flags)) {
+            return false;
+        }
+        unowned ShmemHeader? header = (ShmemHeader?) mapping;
+        return atomic_uint_load(&header.generation, ATOMIC_ACQUIRE) != generation;
+    }
+
+    /**
+     * Pick up a new size of a growable shared memory resized by another peer.
+     *
+     * It is cheap enough to be called before every access, because it only compares the generation in the header
+     * with {@link generation} unless the shared memory has been resized. The mapping may move, see {@link resize}.
+     *
+     * @return `true` if the mapping has been updated, `false` otherwise.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}.
+     */
+    public bool refresh() throws Error {
+        if (mapping == null || !(ShmemFlags.GROWABLE in flags)) {
+            return false;
+        }
+        unowned ShmemHeader? header = (ShmemHeader?) mapping;
+        var current = atomic_uint_load(&header.generation, ATOMIC_ACQUIRE);
+        if (current == generation) {
+            return false;
+        }
+        remap((ulong) header.size);
+        generation = current;
+        return true;
+    }
+
+    /**
+     * Extend the mapping of a growable shared memory.
+     *
+     * The mapping keeps the advice and locking of {@link flags}, but new pages are not prefaulted.
+     *
+     * @param new_size    The new size of the data.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}.
+     */
+    private void remap(ulong new_size) throws Error {
+        var new_mapped_size = new_size + SHMEM_HEADER_SIZE;
+        if (new_mapped_size > mapped_size) {
+            void* buf = mremap(mapping, mapped_size, new_mapped_size, MREMAP_MAYMOVE);
+            posix_die_if(Posix.MAP_FAILED == buf, SHM_OF, "Failed to remap shmem '%s'.".printf(name));
+            mapping = buf;
+            mapped_size = new_mapped_size;
+        }
+        pointer = (uint8*) mapping + SHMEM_HEADER_SIZE;
+        size = new_size;
+    }
+
+    /**
+     * Map the shared memory according to {@link flags}.
+     *
+     * @param fd      The shared memory fd.
+     * @param size    The size of the mapping.
+     * @return The pointer to the mapping.
+     * @throws Error on failure: {@link Error.SHM_OPEN_FAILED}.
+     */
+    private void* map(int fd, ulong size) throws Error {
+        var mmap_flags = Posix.MAP_SHARED;
+        var hugepages = ShmemFlags.HUGEPAGES in flags;
+        // Hugepages must be advised before the pages are faulted in, otherwise small pages would be used.
+        if (ShmemFlags.POPULATE in flags && !hugepages) {
+            mmap_flags |= MAP_POPULATE;
+        }
+        void* buf = Posix.mmap(null, size, Posix.PROT_READ|Posix.PROT_WRITE, mmap_flags, fd, 0);
+        posix_die_if(Posix.MAP_FAILED == buf, SHM_OF, "Failed to map shmem '%s'.".printf(name));
+        if (hugepages) {
+            // Only advisory: the kernel may not support transparent hugepages for shared memory.
+            posix_warn_if(
+                madvise(buf, size, MADV_HUGEPAGE) < 0, "Failed to enable hugepages for shmem '%s'.".printf(name));
+            if (ShmemFlags.POPULATE in flags) {
+                prefault(buf, size);
+            }
+        }
+        if (ShmemFlags.WILL_NEED in flags) {
+            posix_warn_if(madvise(buf, size, MADV_WILLNEED) < 0, "Failed to advise shmem '%s'.".printf(name));
+        }
+        if (ShmemFlags.MLOCK in flags) {
+            posix_warn_if(mlock(buf, size) < 0, "Failed to lock shmem '%s' in memory.".printf(name));
+        }
+        return buf;
+    }
+
+    /**
+     * Fault in all pages of a mapping.
+     *
+     * It uses `MADV_POPULATE_WRITE` and falls back to touching every page with older kernels.
+     *
+     * @param buf     The mapping.
+     * @param size    The size of the mapping.
+     */
+    private static void prefault(void* buf, ulong size) {
+        if (madvise(buf, size, MADV_POPULATE_WRITE) == 0) {
+            return;
+        }
+        var page_size = (ulong) Posix.sysconf(Posix._SC_PAGESIZE);
+        for (ulong offset = 0; offset < size; offset += page_size) {
+            // An atomic load is not optimized out. A read fault of shared memory allocates the page too.
+            atomic_uint_load((uint*) ((uint8*) buf + offset), ATOMIC_RELAXED);
+        }
+    }
+
     /**
      * Get shared memory as a binary buffer.
      */
@@ -145,10 +419,13 @@ public class Shmem {
      * If it was opened with `discard` = `true`, it will be deleted as soon as when possible.
      */
     public void close() throws Error {
-        if (size > 0) {
-            posix_die_if(Posix.munmap(pointer, size) < 0, SHM_OF + 1, "Failed to unmap shmem '%s'.".printf(name));
-            size = 0;
+        if (mapping != null) {
+            posix_die_if(
+                Posix.munmap(mapping, mapped_size) < 0, SHM_OF + 1, "Failed to unmap shmem '%s'.".printf(name));
+            mapping = null;
+            mapped_size = 0;
         }
+        size = 0;
         pointer = null;
         fd = -1;
         if (discard) {
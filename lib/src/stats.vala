@@ -0,0 +1,204 @@
+/* Runtime statistics of channels.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+
+namespace Shmch {
+
+/**
+ * A statistic of a {@link Channel}.
+ *
+ * The values correspond to the fields of {@link Stats} in the same order.
+ */
+public enum Stat {
+    MESSAGES_SENT,
+    BYTES_SENT,
+    MESSAGES_RECEIVED,
+    BYTES_RECEIVED,
+    ARENA_PAYLOADS,
+    POOL_PAYLOADS,
+    SEGMENT_PAYLOADS,
+    SEND_RECEIVE_CALLS,
+    OUTGOING_RING_FULL,
+    INCOMING_RING_FULL,
+    DOORBELL_RINGS,
+    DOORBELL_DRAINS,
+    WAITS,
+    SEGMENTS_OPENED,
+    OUTGOING_QUEUE_LENGTH,
+    OUTGOING_QUEUE_MAX,
+    INCOMING_BATCH_MAX,
+    PENDING_REQUESTS,
+    REQUESTS_TIMED_OUT,
+    CREDIT_STALLS,
+    INLINE_PAYLOADS;
+}
+
+/**
+ * Runtime statistics of a {@link Channel}.
+ *
+ * The counters are cumulative since the channel was created or since {@link Channel.reset_stats} was called.
+ * They are updated by the thread which uses the channel, so that they cost no more than an increment.
+ */
+public struct Stats {
+    /**
+     * The number of queued outgoing messages.
+     */
+    public uint64 messages_sent;
+    /**
+     * The total size of queued outgoing payloads.
+     */
+    public uint64 bytes_sent;
+    /**
+     * The number of received messages.
+     */
+    public uint64 messages_received;
+    /**
+     * The total size of received payloads.
+     */
+    public uint64 bytes_received;
+    /**
+     * The number of outgoing payloads stored in the payload arena.
+     */
+    public uint64 arena_payloads;
+    /**
+     * The number of outgoing payloads stored in pooled segments.
+     */
+    public uint64 pool_payloads;
+    /**
+     * The number of outgoing payloads stored in dedicated segments.
+     */
+    public uint64 segment_payloads;
+    /**
+     * The number of calls of {@link Channel.send_receive}.
+     */
+    public uint64 send_receive_calls;
+    /**
+     * How many times the outgoing ring could not take all queued packets because the peer was lagging behind.
+     */
+    public uint64 outgoing_ring_full;
+    /**
+     * How many times the incoming ring was full when it was read, i.e. the peer had to wait for this side.
+     */
+    public uint64 incoming_ring_full;
+    /**
+     * The number of doorbell rings, each of them is a `write()` syscall.
+     */
+    public uint64 doorbell_rings;
+    /**
+     * The number of doorbell drains, each of them is a `read()` syscall.
+     */
+    public uint64 doorbell_drains;
+    /**
+     * The number of calls of {@link Channel.wait_for_data}, each of them is a `poll()` syscall.
+     */
+    public uint64 waits;
+    /**
+     * The number of dedicated shared memory segments created or opened, each of them costs several syscalls.
+     */
+    public uint64 segments_opened;
+    /**
+     * The current number of outgoing packets waiting for free slots in the outgoing ring.
+     */
+    public uint64 outgoing_queue_length;
+    /**
+     * The maximal number of outgoing packets waiting for free slots in the outgoing ring.
+     */
+    public uint64 outgoing_queue_max;
+    /**
+     * The maximal number of packets received by a single call of {@link Channel.send_receive}.
+     */
+    public uint64 incoming_batch_max;
+    /**
+     * The current number of requests waiting for a response.
+     */
+    public uint64 pending_requests;
+    /**
+     * The number of requests which have not been responded before their deadline.
+     */
+    public uint64 requests_timed_out;
+    /**
+     * How many times a message could not be sent because the peer had not granted enough credit.
+     */
+    public uint64 credit_stalls;
+    /**
+     * The number of outgoing payloads stored inline in their packets.
+     */
+    public uint64 inline_payloads;
+
+    /**
+     * Get a single statistic.
+     *
+     * @param stat    The statistic.
+     * @return The value of the statistic.
+     */
+    public uint64 get_value(Stat stat) {
+        switch (stat) {
+        case Stat.MESSAGES_SENT:
+            return messages_sent;
+        case Stat.BYTES_SENT:
+            return bytes_sent;
+        case Stat.MESSAGES_RECEIVED:
+            return messages_received;
+        case Stat.BYTES_RECEIVED:
+            return bytes_received;
+        case Stat.ARENA_PAYLOADS:
+            return arena_payloads;
+        case Stat.POOL_PAYLOADS:
+            return pool_payloads;
+        case Stat.SEGMENT_PAYLOADS:
+            return segment_payloads;
+        case Stat.SEND_RECEIVE_CALLS:
+            return send_receive_calls;
+        case Stat.OUTGOING_RING_FULL:
+            return outgoing_ring_full;
+        case Stat.INCOMING_RING_FULL:
+            return incoming_ring_full;
+        case Stat.DOORBELL_RINGS:
+            return doorbell_rings;
+        case Stat.DOORBELL_DRAINS:
+            return doorbell_drains;
+        case Stat.WAITS:
+            return waits;
+        case Stat.SEGMENTS_OPENED:
+            return segments_opened;
+        case Stat.OUTGOING_QUEUE_LENGTH:
+            return outgoing_queue_length;
+        case Stat.OUTGOING_QUEUE_MAX:
+            return outgoing_queue_max;
+        case Stat.INCOMING_BATCH_MAX:
+            return incoming_batch_max;
+        case Stat.PENDING_REQUESTS:
+            return pending_requests;
+        case Stat.REQUESTS_TIMED_OUT:
+            return requests_timed_out;
+        case Stat.CREDIT_STALLS:
+            return credit_stalls;
+        case Stat.INLINE_PAYLOADS:
+            return inline_payloads;
+        default:
+            assert_not_reached();
+        }
+    }
+}
+
+} // namespace Shmch
@@ -0,0 +1,111 @@
+/* Outgoing streams of chunked data.
+ *
+ * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
+ *
+ * Licensed under the BSD-2-Clause license:
+ *
+ * Redistribution and use in source and binary forms, with or without* modification, are permitted provided that the
+ * following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+ *    disclaimer.
+ * 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+ *    following disclaimer in the documentation and/or other materials provided with the distribution.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+ * INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+ * WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+ * USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. */
+
+
+namespace Shmch {
+
+/**
+ * An outgoing stream opened by {@link Channel.open_stream}.
+ *
+ * The data of a stream are sent as a sequence of chunks, which are received by the callback set by
+ * {@link Channel.set_stream_callback} on the other side. The stream must be either {@link finish}ed
+ * or {@link abort}ed once all data have been written.
+ */
+public class OutgoingStream {
+    /**
+     * The id of the stream passed to the stream callback on the other side.
+     */
+    public uint id {get; private set;}
+    /**
+     * Whether the stream has been finished or aborted.
+     */
+    public bool finished {get; private set; default = false;}
+    /**
+     * The channel the stream is sent through.
+     */
+    private Channel channel;
+
+    /**
+     * Create a new outgoing stream.
+     *
+     * @param channel    The channel the stream is sent through.
+     * @param id         The id of the stream.
+     */
+    internal OutgoingStream(Channel channel, uint id) {
+        this.channel = channel;
+        this.id = id;
+    }
+
+    /**
+     * Send data as chunks of at most {@link Channel.stream_chunk_size} bytes.
+     *
+     * Like a non-blocking socket, only a part of the data is sent if the other side has not granted enough credit
+     * for all chunks. Use {@link Channel.wait_for_credit} before sending the rest.
+     *
+     * @param data    The data to send.
+     * @return The number of bytes sent.
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.WOULD_BLOCK} if no chunk can be sent,
+     *     {@link Error.SHM_OPEN_FAILED}, {@link Error.SHM_CLOSE_FAILED}.
+     */
+    public int write(uint8[] data) throws Error {
+        check_not_finished();
+        return channel.write_stream(id, data);
+    }
+
+    /**
+     * Finish the stream after all data have been written.
+     *
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.WOULD_BLOCK}.
+     */
+    public void finish() throws Error {
+        check_not_finished();
+        channel.end_stream(id, false);
+        finished = true;
+    }
+
+    /**
+     * Abort the stream, e.g. when the source of its data fails.
+     *
+     * @throws Error on failure: {@link Error.CLOSED}, {@link Error.WOULD_BLOCK}.
+     */
+    public void abort() throws Error {
+        check_not_finished();
+        channel.end_stream(id, true);
+        finished = true;
+    }
+
+    /**
+     * Fail if the stream or the channel is no longer usable.
+     *
+     * @throws Error if the stream has been finished or the channel is closed: {@link Error.CLOSED}.
+     */
+    private void check_not_finished() throws Error {
+        if (finished) {
+            throw new Error.CLOSED("The stream %u of channel '%s' has been finished.", id, channel.name);
+        }
+        if (!channel.is_opened) {
+            throw new Error.CLOSED("The channel '%s' is closed.", channel.name);
+        }
+    }
+}
+
+} // namespace Shmch
@@ -1,6 +1,7 @@
-/* This file contains definition of callbacks (DataCallback, SendResponseFunc, RequestCallback),
- * error domains (Error), enumerations (Mode, Flag), data structures (Packet, Slots), and
- * data classes (OutgoingRequest, IncomingReques).
+/* This file contains definition of callbacks (DataCallback, BatchResponseCallback, BatchCallback, SendResponseFunc,
+ * RequestCallback, TimeoutCallback), error domains (Error), enumerations (Mode, MessageKind, ShmemFlags, Flag,
+ * Storage), data structures (Packet, RingHeader, CreditHeader, ChannelHeader, BatchEntry), and data classes
+ * (OutgoingRequest, BatchResponse, IncomingReques, IncomingBatch).
  *
  * Copyright 2017 Jiří Janoušek <janousek.jiri@gmail.com>
  *
@@ -31,14 +32,38 @@ namespace Shmch {
  */
 public delegate void DataCallback(uint8[] data);
 
+/**
+ * The callback to be called when a response to a request from a batch arrives.
+ *
+ * @param index    The index of the request in the batch.
+ * @param data     The data of the response.
+ */
+public delegate void BatchResponseCallback(int index, uint8[] data);
+
+/**
+ * The callback to be called when a response frame to a request sent by {@link Channel.request_stream} arrives.
+ *
+ * @param data    The data of the frame.
+ * @param last    Whether it is the final response which ends the stream of frames.
+ */
+public delegate void StreamingResponseCallback(uint8[] data, bool last);
+
+/**
+ * The callback to be called when a batch of messages arrives.
+ *
+ * @param batch    The batch to process.
+ */
+public delegate void BatchCallback(IncomingBatch batch);
+
 /**
  * The callback to call when a response is available.
  *
- * @param id      The request id.
- * @param data    The data of the response.
+ * @param id         The request id.
+ * @param data       The data of the response.
+ * @param partial    Whether it is a partial response to be followed by more responses.
  * @throws Error on failure.
  */
-private delegate void SendResponseFunc(uint id, uint8[] data) throws Error;
+private delegate void SendResponseFunc(uint id, uint8[] data, bool partial) throws Error;
 
 /**
  * The callback to be called when a new request arrives.
@@ -47,6 +72,53 @@ private delegate void SendResponseFunc(uint id, uint8[] data) throws Error;
  */
 public delegate void RequestCallback(IncomingRequest request);
 
+/**
+ * The callback to be called for a channel.
+ *
+ * @param channel    The channel.
+ */
+public delegate void ChannelCallback(Channel channel);
+
+/**
+ * The callback to be called when a new request from a client of a {@link ChannelServer} arrives.
+ *
+ * @param client     The index of the client.
+ * @param request    The request to process.
+ */
+public delegate void ClientRequestCallback(uint client, IncomingRequest request);
+
+/**
+ * The callback to be called when data from a client of a {@link ChannelServer} is available.
+ *
+ * @param client    The index of the client.
+ * @param data      The data to process.
+ */
+public delegate void ClientDataCallback(uint client, uint8[] data);
+
+/**
+ * The callback to be called when a client connects to or disconnects from a {@link ChannelServer}.
+ *
+ * @param client       The index of the client.
+ * @param connected    Whether the client has connected or disconnected.
+ */
+public delegate void ClientStateCallback(uint client, bool connected);
+
+/**
+ * The callback to be called when a request has not been responded before its deadline.
+ *
+ * @param id    The id of the request.
+ */
+public delegate void TimeoutCallback(uint id);
+
+/**
+ * The callback to be called when a stream opened by {@link Channel.open_stream} on the other side changes.
+ *
+ * @param id       The id of the stream.
+ * @param event    What has happened to the stream.
+ * @param data     The metadata of a new stream, a chunk of the stream data or an empty array.
+ */
+public delegate void StreamCallback(uint id, StreamEvent event, uint8[] data);
+
 /**
  * Shared memory channel errors
  */
@@ -78,7 +150,19 @@ public errordomain Error {
     /**
      * When the requested action cannot be performed because of a resource limit.
      */
-    RESOURCE_LIMIT;
+    RESOURCE_LIMIT,
+    /**
+     * The other side of the channel uses an incompatible layout or configuration.
+     */
+    INCOMPATIBLE,
+    /**
+     * The message cannot be sent now because the other side has not granted enough credit.
+     */
+    WOULD_BLOCK,
+    /**
+     * The resource is still in use, e.g. a channel cannot be closed while leases of its payloads are held.
+     */
+    BUSY;
 
     /**
      * Return the quark of this error domain.
@@ -90,6 +174,7 @@ public errordomain Error {
 
 
 private const int SHM_OF = 4; // Error.SHM_OPEN_FAILED
+private const int MADV_POPULATE_WRITE = 23; // Since Linux 5.14, glibc headers older than 2.35 lack it.
 
 
 /**
@@ -108,6 +193,89 @@ public enum Mode {
 }
 
 
+/**
+ * The kind of a message in {@link IncomingBatch}.
+ */
+public enum MessageKind {
+    /**
+     * A notification without a response.
+     */
+    NOTIFICATION,
+    /**
+     * A request to be responded with {@link Channel.send_response}.
+     */
+    REQUEST,
+    /**
+     * A response to a request sent without a response callback.
+     */
+    RESPONSE;
+}
+
+
+/**
+ * The event passed to {@link StreamCallback}.
+ */
+public enum StreamEvent {
+    /**
+     * The other side has opened a new stream. The data contain its metadata.
+     */
+    OPEN,
+    /**
+     * A chunk of the stream data has arrived.
+     */
+    DATA,
+    /**
+     * The stream has been finished. No more chunks will arrive.
+     */
+    END,
+    /**
+     * The stream has been aborted by the sender. No more chunks will arrive.
+     */
+    ABORT;
+}
+
+
+/**
+ * Options of the mapping of a {@link Shmem}.
+ */
+[Flags]
+public enum ShmemFlags {
+    /**
+     * A plain shared mapping. Pages are faulted in on the first touch.
+     */
+    NONE = 0,
+    /**
+     * Fault in all pages of the mapping in advance (`MAP_POPULATE`).
+     */
+    POPULATE = 1 << 0,
+    /**
+     * Advise the kernel to back the mapping with transparent hugepages (`MADV_HUGEPAGE`).
+     *
+     * Shared memory lives in tmpfs, which honours the advice if `/sys/kernel/mm/transparent_hugepage/shmem_enabled`
+     * is `advise` or `always`.
+     */
+    HUGEPAGES = 1 << 1,
+    /**
+     * Advise the kernel that the whole mapping will be accessed soon (`MADV_WILLNEED`).
+     *
+     * Unlike {@link POPULATE}, it does not block, but it only reads swapped out pages ahead.
+     */
+    WILL_NEED = 1 << 2,
+    /**
+     * Lock the mapping in memory (`mlock`), which also faults in all its pages.
+     *
+     * It is subject to `RLIMIT_MEMLOCK`. A failure is only reported as a warning.
+     */
+    MLOCK = 1 << 3,
+    /**
+     * Reserve a header for {@link Shmem.resize} and {@link Shmem.refresh} at the beginning of the shared memory.
+     *
+     * The header is hidden from {@link Shmem.pointer} and {@link Shmem.size}. It is not supported by {@link Channel}.
+     */
+    GROWABLE = 1 << 4;
+}
+
+
 /**
  * Packet flags.
  */
@@ -140,7 +308,55 @@ private enum Flag {
      /**
      * The packet contains a notification sent from the client to the server.
      */
-     CLIENT_NOTIFICATION;
+     CLIENT_NOTIFICATION,
+     /**
+     * The packet opens a new stream and contains its metadata.
+     */
+     STREAM_OPEN,
+     /**
+     * The packet contains a chunk of a stream.
+     */
+     STREAM_DATA,
+     /**
+     * The packet finishes a stream.
+     */
+     STREAM_END,
+     /**
+     * The packet aborts a stream.
+     */
+     STREAM_ABORT,
+     /**
+     * The packet contains a partial response to be followed by more responses to the same request.
+     */
+     PARTIAL_RESPONSE;
+}
+
+
+/**
+ * Where the payload of a packet is stored.
+ */
+private enum Storage {
+    /**
+     * The payload is stored in a dedicated shared memory segment named {@link Packet.shm_name}.
+     */
+    SEGMENT,
+    /**
+     * The payload is stored in the payload arena of the sender at {@link Packet.offset}.
+     */
+    ARENA,
+    /**
+     * The payload is stored in a pooled shared memory segment named {@link Packet.shm_name},
+     * which must be released rather than discarded by the receiver.
+     */
+    POOL,
+    /**
+     * The payload is empty and it is not stored anywhere.
+     */
+    NONE,
+    /**
+     * The payload is stored in the packet itself in place of {@link Packet.shm_name}.
+     */
+    INLINE;
 }
 
 
@@ -157,7 +373,32 @@ private struct Packet {
      */
     public uint id;
     /**
-     * The name of the shared memory region where the data of this packet are.
+     * Where the payload is stored. See {@link Storage} for more details.
+     */
+    public Storage storage;
+    /**
+     * The position of the payload in the payload arena if stored there.
+     */
+    public uint offset;
+    /**
+     * The size of the payload if stored in the payload arena, a pooled segment or inline.
+     */
+    public uint size;
+    /**
+     * When the sender queued this packet if the sender traces latencies, see {@link Channel.tracing}.
+     */
+    public int64 queued_at;
+    /**
+     * When the sender published this packet in the ring if the sender traces latencies.
+     */
+    public int64 published_at;
+    /**
+     * When the receiver picked this packet up from the ring if the receiver traces latencies.
+     */
+    public int64 received_at;
+    /**
+     * The name of the shared memory region where the data of this packet are, or the payload itself if it is
+     * stored inline.
      */
     public uint8 shm_name[255];
 
@@ -171,30 +412,302 @@ private struct Packet {
     public Packet(Flag flag, uint id, string shm_name) {
         this.flag = flag;
         this.id = id;
+        this.storage = Storage.SEGMENT;
+        Posix.memcpy(this.shm_name, shm_name.data, shm_name.length + 1);
+    }
+
+    /**
+     * Create new packet metadata for a payload stored in the payload arena.
+     *
+     * @param flag        The purpose of this packet. See {@link Flag} for more details.
+     * @param id          The packed id used to pair requests with responses. Irrelevant for notifications.
+     * @param position    The position of the payload in the payload arena.
+     * @param size        The size of the payload.
+     */
+    public Packet.arena(Flag flag, uint id, uint position, uint size) {
+        this.flag = flag;
+        this.id = id;
+        this.storage = Storage.ARENA;
+        this.offset = position;
+        this.size = size;
+        this.shm_name[0] = 0;
+    }
+
+    /**
+     * Create new packet metadata for an empty payload.
+     *
+     * @param flag    The purpose of this packet. See {@link Flag} for more details.
+     * @param id      The packed id used to pair requests with responses. Irrelevant for notifications.
+     */
+    public Packet.empty(Flag flag, uint id) {
+        this.flag = flag;
+        this.id = id;
+        this.storage = Storage.NONE;
+        this.size = 0;
+        this.shm_name[0] = 0;
+    }
+
+    /**
+     * Create new packet metadata for a payload stored in the packet itself.
+     *
+     * @param flag    The purpose of this packet. See {@link Flag} for more details.
+     * @param id      The packed id used to pair requests with responses. Irrelevant for notifications.
+     * @param data    The payload. It must not be longer than {@link MAX_INLINE_SIZE}.
+     */
+    public Packet.inlined(Flag flag, uint id, uint8[] data) {
+        this.flag = flag;
+        this.id = id;
+        this.storage = Storage.INLINE;
+        this.size = data.length;
+        Posix.memcpy(this.shm_name, data, data.length);
+    }
+
+    /**
+     * Create new packet metadata for a payload stored in a pooled segment.
+     *
+     * @param flag        The purpose of this packet. See {@link Flag} for more details.
+     * @param id          The packed id used to pair requests with responses. Irrelevant for notifications.
+     * @param shm_name    The name of the pooled segment.
+     * @param size        The size of the payload.
+     */
+    public Packet.pooled(Flag flag, uint id, string shm_name, uint size) {
+        this.flag = flag;
+        this.id = id;
+        this.storage = Storage.POOL;
+        this.size = size;
         Posix.memcpy(this.shm_name, shm_name.data, shm_name.length + 1);
     }
 }
 
 
 /**
- * The number of slots in {@link Slots}
+ * The maximal size of a payload stored inline in a packet, see {@link Storage.INLINE}.
+ */
+private const int MAX_INLINE_SIZE = 255;
+/**
+ * The default number of slots in each ring. It must be a power of two.
+ */
+private const uint N_SLOTS = 16;
+/**
+ * The maximal number of slots in each ring.
+ */
+private const uint MAX_SLOT_CAPACITY = 1 << 16;
+/**
+ * The magic number at the beginning of the shared memory of a channel.
+ */
+private const uint PROTOCOL_MAGIC = 0x53484d43; // "SHMC"
+/**
+ * The version of the layout of the shared memory of a channel.
+ */
+private const uint PROTOCOL_VERSION = 6;
+
+
+/**
+ * The shared positions of a {@link Ring}.
+ *
+ * The positions are kept in separate cache lines, so that the producer and the consumer do not contend for them.
  */
-private const int N_SLOTS = 10;
+private struct RingHeader {
+    /**
+     * The position of the next packet to be written. Written only by the producer.
+     */
+    public uint head;
+    /**
+     * Padding to the end of the cache line.
+     */
+    public uint8 head_padding[60];
+    /**
+     * The position of the next packet to be read. Written only by the consumer.
+     */
+    public uint tail;
+    /**
+     * Padding to the end of the cache line.
+     */
+    public uint8 tail_padding[60];
+}
 
 
 /**
- * The structure to exchange packets via shared memory.
- * Access is guarded by the included semaphore.
+ * The credit granted by the receiver of one direction of a {@link Channel} to the sender.
+ *
+ * The sender may have at most {@link window_packets} packets and {@link window_bytes} bytes of payloads in flight,
+ * i.e. queued, published or being processed but not yet consumed by the receiver. The consumed counters grow
+ * monotonically (wrapping around `uint.MAX`), so that the sender computes the amount in flight by subtracting them
+ * from its own counters of sent packets and bytes.
  */
-private struct Slots {
+private struct CreditHeader {
+    /**
+     * The maximal number of packets in flight or zero for no limit. Written only by the receiver.
+     */
+    public uint window_packets;
+    /**
+     * The maximal size of payloads in flight or zero for no limit. Written only by the receiver.
+     */
+    public uint window_bytes;
+    /**
+     * The number of consumed packets. Written only by the receiver. Accessed atomically.
+     */
+    public uint consumed_packets;
+    /**
+     * The size of consumed payloads. Written only by the receiver. Accessed atomically.
+     */
+    public uint consumed_bytes;
     /**
-     * The semaphore to control access to this structure.
+     * Whether the sender waits for more credit and the receiver should ring its doorbell. Accessed atomically.
      */
-    public Sem semaphore;
+    public uint waiting;
     /**
-     * Slots for packet metadata.
+     * Padding to the end of the cache line.
      */
-    public Packet packets[10];
+    public uint8 padding[44];
+}
+
+
+/**
+ * The header at the beginning of the shared memory of a channel.
+ *
+ * The header is followed by the slots of the ring of the server and the slots of the ring of the client,
+ * {@link slot_capacity} packets each, and then by the payload arena of the server and the payload arena of
+ * the client, {@link arena_size} bytes each. There is one single-producer/single-consumer ring for each
+ * direction, see {@link Ring}.
+ */
+private struct ChannelHeader {
+    /**
+     * {@link PROTOCOL_MAGIC} once the header is initialized. Accessed atomically.
+     */
+    public uint magic;
+    /**
+     * {@link PROTOCOL_VERSION}.
+     */
+    public uint version;
+    /**
+     * The number of slots in each ring.
+     */
+    public uint slot_capacity;
+    /**
+     * The capacity of each payload arena.
+     */
+    public uint arena_size;
+    /**
+     * Padding to the end of the cache line.
+     */
+    public uint8 padding[48];
+    /**
+     * The positions of the ring of packets sent by the server.
+     */
+    public RingHeader server_ring;
+    /**
+     * The positions of the ring of packets sent by the client.
+     */
+    public RingHeader client_ring;
+    /**
+     * The release position of the payload arena of the server. Accessed atomically.
+     */
+    public uint server_arena_tail;
+    /**
+     * Padding to the end of the cache line.
+     */
+    public uint8 server_arena_padding[60];
+    /**
+     * The release position of the payload arena of the client. Accessed atomically.
+     */
+    public uint client_arena_tail;
+    /**
+     * Padding to the end of the cache line.
+     */
+    public uint8 client_arena_padding[60];
+    /**
+     * The credit for packets sent by the server.
+     */
+    public CreditHeader server_credit;
+    /**
+     * The credit for packets sent by the client.
+     */
+    public CreditHeader client_credit;
+}
+
+
+/**
+ * The maximal capacity of a payload arena.
+ */
+private const uint MAX_ARENA_SIZE = 1 << 30;
+
+
+/**
+ * The magic number of the client registry of a {@link ChannelServer}.
+ */
+private const uint REGISTRY_MAGIC = 0x53484d52; // "SHMR"
+
+
+/**
+ * The state of an entry in the client registry of a {@link ChannelServer}.
+ */
+private enum ClientState {
+    /**
+     * The channel of the entry is not ready.
+     */
+    EMPTY,
+    /**
+     * The channel of the entry is ready for a new client.
+     */
+    FREE,
+    /**
+     * A client has claimed the entry.
+     */
+    CONNECTED,
+    /**
+     * The client has left and the server has not recreated the channel yet.
+     */
+    LEAVING;
+}
+
+
+/**
+ * The header of the client registry of a {@link ChannelServer}.
+ *
+ * The header is followed by {@link max_clients} entries, see {@link ClientEntry}. Each entry corresponds to
+ * a channel of its own named after the server, see {@link ChannelServer.get_client_channel_name}.
+ */
+private struct RegistryHeader {
+    /**
+     * {@link REGISTRY_MAGIC} once the registry is initialized. Accessed atomically.
+     */
+    public uint magic;
+    /**
+     * {@link PROTOCOL_VERSION}.
+     */
+    public uint version;
+    /**
+     * The number of entries.
+     */
+    public uint max_clients;
+    /**
+     * Padding to the end of the cache line.
+     */
+    public uint8 padding[52];
+}
+
+
+/**
+ * An entry of the client registry of a {@link ChannelServer}.
+ */
+private struct ClientEntry {
+    /**
+     * The {@link ClientState}. Accessed atomically.
+     */
+    public uint state;
+    /**
+     * The process id of the client. Accessed atomically.
+     */
+    public uint pid;
+    /**
+     * The start time of the client process, see {@link get_process_start_time}. It is written before {@link pid}.
+     */
+    public uint64 start_time;
+    /**
+     * Padding to the end of the cache line.
+     */
+    public uint8 padding[48];
 }
 
 
@@ -206,11 +719,40 @@ private  class OutgoingRequest {
      * The request id.
      */
     public uint id;
+    /**
+     * The monotonic time in microseconds when the request expires, if it has a deadline.
+     */
+    public int64 deadline = 0;
+    /**
+     * The position of the request in {@link DeadlineQueue} or `-1` if it is not there.
+     */
+    public int heap_index = -1;
 
     /**
      * The callback to handle the response once it is available.
      */
-    private DataCallback response_callback;
+    private DataCallback? response_callback = null;
+    /**
+     * The callback to handle response frames if the request has been sent with {@link Channel.request_stream}.
+     */
+    private StreamingResponseCallback? frame_callback = null;
+    /**
+     * The batch this request belongs to if it has been sent with {@link Channel.request_many}.
+     */
+    private BatchResponse? batch = null;
+    /**
+     * The index of this request in the {@link batch}.
+     */
+    private int index = 0;
+
+    /**
+     * Whether there is a callback to handle the response, see {@link Channel.set_batch_callback}.
+     */
+    public bool has_response_callback {
+        get {
+            return response_callback != null || frame_callback != null || batch != null;
+        }
+    }
 
     /**
      * Create a new metadata object for a pending outgoing request.
@@ -218,18 +760,81 @@ private  class OutgoingRequest {
      * @param id                   The request id.
      * @param response_callback    The callback to handle the response once it is available.
      */
-    public OutgoingRequest(uint id, owned DataCallback response_callback) {
+    public OutgoingRequest(uint id, owned DataCallback? response_callback) {
         this.id = id;
         this.response_callback = (owned) response_callback;
     }
 
+    /**
+     * Create a new metadata object for a pending outgoing request from a batch.
+     *
+     * @param id       The request id.
+     * @param batch    The batch this request belongs to.
+     * @param index    The index of this request in the batch.
+     */
+    public OutgoingRequest.for_batch(uint id, BatchResponse batch, int index) {
+        this.id = id;
+        this.batch = batch;
+        this.index = index;
+    }
+
+    /**
+     * Create a new metadata object for a pending outgoing request with streaming responses.
+     *
+     * @param id                The request id.
+     * @param frame_callback    The callback to handle response frames once they are available.
+     */
+    public OutgoingRequest.streaming(uint id, owned StreamingResponseCallback frame_callback) {
+        this.id = id;
+        this.frame_callback = (owned) frame_callback;
+    }
+
     /**
      * Pass the response to the caller.
      *
      * @param data    The response data,
      */
     public void handle_response(uint8[] data) {
-        response_callback(data);
+        if (batch != null) {
+            batch.response_callback(index, data);
+        } else if (frame_callback != null) {
+            frame_callback(data, true);
+        } else if (response_callback != null) {
+            response_callback(data);
+        }
+    }
+
+    /**
+     * Pass a partial response to the caller.
+     *
+     * Partial responses are dropped unless the request has been sent with {@link Channel.request_stream}.
+     *
+     * @param data    The data of the partial response.
+     */
+    public void handle_partial_response(uint8[] data) {
+        if (frame_callback != null) {
+            frame_callback(data, false);
+        }
+    }
+}
+
+
+/**
+ * The response callback shared by requests from a batch.
+ */
+private class BatchResponse {
+    /**
+     * The callback to handle responses once they are available.
+     */
+    public BatchResponseCallback response_callback;
+
+    /**
+     * Create a new shared response callback for a batch of requests.
+     *
+     * @param response_callback    The callback to handle responses once they are available.
+     */
+    public BatchResponse(owned BatchResponseCallback response_callback) {
+        this.response_callback = (owned) response_callback;
     }
 }
 
@@ -276,15 +881,141 @@ public class IncomingRequest {
     /**
      * Send a response to the caller.
      *
+     * It also ends the stream of partial responses sent by {@link send_partial_response}.
+     *
      * @param data    The response data.
      * @throws Error on failure.
      */
     public void send_response(uint8[] data) throws Error {
         if (this.response_callback != null) {
-            this.response_callback(this.id, data);
+            this.response_callback(this.id, data, false);
             this.response_callback = null;
         }
     }
+
+    /**
+     * Send a partial response to the caller.
+     *
+     * Any number of partial responses may be sent before the final response is sent with {@link send_response}.
+     * The caller receives them only if it has sent the request with {@link Channel.request_stream}.
+     *
+     * @param data    The data of the partial response.
+     * @throws Error on failure.
+     */
+    public void send_partial_response(uint8[] data) throws Error {
+        if (this.response_callback != null) {
+            this.response_callback(this.id, data, true);
+        }
+    }
+}
+
+/**
+ * An entry of {@link IncomingBatch}.
+ */
+public struct BatchEntry {
+    /**
+     * The kind of the message.
+     */
+    public MessageKind kind;
+    /**
+     * The id of the message. Use it to respond to requests with {@link Channel.send_response}.
+     */
+    public uint id;
+    /**
+     * The data of the message.
+     */
+    public uint8* data;
+    /**
+     * The size of the data.
+     */
+    public int size;
+}
+
+
+/**
+ * A batch of incoming messages to be processed at once.
+ */
+public class IncomingBatch {
+    /**
+     * The entries of this batch.
+     */
+    private BatchEntry[] entries = {};
+
+    /**
+     * Create a new empty batch.
+     */
+    internal IncomingBatch() {
+    }
+
+    /**
+     * Add a message to the batch.
+     *
+     * @param kind    The kind of the message.
+     * @param id      The id of the message.
+     * @param data    The data of the message.
+     */
+    internal void add(MessageKind kind, uint id, uint8[] data) {
+        var entry = BatchEntry();
+        entry.kind = kind;
+        entry.id = id;
+        entry.data = (uint8*) data;
+        entry.size = data.length;
+        entries += entry;
+    }
+
+    /**
+     * Get the number of messages in the batch.
+     *
+     * @return The number of messages.
+     */
+    public int get_length() {
+        return entries.length;
+    }
+
+    /**
+     * Get all entries of the batch.
+     *
+     * The data of the entries must be used immediately or a copy must be made.
+     *
+     * @return The entries.
+     */
+    public unowned BatchEntry[] get_entries() {
+        return entries;
+    }
+
+    /**
+     * Get the kind of a message.
+     *
+     * @param index    The index of the message.
+     * @return The kind of the message.
+     */
+    public MessageKind get_kind(int index) {
+        return entries[index].kind;
+    }
+
+    /**
+     * Get the id of a message.
+     *
+     * @param index    The index of the message.
+     * @return The id of the message.
+     */
+    public uint get_id(int index) {
+        return entries[index].id;
+    }
+
+    /**
+     * Get the data of a message.
+     *
+     * The data must be used immediately or a copy must be made.
+     *
+     * @param index    The index of the message.
+     * @return The data of the message.
+     */
+    public unowned uint8[] get_data(int index) {
+        unowned uint8[] data = (uint8[]) entries[index].data;
+        data.length = entries[index].size;
+        return data;
+    }
 }
 
 } // namespace Shm
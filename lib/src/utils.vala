@@ -71,4 +71,88 @@ private inline void posix_die_if(bool failed, int code, string message) throws E
     }
 }
 
+/**
+ * Round a value up to the nearest power of two.
+ *
+ * @param value    The value to round. It must not be greater than `1 << 31`.
+ * @return The nearest power of two greater than or equal to `value`, or `0` if `value` is `0`.
+ */
+private inline uint round_up_to_power_of_two(uint value) {
+    if (value == 0) {
+        return 0;
+    }
+    uint result = 1;
+    while (result < value) {
+        result <<= 1;
+    }
+    return result;
+}
+
+
+/**
+ * Round a size up to a multiple of the alignment.
+ *
+ * @param size         The size to round.
+ * @param alignment    The alignment. It must be a power of two.
+ * @return The aligned size.
+ */
+private inline ulong align_size(ulong size, ulong alignment) {
+    return (size + alignment - 1) & ~(alignment - 1);
+}
+
+
+/**
+ * Get the time of the monotonic clock.
+ *
+ * The clock is shared by all processes, so that timestamps taken by both sides of a channel can be compared.
+ *
+ * @return The time in nanoseconds.
+ */
+private inline int64 get_monotonic_ns() {
+    Posix.timespec time;
+    clock_gettime(CLOCK_MONOTONIC, out time);
+    return (int64) time.tv_sec * 1000000000 + time.tv_nsec;
+}
+
+
+/**
+ * Get the start time of a process.
+ *
+ * Unlike a process id, which is reused after the process exits, the start time identifies the process.
+ *
+ * @param pid    The process id.
+ * @return The start time in clock ticks since the system boot or `0` if the process does not exist.
+ */
+private uint64 get_process_start_time(Posix.pid_t pid) {
+    string contents;
+    try {
+        FileUtils.get_contents("/proc/%d/stat".printf((int) pid), out contents);
+    } catch (FileError e) {
+        return 0;
+    }
+    // The command name in parentheses may contain spaces, so the fields are counted from its end.
+    var end = contents.last_index_of_char(')');
+    if (end < 0) {
+        return 0;
+    }
+    var fields = contents.substring(end + 1).strip().split(" ");
+    // The start time is the 22nd field and the first one after the command name is the 3rd field.
+    return fields.length > 19 ? uint64.parse(fields[19]) : 0;
+}
+
+
+/**
+ * Check whether a process has exited.
+ *
+ * @param pid           The process id.
+ * @param start_time    The start time of the process, see {@link get_process_start_time}, or `0` if it is not known.
+ * @return `true` if the process does not exist or the process id belongs to a different process.
+ */
+private bool is_process_gone(Posix.pid_t pid, uint64 start_time) {
+    if (Posix.kill(pid, 0) < 0 && Posix.errno == Posix.ESRCH) {
+        return true;
+    }
+    return start_time != 0 && get_process_start_time(pid) != start_time;
+}
+
 } // namespace Shmch
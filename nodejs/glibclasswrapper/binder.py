@@ -4,7 +4,8 @@ from typing import List, Dict
 from glibclasswrapper.snippets import PRELUDE, CLASS_DECLARATION_BEGIN_PUBLIC, CLASS_DECLARATION_BEGIN_PRIVATE, \
     CLASS_DECLARATION_END, CLASS_INIT, DESTRUCTOR, CALLBACK_BEGIN, METHOD_BEGIN, NOT_CALLED_AS_CONSTRUCTOR, \
     WRONG_NUMBER_OF_ARGUMENTS, WRONG_TYPE_OF_ARGUMENTS, PRIVATE_CONSTRUCTOR, ASSERTION, UNWRAP, DEF_G_ERROR, WRAP, \
-    FACTORY_WRAP, CHECK_G_ERROR, SET_RESULT, METHOD_END, CALL_CALLBACK, END, CHECK_INSTANCE_NOT_NULL, CALLBACK_WRAPPING
+    FACTORY_WRAP, CHECK_G_ERROR, SET_RESULT, METHOD_END, CALL_CALLBACK, END, CHECK_INSTANCE_NOT_NULL, CALLBACK_WRAPPING, \
+    GET_INSTANCE
 from glibclasswrapper.types import Arg, Class, Typ, G_ERROR, Args, TYPES_MAP
 
 
@@ -202,8 +203,10 @@ class Binder:
     def create_factory(self, klass):
         factory_declaration = '        static v8::Local<v8::Object> Factory(v8::Isolate* isolate, %s* self);\n'
         self.declarations.append(factory_declaration % klass.name)
+        self.declarations.append('        static %s* GetInstance(v8::Local<v8::Object> obj);\n' % klass.name)
         name = klass.name
         self.body.append(FACTORY_WRAP % (name, name, name, name, klass.ref))
+        self.body.append(GET_INSTANCE % (name, name, name))
 
     def bind_methods(self, klass, methods):
         found_constructor = False
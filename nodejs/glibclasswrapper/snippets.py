@@ -129,6 +129,11 @@ v8::Local<v8::Object> %sNodejsWrapper::Factory(v8::Isolate* isolate, %s* self) {
     return handle_scope.Escape(obj_instance);
 }
 """
+GET_INSTANCE = """
+%s* %sNodejsWrapper::GetInstance(v8::Local<v8::Object> obj) {
+    return ObjectWrap::Unwrap<%sNodejsWrapper>(obj)->instance;
+}
+"""
 CHECK_G_ERROR = """
 
     if (__g_error__ != NULL) {
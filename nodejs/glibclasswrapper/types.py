@@ -120,6 +120,20 @@ class BytesTyp(Typ):
         yield '    memcpy(%s_buf, %s, (size_t) %s);\n' % (self.js_name, self.c_name, self.length.c_name)
 
 
+class IntArrayTyp(BytesTyp):
+    def add_assertions(self, i, args):
+        arg = args[i + 1]
+        yield i + 1, "%s * sizeof(%s) <= %s_len_" % (arg.c_name, self.c_type.rstrip('*'), self.c_name), \
+            "Buffer overflow."
+
+
+class SharedBytesTyp(BytesTyp):
+    def create_js_values_from_c_args(self, ):
+        # The ArrayBuffer is external and shares memory with the C buffer.
+        yield '    v8::Local<v8::ArrayBuffer> %s = v8::ArrayBuffer::New(isolate, (void*) %s, (size_t) %s);\n' % (
+            self.js_name, self.c_name, self.length.c_name)
+
+
 class CallbackTyp(Typ):
     def __init__(self, c_type, name, is_out):
         super().__init__(c_type, name, is_out)
@@ -176,6 +190,20 @@ class UnknownTyp(SimpleTyp):
             self.js_name, self.c_type.rstrip('*'), self.c_name)
 
 
+class ObjectTyp(UnknownTyp):
+    def check(self, source):
+        return '%s->IsObject()' % source
+
+    def get_js_values_from_js_arg(self, source):
+        yield '    v8::Local<v8::Object> %s = %s->ToObject();\n' % (self.js_name, source)
+
+    def get_c_values_from_js(self, typ=None):
+        if not typ:
+            typ = self.c_type
+        yield '    %s %s = %sNodejsWrapper::GetInstance(%s);\n' % (
+            typ, self.c_name, self.c_type.rstrip('*'), self.js_name)
+
+
 class BooleanTyp(SimpleTyp):
     def __init__(self, c_type, name, is_out):
         super().__init__(c_type, name, is_out, '%s->IsBoolean()', 'v8::Local<v8::Boolean>', "%s->ToBoolean()",
@@ -188,6 +216,12 @@ class IntegerTyp(SimpleTyp):
                          "%s->IntegerValue()", "v8::Integer::New(isolate, %s)")
 
 
+class NumberTyp(SimpleTyp):
+    def __init__(self, c_type, name, is_out):
+        super().__init__(c_type, name, is_out, '%s->IsNumber()', 'v8::Local<v8::Number>', "%s->ToNumber()",
+                         "%s->NumberValue()", "v8::Number::New(isolate, (double) %s)")
+
+
 class StringTyp(SimpleTyp):
     def __init__(self, c_type, name, is_out):
         super().__init__(c_type, name, is_out, '%s->IsString()', 'v8::Local<v8::String>', "%s->ToString()",
@@ -210,6 +244,8 @@ TYPES_MAP = {
     'void*': PointerTyp,
     'GDestroyNotify': UnknownTyp,
     'guint8*': BytesTyp,
+    'gint*': IntArrayTyp,
+    'guint*': IntArrayTyp,
     'int': IntegerTyp,
     'gboolean': BooleanTyp,
     'const gchar *': StringTyp,
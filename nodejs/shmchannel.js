@@ -1,4 +1,11 @@
+const net = require('net')
+const util = require('util')
+const {Readable, Writable} = require('stream')
 const shmch = require('./build/Debug/_shmchannel.node')
+// Incoming stream chunks are queued until consumed, so a channel with a stream callback gets a finite receive window
+// unless one has been configured explicitly.
+const STREAM_RECEIVE_WINDOW_PACKETS = 256
+const STREAM_RECEIVE_WINDOW_BYTES = 16 * 1024 * 1024
 
 
 function encodeStringAsUTF8(string) {
@@ -22,11 +29,24 @@ const Channel = function(name, mode, requestCallback, notificationCallback, data
   this.mode = mode
   this.dataConverter = dataConverter || null
   this.running = false
+  this._wakeup = null
+  this._stopped = null
+  this._reservations = new Map()
+  this._pending = new Map()
+  this._deadlineTimer = null
+  this._creditWaiters = []
+  this._incomingStreams = new Map()
   this._channel = new shmch.Channel(name, mode)
   this.requestCallback = requestCallback || null
   this.notificationCallback = notificationCallback || null
+  this.streamCallback = null
+  this.arrayCallback = null
   this._channel.setRequestCallback(this.onRequestReceived.bind(this))
   this._channel.setNotificationCallback(this.onNotificationReceived.bind(this))
+  this._channel.setTimeoutCallback(this.onRequestTimedOut.bind(this))
+  this._channel.setStreamCallback(this.onStreamReceived.bind(this))
+  // Chunks are handed over to the consumer of IncomingStream asynchronously.
+  this._channel.setDeferStreamCredit(true)
 
 }
 
@@ -38,12 +58,180 @@ Channel.prototype.setRequestCallback = function(callback){
   this.requestCallback= callback
 }
 
+// The callback receives an IncomingStream, a Readable stream of chunks sent through an OutgoingStream.
+Channel.prototype.setStreamCallback = function(callback){
+  this.streamCallback = callback
+  if (callback && !this._channel.getReceiveWindowPackets() && !this._channel.getReceiveWindowBytes()) {
+    this._channel.setReceiveWindowPackets(STREAM_RECEIVE_WINDOW_PACKETS)
+    this._channel.setReceiveWindowBytes(STREAM_RECEIVE_WINDOW_BYTES)
+  }
+}
+
+// The callback receives arrays sent by sendArray() or by Channel.send_array() of the Python binding.
+Channel.prototype.setArrayCallback = function(callback){
+  this.arrayCallback = callback
+}
+
+Channel.prototype.enableBatchDelivery = function(){
+  this._channel.setBatchCallback(this.onBatchReceived.bind(this))
+}
+
+Channel.prototype.setArenaSize = function(size){
+  this._channel.setArenaSize(size)
+}
+
+Channel.prototype.getArenaSize = function(){
+  return this._channel.getArenaSize()
+}
+
+Channel.prototype.setPoolSize = function(size){
+  this._channel.setPoolSize(size)
+}
+
+Channel.prototype.getPoolSize = function(){
+  return this._channel.getPoolSize()
+}
+
+Channel.prototype.setSlotCapacity = function(capacity){
+  this._channel.setSlotCapacity(capacity)
+}
+
+Channel.prototype.getSlotCapacity = function(){
+  return this._channel.getSlotCapacity()
+}
+
+Channel.prototype.setRequestTimeout = function(timeout){
+  this._channel.setRequestTimeout(timeout)
+}
+
+Channel.prototype.getRequestTimeout = function(){
+  return this._channel.getRequestTimeout()
+}
+
+Channel.prototype.setMaxPendingRequests = function(limit){
+  this._channel.setMaxPendingRequests(limit)
+}
+
+Channel.prototype.getMaxPendingRequests = function(){
+  return this._channel.getMaxPendingRequests()
+}
+
+Channel.prototype.setReceiveWindowPackets = function(window){
+  this._channel.setReceiveWindowPackets(window)
+}
+
+Channel.prototype.getReceiveWindowPackets = function(){
+  return this._channel.getReceiveWindowPackets()
+}
+
+Channel.prototype.setReceiveWindowBytes = function(window){
+  this._channel.setReceiveWindowBytes(window)
+}
+
+Channel.prototype.getReceiveWindowBytes = function(){
+  return this._channel.getReceiveWindowBytes()
+}
+
+// The I/O thread sends and receives packets even while the event loop is busy. Enable it before the channel is opened.
+Channel.prototype.setIoThread = function(enabled){
+  this._channel.setIoThread(enabled)
+}
+
+Channel.prototype.getIoThread = function(){
+  return this._channel.getIoThread()
+}
+
+Channel.prototype.setStreamChunkSize = function(size){
+  this._channel.setStreamChunkSize(size)
+}
+
+Channel.prototype.getStreamChunkSize = function(){
+  return this._channel.getStreamChunkSize()
+}
+
+// A combination of SHMEM_* flags for the control region. It must be set before the channel is opened.
+Channel.prototype.setShmemFlags = function(flags){
+  this._channel.setShmemFlags(flags)
+}
+
+Channel.prototype.getShmemFlags = function(){
+  return this._channel.getShmemFlags()
+}
+
+// A combination of SHMEM_* flags for payload segments. It must be set before the channel is opened.
+Channel.prototype.setSegmentShmemFlags = function(flags){
+  this._channel.setSegmentShmemFlags(flags)
+}
+
+Channel.prototype.getSegmentShmemFlags = function(){
+  return this._channel.getSegmentShmemFlags()
+}
+
+Channel.prototype.hasCredit = function(size){
+  return this._channel.hasCredit(size || 0)
+}
+
+Channel.prototype.drain = async function(size){
+  while (!this._channel.hasCredit(size || 0)) {
+    let waiters = this._creditWaiters
+    await new Promise(function(resolve) {
+      waiters.push(resolve)
+    })
+  }
+}
+
+Channel.prototype.getStats = function(){
+  let stats = {}
+  STAT_NAMES.forEach(function(name, stat) {
+    stats[name] = this._channel.getStat(stat)
+  }, this)
+  return stats
+}
+
+Channel.prototype.resetStats = function(){
+  this._channel.resetStats()
+}
+
+Channel.prototype.setTracing = function(tracing){
+  this._channel.setTracing(tracing)
+}
+
+Channel.prototype.getTracing = function(){
+  return this._channel.getTracing()
+}
+
+Channel.prototype.getLatency = function(stage){
+  let histogram = this._channel.getLatencyHistogram(stage)
+  let latency = {
+    count: histogram.getCount(),
+    min: histogram.getMin(),
+    max: histogram.getMax(),
+    mean: histogram.getMean()
+  }
+  LATENCY_PERCENTILES.forEach(function(percentile) {
+    latency["p" + percentile] = histogram.getValueAtPercentile(percentile)
+  })
+  return latency
+}
+
+Channel.prototype.resetLatency = function(){
+  this._channel.resetLatencyHistograms()
+}
+
 Channel.prototype.open = function(){
   this._channel.open()
 }
 
 Channel.prototype.close = function(){
+  this.stopCommunication()
   this._channel.close()
+  let name = this.name
+  this._incomingStreams.forEach(function(stream) {
+    let error = new Error("The channel " + name + " has been closed.")
+    error.name = "ConnectionResetError"
+    stream.destroy(error)
+  })
+  this._incomingStreams.clear()
 }
 
 
@@ -52,61 +240,721 @@ Channel.prototype.notify = function (data) {
   this._channel.notify(bytes, length)
 }
 
-Channel.prototype.startCommunication = async function () {
+Channel.prototype.notifyMany = function (items) {
+  let [bytes, length, sizes] = this.packBatch(items)
+  this._channel.notifyMany(bytes, length, sizes.buffer, sizes.length)
+}
+
+Channel.prototype.sendArray = function (data, shape) {
+  this.commit(this.reserveArray(data, shape))
+}
+
+Channel.prototype.requestArray = async function (data, shape, signal) {
+  return unpackArray(await this.commitRequest(this.reserveArray(data, shape), signal))
+}
+
+Channel.prototype.reserveArray = function (data, shape) {
+  let buffer = this.reserve(getPackedArraySize(data, shape))
+  try {
+    packArrayInto(buffer, data, shape)
+  } catch (e) {
+    this.cancelReservation(buffer)
+    throw e
+  }
+  return buffer
+}
+
+// Open a Writable stream whose data are sent as chunks of at most getStreamChunkSize() bytes.
+Channel.prototype.openStream = async function (metadata) {
+  metadata = metadata || new ArrayBuffer(0)
+  await this.drain(metadata.byteLength)
+  return new OutgoingStream(this, this._channel.openStream(metadata, metadata.byteLength))
+}
+
+Channel.prototype.onStreamReceived = function(id, event, data) {
+  let stream = this._incomingStreams.get(id)
+  if (event === STREAM_OPEN) {
+    if (this.streamCallback) {
+      stream = new IncomingStream(this._channel, id, data)
+      this._incomingStreams.set(id, stream)
+      this.streamCallback(stream)
+    }
+  } else if (event === STREAM_DATA) {
+    if (stream) {
+      stream.pushChunk(data)
+    } else {
+      this._channel.consumeStreamChunk(data.byteLength)
+    }
+  } else if (stream) {
+    this._incomingStreams.delete(id)
+    if (event === STREAM_END) {
+      stream.finish()
+    } else {
+      let error = new Error("The stream " + id + " of " + this.name + " has been aborted by the sender.")
+      error.name = "ConnectionAbortedError"
+      stream.destroy(error)
+    }
+  }
+}
+
+Channel.prototype.startCommunication = function () {
+  if (this.running) {
+    return this._stopped
+  }
   this.running = true
-  while (this.running) {
-    this._channel.sendReceive(false)
-    let promise = new Promise(function(resolve, reject){
-      setTimeout(resolve, 10)
+  // The socket takes ownership of the duplicated fd of the doorbell and reads it when the other side rings.
+  let wakeup = new net.Socket({fd: this._channel.dupWakeupFd(), readable: true, writable: false})
+  let channel = this._channel
+  this._wakeup = wakeup
+  this._stopped = new Promise(function(resolve, reject){
+    wakeup.on('close', resolve)
+    wakeup.on('error', reject)
+  })
+  let that = this
+  wakeup.on('data', function() {
+    that.sendReceive()
+  })
+  this.sendReceive()
+  return this._stopped
+}
+
+Channel.prototype.sendReceive = function() {
+  let result = this._channel.sendReceive(false)
+  if (this.running) {
+    this.scheduleDeadline()
+  }
+  if (this._creditWaiters.length > 0) {
+    let waiters = this._creditWaiters
+    this._creditWaiters = []
+    waiters.forEach(function(resolve) {
+      resolve()
     })
-    await promise;
+  }
+  return result
+}
+
+Channel.prototype.scheduleDeadline = function() {
+  if (this._deadlineTimer) {
+    clearTimeout(this._deadlineTimer)
+    this._deadlineTimer = null
+  }
+  let timeout = this._channel.getNextTimeout()
+  if (timeout >= 0) {
+    this._deadlineTimer = setTimeout(this.sendReceive.bind(this), timeout)
   }
 }
 
 Channel.prototype.stopCommunication = function() {
   this.running = false;
+  if (this._wakeup) {
+    this._wakeup.destroy()
+    this._wakeup = null
+  }
+  if (this._deadlineTimer) {
+    clearTimeout(this._deadlineTimer)
+    this._deadlineTimer = null
+  }
 }
 
-Channel.prototype.request = async function(data) {
+Channel.prototype.request = async function(data, signal) {
   let [bytes, length] = this.dataConverter ? this.dataConverter.toBytes(data) : [data, data.byteLength]
   let channel = this._channel
-  let requestAsync = function (resolve, reject) {
+  let response = await this.sendRequest(function(resolve) {
+    return channel.request(bytes, length, resolve)
+  }, signal)
+  return this.dataConverter ? this.dataConverter.fromBytes(response) : response
+}
+
+// Send a request and iterate over its partial responses followed by the final response, which is skipped if it is
+// empty. The request is cancelled if the iteration stops early and the iteration fails when the request times out.
+Channel.prototype.requestStream = async function*(data) {
+  let [bytes, length] = this.dataConverter ? this.dataConverter.toBytes(data) : [data, data.byteLength]
+  let frames = []
+  let wake = null
+  let onFrame = function(frame, last) {
+    frames.push([frame, last])
+    if (wake) {
+      wake()
+      wake = null
+    }
+  }
+  let id = this._channel.requestStream(bytes, length, onFrame)
+  this._pending.set(id, function(error) {
+    onFrame(error, true)
+  })
+  let finished = false
+  try {
+    while (!finished) {
+      if (frames.length === 0) {
+        await new Promise(function(resolve) {
+          wake = resolve
+        })
+      }
+      let frame
+      [frame, finished] = frames.shift()
+      if (frame instanceof Error) {
+        throw frame
+      }
+      if (frame.byteLength > 0 || !finished) {
+        yield this.dataConverter ? this.dataConverter.fromBytes(frame) : frame
+      }
+    }
+  } finally {
+    this._pending.delete(id)
+    if (!finished) {
+      this._channel.cancelRequest(id)
+    }
+  }
+}
+
+// Send a request with the given function and wait for a response. The request is cancelled when the optional
+// AbortSignal is aborted and the promise is rejected when the request times out, see setRequestTimeout.
+Channel.prototype.sendRequest = function(send, signal) {
+  let pending = this._pending
+  let channel = this._channel
+  return new Promise(function(resolve, reject) {
+    if (signal && signal.aborted) {
+      reject(createAbortError())
+      return
+    }
+    let id = null
+    let onAbort = function() {
+      pending.delete(id)
+      channel.cancelRequest(id)
+      reject(createAbortError())
+    }
+    let settle = function(callback, value) {
+      pending.delete(id)
+      if (signal) {
+        signal.removeEventListener('abort', onAbort)
+      }
+      callback(value)
+    }
     try {
-      channel.request(bytes, length, resolve)
+      id = send(function(response) {
+        settle(resolve, response)
+      })
     } catch (e) {
       reject(e)
+      return
+    }
+    pending.set(id, function(error) {
+      settle(reject, error)
+    })
+    if (signal) {
+      signal.addEventListener('abort', onAbort)
     }
+  })
+}
+
+Channel.prototype.onRequestTimedOut = function(id) {
+  let reject = this._pending.get(id)
+  if (reject) {
+    let error = new Error("Request " + id + " to " + this.name + " has timed out.")
+    error.name = "TimeoutError"
+    reject(error)
   }
-  let response = await new Promise(requestAsync)
+}
+
+Channel.prototype.reserve = function(size) {
+  let reservation = this._channel.reserve(size)
+  let buffer = Buffer.from(reservation.getBuffer())
+  this._reservations.set(buffer, reservation)
+  return buffer
+}
+
+Channel.prototype.commit = function(buffer) {
+  this._channel.commit(this.finishReservation(buffer))
+}
+
+Channel.prototype.commitRequest = async function(buffer, signal) {
+  let reservation = this.finishReservation(buffer)
+  let channel = this._channel
+  let response = await this.sendRequest(function(resolve) {
+    return channel.commitRequest(reservation, resolve)
+  }, signal)
   return this.dataConverter ? this.dataConverter.fromBytes(response) : response
 }
 
+Channel.prototype.cancelReservation = function(buffer) {
+  this._channel.cancelReservation(this.finishReservation(buffer))
+}
+
+Channel.prototype.finishReservation = function(buffer) {
+  let reservation = this._reservations.get(buffer)
+  if (!reservation) {
+    throw new Error("The buffer has not been reserved by this channel.")
+  }
+  this._reservations.delete(buffer)
+  return reservation
+}
+
+// Send a batch of requests and return a promise of the response to each of them. Like the request method, the
+// requests are cancelled when the optional AbortSignal is aborted and each of them times out individually.
+Channel.prototype.requestMany = function(items, signal) {
+  let [bytes, length, sizes] = this.packBatch(items)
+  let pending = this._pending
+  let channel = this._channel
+  let ids = new Uint32Array(items.length)
+  let callbacks = []
+  let promises = items.map(function() {
+    return new Promise(function(resolve, reject) {
+      callbacks.push([resolve, reject])
+    })
+  })
+  if (signal && signal.aborted) {
+    callbacks.forEach(function(callback) {
+      callback[1](createAbortError())
+    })
+    return promises
+  }
+  let settle = function(index, callback, value) {
+    if (pending.delete(ids[index]) && signal) {
+      signal.removeEventListener('abort', callbacks[index][2])
+    }
+    callback(value)
+  }
+  let dataConverter = this.dataConverter
+  let onResponse = function(index, response) {
+    settle(index, callbacks[index][0], dataConverter ? dataConverter.fromBytes(response) : response)
+  }
+  try {
+    channel.requestMany(bytes, length, sizes.buffer, sizes.length, ids.buffer, ids.length, onResponse)
+  } catch (e) {
+    callbacks.forEach(function(callback) {
+      callback[1](e)
+    })
+    return promises
+  }
+  callbacks.forEach(function(callback, index) {
+    let id = ids[index]
+    pending.set(id, function(error) {
+      settle(index, callback[1], error)
+    })
+    if (signal) {
+      callback.push(function() {
+        pending.delete(id)
+        channel.cancelRequest(id)
+        callback[1](createAbortError())
+      })
+      signal.addEventListener('abort', callback[2])
+    }
+  })
+  return promises
+}
+
+Channel.prototype.packBatch = function(items) {
+  let dataConverter = this.dataConverter
+  let chunks = items.map(function(data) {
+    let [bytes, length] = dataConverter ? dataConverter.toBytes(data) : [data, data.byteLength]
+    return new Uint8Array(bytes, 0, length)
+  })
+  let sizes = new Int32Array(chunks.length)
+  let total = 0
+  chunks.forEach(function(chunk, index) {
+    sizes[index] = chunk.byteLength
+    total += chunk.byteLength
+  })
+  let buffer = new Uint8Array(total)
+  let offset = 0
+  chunks.forEach(function(chunk) {
+    buffer.set(chunk, offset)
+    offset += chunk.byteLength
+  })
+  return [buffer.buffer, total, sizes]
+}
+
 Channel.prototype.onNotificationReceived = function(data) {
-  if (this.notificationCallback) {
+  if (this.arrayCallback && isArray(data)) {
+    this.arrayCallback(unpackArray(data))
+  } else if (this.notificationCallback) {
     this.notificationCallback(this.dataConverter ? this.dataConverter.fromBytes(data) : data)
   }
 }
 
 Channel.prototype.onRequestReceived = function(request) {
   let data = request.getData()
-  console.log("request received: %s", data)
   if (this.requestCallback) {
     if (this.dataConverter) {
       data = this.dataConverter.fromBytes(data)
     }
     let that = this
     let respond = function(response) {
-      console.log("send response: %s", data)
       let [bytes, length] = that.dataConverter ? that.dataConverter.toBytes(response) : [response, response.byteLength]
       request.sendResponse(bytes, length)
-      console.log("send response done: %s", data)
+    }
+    // Partial responses are received by requestStream on the other side.
+    respond.partial = function(response) {
+      let [bytes, length] = that.dataConverter ? that.dataConverter.toBytes(response) : [response, response.byteLength]
+      request.sendPartialResponse(bytes, length)
+    }
+    this.requestCallback(data, respond)
+  } else {
+    request.sendResponse(data, data.byteLength)
+  }
+}
+
+
+Channel.prototype.onBatchReceived = function(batch) {
+  let length = batch.getLength()
+  for (let i = 0; i < length; i++) {
+    let kind = batch.getKind(i)
+    if (kind === MESSAGE_KIND_NOTIFICATION) {
+      this.onNotificationReceived(batch.getData(i))
+    } else if (kind === MESSAGE_KIND_REQUEST) {
+      this.onBatchRequestReceived(batch.getId(i), batch.getData(i))
+    }
+  }
+}
+
+Channel.prototype.onBatchRequestReceived = function(id, data) {
+  let channel = this._channel
+  if (this.requestCallback) {
+    if (this.dataConverter) {
+      data = this.dataConverter.fromBytes(data)
+    }
+    let that = this
+    let respond = function(response) {
+      let [bytes, length] = that.dataConverter ? that.dataConverter.toBytes(response) : [response, response.byteLength]
+      channel.sendResponse(id, bytes, length)
+    }
+    respond.partial = function(response) {
+      let [bytes, length] = that.dataConverter ? that.dataConverter.toBytes(response) : [response, response.byteLength]
+      channel.sendPartialResponse(id, bytes, length)
     }
     this.requestCallback(data, respond)
+  } else {
+    channel.sendResponse(id, data, data.byteLength)
+  }
+}
+
+
+const ChannelServer = function(name, maxClients, requestCallback, notificationCallback, dataConverter) {
+  this.name = name
+  this.maxClients = maxClients
+  this.dataConverter = dataConverter || null
+  this.running = false
+  this._wakeup = null
+  this._stopped = null
+  this._pending = new Map()
+  this._deadlineTimer = null
+  this._server = new shmch.ChannelServer(name, maxClients)
+  this.requestCallback = requestCallback || null
+  this.notificationCallback = notificationCallback || null
+  this.clientCallback = null
+  this._server.setRequestCallback(this.onRequestReceived.bind(this))
+  this._server.setNotificationCallback(this.onNotificationReceived.bind(this))
+  this._server.setClientCallback(this.onClientChanged.bind(this))
+}
+
+ChannelServer.prototype.setNotificationCallback = function(callback){
+  this.notificationCallback = callback
+}
+
+ChannelServer.prototype.setRequestCallback = function(callback){
+  this.requestCallback = callback
+}
+
+ChannelServer.prototype.setClientCallback = function(callback){
+  this.clientCallback = callback
+}
+
+ChannelServer.prototype.setArenaSize = function(size){
+  this._server.setArenaSize(size)
+}
+
+ChannelServer.prototype.setPoolSize = function(size){
+  this._server.setPoolSize(size)
+}
+
+ChannelServer.prototype.setSlotCapacity = function(capacity){
+  this._server.setSlotCapacity(capacity)
+}
+
+ChannelServer.prototype.getClientCount = function(){
+  return this._server.getNClients()
+}
+
+ChannelServer.prototype.collectDeadClients = function(){
+  return this._server.collectDeadClients()
+}
+
+ChannelServer.prototype.open = function(){
+  this._server.open()
+}
+
+ChannelServer.prototype.close = function(){
+  this.stopCommunication()
+  this._server.close()
+  this.failPending(null)
+}
+
+ChannelServer.prototype.notify = function (client, data) {
+  let [bytes, length] = this.dataConverter ? this.dataConverter.toBytes(data) : [data, data.byteLength]
+  this._server.notify(client, bytes, length)
+}
+
+ChannelServer.prototype.request = function(client, data) {
+  let [bytes, length] = this.dataConverter ? this.dataConverter.toBytes(data) : [data, data.byteLength]
+  let pending = this._pending
+  let server = this._server
+  let dataConverter = this.dataConverter
+  return new Promise(function(resolve, reject) {
+    let key = null
+    key = client + ":" + server.request(client, bytes, length, function(response) {
+      pending.delete(key)
+      resolve(dataConverter ? dataConverter.fromBytes(response) : response)
+    })
+    pending.set(key, {client, reject})
+  })
+}
+
+// Reject pending requests to the given client or to all clients if it is null.
+ChannelServer.prototype.failPending = function(client) {
+  let name = this.name
+  this._pending.forEach(function(request, key, pending) {
+    if (client === null || request.client === client) {
+      pending.delete(key)
+      let error = new Error("Client " + request.client + " of " + name + " has disconnected.")
+      error.name = "ConnectionResetError"
+      request.reject(error)
+    }
+  })
+}
+
+ChannelServer.prototype.startCommunication = function () {
+  if (this.running) {
+    return this._stopped
+  }
+  this.running = true
+  // The socket takes ownership of the duplicated fd of the doorbell shared by all clients.
+  let wakeup = new net.Socket({fd: this._server.dupWakeupFd(), readable: true, writable: false})
+  this._wakeup = wakeup
+  this._stopped = new Promise(function(resolve, reject){
+    wakeup.on('close', resolve)
+    wakeup.on('error', reject)
+  })
+  let that = this
+  wakeup.on('data', function() {
+    that.sendReceive()
+  })
+  this.sendReceive()
+  return this._stopped
+}
+
+ChannelServer.prototype.stopCommunication = Channel.prototype.stopCommunication
+
+ChannelServer.prototype.sendReceive = function() {
+  let result = this._server.sendReceive()
+  if (this.running) {
+    this.scheduleDeadline()
+  }
+  return result
+}
+
+ChannelServer.prototype.scheduleDeadline = function() {
+  if (this._deadlineTimer) {
+    clearTimeout(this._deadlineTimer)
+    this._deadlineTimer = null
+  }
+  let timeout = this._server.getNextTimeout()
+  if (timeout >= 0) {
+    this._deadlineTimer = setTimeout(this.sendReceive.bind(this), timeout)
+  }
+}
+
+ChannelServer.prototype.onNotificationReceived = function(client, data) {
+  if (this.notificationCallback) {
+    this.notificationCallback(client, this.dataConverter ? this.dataConverter.fromBytes(data) : data)
+  }
+}
+
+ChannelServer.prototype.onRequestReceived = function(client, request) {
+  let data = request.getData()
+  if (this.requestCallback) {
+    if (this.dataConverter) {
+      data = this.dataConverter.fromBytes(data)
+    }
+    let that = this
+    let respond = function(response) {
+      let [bytes, length] = that.dataConverter ? that.dataConverter.toBytes(response) : [response, response.byteLength]
+      request.sendResponse(bytes, length)
+    }
+    respond.partial = function(response) {
+      let [bytes, length] = that.dataConverter ? that.dataConverter.toBytes(response) : [response, response.byteLength]
+      request.sendPartialResponse(bytes, length)
+    }
+    this.requestCallback(client, data, respond)
   } else {
     request.sendResponse(data, data.byteLength)
   }
 }
 
+ChannelServer.prototype.onClientChanged = function(client, connected) {
+  if (!connected) {
+    this.failPending(client)
+  }
+  if (this.clientCallback) {
+    this.clientCallback(client, connected)
+  }
+}
+
+
+// libuv already waits for the wakeup fds of all channels with a single epoll instance, so the group only starts and
+// stops the communication of its channels together.
+const ChannelGroup = function() {
+  this.running = false
+  this._channels = new Set()
+}
+
+Object.defineProperty(ChannelGroup.prototype, 'size', {
+  get: function() {
+    return this._channels.size
+  }
+})
+
+ChannelGroup.prototype.add = function(channel) {
+  if (this._channels.has(channel)) {
+    return false
+  }
+  this._channels.add(channel)
+  if (this.running) {
+    channel.startCommunication()
+  }
+  return true
+}
+
+ChannelGroup.prototype.remove = function(channel) {
+  if (!this._channels.delete(channel)) {
+    return false
+  }
+  if (this.running) {
+    channel.stopCommunication()
+  }
+  return true
+}
+
+ChannelGroup.prototype.has = function(channel) {
+  return this._channels.has(channel)
+}
+
+ChannelGroup.prototype.startCommunication = function() {
+  this.running = true
+  this._channels.forEach(function(channel) {
+    channel.startCommunication()
+  })
+}
+
+ChannelGroup.prototype.stopCommunication = function() {
+  this.running = false
+  this._channels.forEach(function(channel) {
+    channel.stopCommunication()
+  })
+}
+
+
+// A Readable stream of chunks which gives the credit for each chunk back to the sender once it is consumed.
+const IncomingStream = function(channel, id, metadata) {
+  Readable.call(this)
+  this.id = id
+  this.metadata = metadata
+  this._channel = channel
+  this._chunks = []
+  this._reading = false
+  this._ended = false
+}
+
+util.inherits(IncomingStream, Readable)
+
+IncomingStream.prototype._read = function() {
+  this._reading = true
+  this.flush()
+}
+
+IncomingStream.prototype._destroy = function(error, callback) {
+  this._reading = false
+  this._ended = true
+  let channel = this._channel
+  this._chunks.forEach(function(chunk) {
+    channel.consumeStreamChunk(chunk.byteLength)
+  })
+  this._chunks = []
+  callback(error)
+}
+
+IncomingStream.prototype.pushChunk = function(data) {
+  if (this._ended) {
+    this._channel.consumeStreamChunk(data.byteLength)
+  } else {
+    this._chunks.push(data)
+    this.flush()
+  }
+}
+
+IncomingStream.prototype.finish = function() {
+  this._ended = true
+  this.flush()
+}
+
+IncomingStream.prototype.flush = function() {
+  while (this._reading && this._chunks.length > 0) {
+    let chunk = this._chunks.shift()
+    this._channel.consumeStreamChunk(chunk.byteLength)
+    this._reading = this.push(Buffer.from(chunk))
+  }
+  if (this._ended && this._chunks.length === 0 && !this.destroyed) {
+    this.push(null)
+  }
+}
+
+
+// A Writable stream which waits for the credit granted by the other side before sending each chunk.
+const OutgoingStream = function(channel, stream) {
+  Writable.call(this)
+  this.id = stream.getId()
+  this._channel = channel
+  this._stream = stream
+}
+
+util.inherits(OutgoingStream, Writable)
+
+OutgoingStream.prototype._write = function(chunk, encoding, callback) {
+  this.writeChunks(chunk).then(function() {
+    callback()
+  }, callback)
+}
+
+OutgoingStream.prototype.writeChunks = async function(chunk) {
+  let chunkSize = this._channel.getStreamChunkSize() || chunk.byteLength
+  let offset = 0
+  while (offset < chunk.byteLength) {
+    let size = Math.min(chunkSize, chunk.byteLength - offset)
+    await this._channel.drain(size)
+    let start = chunk.byteOffset + offset
+    offset += this._stream.write(chunk.buffer.slice(start, start + size), size)
+  }
+}
+
+OutgoingStream.prototype._final = function(callback) {
+  let stream = this._stream
+  this._channel.drain(0).then(function() {
+    stream.finish()
+    callback()
+  }).catch(callback)
+}
+
+OutgoingStream.prototype._destroy = function(error, callback) {
+  if (this._stream.getFinished() || !this._channel._channel.getIsOpened()) {
+    callback(error)
+    return
+  }
+  let stream = this._stream
+  this._channel.drain(0).then(function() {
+    stream.abort()
+    callback(error)
+  }).catch(callback)
+}
+
 
 const StringDataConverter = function() {
 
@@ -122,7 +970,133 @@ StringDataConverter.prototype.fromBytes = function (data) {
   return decodeUTF8String(new Uint8Array(data))
 }
 
+// The payload layout of arrays is shared with shmchannel/arrays.py: a header with the magic, the number
+// of dimensions, the length of the NumPy dtype string and the offset of the data, followed by the shape,
+// the strides in bytes and the dtype string.
+const ARRAY_MAGIC = 0x5241444e  // "NDAR" read as a little-endian uint32
+const ARRAY_HEADER_SIZE = 8
+const ARRAY_DATA_ALIGNMENT = 64
+const ARRAY_TYPES = {
+  "|i1": Int8Array, "|u1": Uint8Array, "<i2": Int16Array, "<u2": Uint16Array, "<i4": Int32Array,
+  "<u4": Uint32Array, "<i8": BigInt64Array, "<u8": BigUint64Array, "<f4": Float32Array, "<f8": Float64Array
+}
+
+function getArrayDtype(data) {
+  for (let dtype in ARRAY_TYPES) {
+    if (data instanceof ARRAY_TYPES[dtype]) {
+      return dtype
+    }
+  }
+  throw new TypeError("Unsupported array type: " + Object.prototype.toString.call(data))
+}
+
+function getArrayDataOffset(ndim) {
+  let size = ARRAY_HEADER_SIZE + 16 * ndim + 3
+  return Math.ceil(size / ARRAY_DATA_ALIGNMENT) * ARRAY_DATA_ALIGNMENT
+}
+
+function getPackedArraySize(data, shape) {
+  return getArrayDataOffset((shape || [data.length]).length) + data.byteLength
+}
+
+// Pack a typed array as a C-contiguous array of the given shape (one-dimensional by default).
+function packArrayInto(buffer, data, shape) {
+  shape = shape || [data.length]
+  let dtype = getArrayDtype(data)
+  let count = shape.reduce(function(a, b) {
+    return a * b
+  }, 1)
+  if (count !== data.length) {
+    throw new RangeError("The shape [" + shape + "] does not match " + data.length + " elements.")
+  }
+  let offset = getArrayDataOffset(shape.length)
+  let view = new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength)
+  view.setUint32(0, ARRAY_MAGIC, true)
+  view.setUint8(4, shape.length)
+  view.setUint8(5, dtype.length)
+  view.setUint16(6, offset, true)
+  let stride = data.BYTES_PER_ELEMENT
+  for (let i = shape.length - 1; i >= 0; i--) {
+    view.setBigInt64(ARRAY_HEADER_SIZE + 8 * i, BigInt(shape[i]), true)
+    view.setBigInt64(ARRAY_HEADER_SIZE + 8 * (shape.length + i), BigInt(stride), true)
+    stride *= Math.max(shape[i], 1)
+  }
+  for (let i = 0; i < dtype.length; i++) {
+    view.setUint8(ARRAY_HEADER_SIZE + 16 * shape.length + i, dtype.charCodeAt(i))
+  }
+  new Uint8Array(buffer.buffer, buffer.byteOffset + offset, data.byteLength).set(
+    new Uint8Array(data.buffer, data.byteOffset, data.byteLength))
+}
+
+function packArray(data, shape) {
+  let buffer = new Uint8Array(getPackedArraySize(data, shape))
+  packArrayInto(buffer, data, shape)
+  return buffer.buffer
+}
+
+function isArray(buffer) {
+  return buffer.byteLength >= ARRAY_HEADER_SIZE && new DataView(buffer).getUint32(0, true) === ARRAY_MAGIC
+}
+
+// The typed array of the result views the received buffer without copying. Strides are in bytes.
+function unpackArray(buffer) {
+  if (!isArray(buffer)) {
+    throw new TypeError("The payload does not contain an array.")
+  }
+  let view = new DataView(buffer)
+  let ndim = view.getUint8(4)
+  let offset = view.getUint16(6, true)
+  let shape = []
+  let strides = []
+  for (let i = 0; i < ndim; i++) {
+    shape.push(Number(view.getBigInt64(ARRAY_HEADER_SIZE + 8 * i, true)))
+    strides.push(Number(view.getBigInt64(ARRAY_HEADER_SIZE + 8 * (ndim + i), true)))
+  }
+  let dtypeBytes = new Uint8Array(buffer, ARRAY_HEADER_SIZE + 16 * ndim, view.getUint8(5))
+  let dtype = String.fromCharCode.apply(null, dtypeBytes)
+  let type = ARRAY_TYPES[dtype]
+  if (!type) {
+    throw new TypeError("Unsupported array dtype: " + dtype)
+  }
+  let length = shape.reduce(function(a, b) {
+    return a * b
+  }, 1)
+  return {shape, strides, dtype, data: new type(buffer, offset, length)}
+}
+
+function createAbortError() {
+  let error = new Error("The request has been aborted.")
+  error.name = "AbortError"
+  return error
+}
+
 const MODE_SERVER = 0
 const MODE_CLIENT = 1
+// The names of statistics in the order of the ShmchStat enum.
+const STAT_NAMES = [
+  "messagesSent", "bytesSent", "messagesReceived", "bytesReceived", "arenaPayloads", "poolPayloads",
+  "segmentPayloads", "sendReceiveCalls", "outgoingRingFull", "incomingRingFull", "doorbellRings", "doorbellDrains",
+  "waits", "segmentsOpened", "outgoingQueueLength", "outgoingQueueMax", "incomingBatchMax", "pendingRequests",
+  "requestsTimedOut", "creditStalls", "inlinePayloads"
+]
+const MESSAGE_KIND_NOTIFICATION = 0
+const MESSAGE_KIND_REQUEST = 1
+const MESSAGE_KIND_RESPONSE = 2
+const STREAM_OPEN = 0
+const STREAM_DATA = 1
+const STREAM_END = 2
+const STREAM_ABORT = 3
+const SHMEM_POPULATE = 1 << 0
+const SHMEM_HUGEPAGES = 1 << 1
+const SHMEM_WILL_NEED = 1 << 2
+const SHMEM_MLOCK = 1 << 3
+const LATENCY_QUEUED = 0
+const LATENCY_IN_RING = 1
+const LATENCY_CALLBACK = 2
+const LATENCY_TOTAL = 3
+const LATENCY_PERCENTILES = [50, 90, 99, 99.9]
 
-module.exports = {Channel, StringDataConverter,encodeStringAsUTF8, decodeUTF8String, MODE_CLIENT, MODE_SERVER}
+module.exports = {Channel, ChannelServer, ChannelGroup, IncomingStream, OutgoingStream, StringDataConverter,
+  encodeStringAsUTF8, decodeUTF8String, packArray, unpackArray, MODE_CLIENT, MODE_SERVER, MESSAGE_KIND_NOTIFICATION,
+  MESSAGE_KIND_REQUEST, MESSAGE_KIND_RESPONSE, LATENCY_QUEUED, LATENCY_IN_RING, LATENCY_CALLBACK, LATENCY_TOTAL,
+  SHMEM_POPULATE, SHMEM_HUGEPAGES, SHMEM_WILL_NEED, SHMEM_MLOCK}
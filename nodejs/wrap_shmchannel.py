@@ -6,7 +6,7 @@ import sys
 sys.path.append(os.path.dirname(__file__))
 
 from glibclasswrapper.binder import Binder
-from glibclasswrapper.types import IntegerTyp, CallbackTyp, UnknownTyp
+from glibclasswrapper.types import IntegerTyp, CallbackTyp, UnknownTyp, ObjectTyp, SharedBytesTyp, NumberTyp
 
 SHMCH_SPEC = {
     "target": "_shmchannel",
@@ -22,15 +22,116 @@ SHMCH_SPEC = {
                 'void* callback_target, GDestroyNotify callback_target_destroy_notify)',
                 'void shmch_channel_set_notification_callback(ShmchChannel * self, ShmchDataCallback callback, '
                     'void * callback_target, GDestroyNotify callback_target_destroy_notify)',
-                'void shmch_channel_request(ShmchChannel * self, guint8 * data, int data_length1, ShmchDataCallback '
+                'void shmch_channel_set_batch_callback(ShmchChannel * self, ShmchBatchCallback callback, '
+                    'void * callback_target, GDestroyNotify callback_target_destroy_notify)',
+                'void shmch_channel_set_timeout_callback(ShmchChannel * self, ShmchTimeoutCallback callback, '
+                    'void * callback_target, GDestroyNotify callback_target_destroy_notify)',
+                'void shmch_channel_set_stream_callback(ShmchChannel * self, ShmchStreamCallback callback, '
+                    'void * callback_target, GDestroyNotify callback_target_destroy_notify)',
+                'ShmchOutgoingStream* shmch_channel_open_stream(ShmchChannel * self, guint8 * metadata, '
+                    'int metadata_length1, GError ** error)',
+                'void shmch_channel_consume_stream_chunk(ShmchChannel * self, gint size)',
+                'gboolean shmch_channel_cancel_request(ShmchChannel * self, guint id)',
+                'gint shmch_channel_get_next_timeout(ShmchChannel * self)',
+                'gboolean shmch_channel_has_credit(ShmchChannel * self, gint size)',
+                'guint shmch_channel_request(ShmchChannel * self, guint8 * data, int data_length1, ShmchDataCallback '
                     'response_callback, void * response_callback_target, GDestroyNotify '
                     'response_callback_target_destroy_notify, GError ** error)',
+                'guint shmch_channel_request_stream(ShmchChannel * self, guint8 * data, int data_length1, '
+                    'ShmchStreamingResponseCallback frame_callback, void * frame_callback_target, '
+                    'GDestroyNotify frame_callback_target_destroy_notify, GError ** error)',
                 'void shmch_channel_notify(ShmchChannel * self, guint8 * data, int data_length1, GError ** error)',
+                'guint64 shmch_channel_get_stat(ShmchChannel * self, ShmchStat stat)',
+                'void shmch_channel_reset_stats(ShmchChannel * self)',
+                'ShmchLatencyHistogram* shmch_channel_get_latency_histogram(ShmchChannel * self, '
+                    'ShmchLatencyStage stage)',
+                'void shmch_channel_reset_latency_histograms(ShmchChannel * self)',
+                'ShmchReservation* shmch_channel_reserve(ShmchChannel * self, gint size, GError ** error)',
+                'void shmch_channel_commit(ShmchChannel * self, ShmchReservation * reservation, GError ** error)',
+                'guint shmch_channel_commit_request(ShmchChannel * self, ShmchReservation * reservation, '
+                    'ShmchDataCallback response_callback, void * response_callback_target, '
+                    'GDestroyNotify response_callback_target_destroy_notify, GError ** error)',
+                'void shmch_channel_cancel_reservation(ShmchChannel * self, ShmchReservation * reservation, '
+                    'GError ** error)',
+                'void shmch_channel_send_response(ShmchChannel * self, guint id, guint8 * data, int data_length1, '
+                    'GError ** error)',
+                'void shmch_channel_send_partial_response(ShmchChannel * self, guint id, guint8 * data, '
+                    'int data_length1, GError ** error)',
+                'void shmch_channel_request_many(ShmchChannel * self, guint8 * data, int data_length1, gint * sizes, '
+                    'int sizes_length1, guint * ids, int ids_length1, ShmchBatchResponseCallback response_callback, '
+                    'void * response_callback_target, GDestroyNotify response_callback_target_destroy_notify, '
+                    'GError ** error)',
+                'void shmch_channel_notify_many(ShmchChannel * self, guint8 * data, int data_length1, gint * sizes, '
+                    'int sizes_length1, GError ** error)',
                 'gboolean shmch_channel_send_receive(ShmchChannel * self, gboolean wait, GError ** error)',
                 'void shmch_channel_close(ShmchChannel * self, GError ** error)',
+                'gint shmch_channel_dup_wakeup_fd(ShmchChannel * self, GError ** error)',
+                'gboolean shmch_channel_wait_for_data(ShmchChannel * self, gint timeout, GError ** error)',
                 'const gchar * shmch_channel_get_name(ShmchChannel * self)',
                 'ShmchMode shmch_channel_get_mode(ShmchChannel * self)',
                 'gboolean shmch_channel_get_is_opened(ShmchChannel * self)',
+                'guint shmch_channel_get_arena_size(ShmchChannel * self)',
+                'void shmch_channel_set_arena_size(ShmchChannel * self, guint value)',
+                'guint shmch_channel_get_pool_size(ShmchChannel * self)',
+                'void shmch_channel_set_pool_size(ShmchChannel * self, guint value)',
+                'guint shmch_channel_get_slot_capacity(ShmchChannel * self)',
+                'void shmch_channel_set_slot_capacity(ShmchChannel * self, guint value)',
+                'gboolean shmch_channel_get_tracing(ShmchChannel * self)',
+                'void shmch_channel_set_tracing(ShmchChannel * self, gboolean value)',
+                'guint shmch_channel_get_request_timeout(ShmchChannel * self)',
+                'void shmch_channel_set_request_timeout(ShmchChannel * self, guint value)',
+                'guint shmch_channel_get_max_pending_requests(ShmchChannel * self)',
+                'void shmch_channel_set_max_pending_requests(ShmchChannel * self, guint value)',
+                'guint shmch_channel_get_receive_window_packets(ShmchChannel * self)',
+                'void shmch_channel_set_receive_window_packets(ShmchChannel * self, guint value)',
+                'guint shmch_channel_get_receive_window_bytes(ShmchChannel * self)',
+                'void shmch_channel_set_receive_window_bytes(ShmchChannel * self, guint value)',
+                'gboolean shmch_channel_get_io_thread(ShmchChannel * self)',
+                'void shmch_channel_set_io_thread(ShmchChannel * self, gboolean value)',
+                'guint shmch_channel_get_stream_chunk_size(ShmchChannel * self)',
+                'void shmch_channel_set_stream_chunk_size(ShmchChannel * self, guint value)',
+                'gboolean shmch_channel_get_defer_stream_credit(ShmchChannel * self)',
+                'void shmch_channel_set_defer_stream_credit(ShmchChannel * self, gboolean value)',
+                'ShmchShmemFlags shmch_channel_get_shmem_flags(ShmchChannel * self)',
+                'void shmch_channel_set_shmem_flags(ShmchChannel * self, ShmchShmemFlags value)',
+                'ShmchShmemFlags shmch_channel_get_segment_shmem_flags(ShmchChannel * self)',
+                'void shmch_channel_set_segment_shmem_flags(ShmchChannel * self, ShmchShmemFlags value)',
+            ],
+        },
+        {
+            "name": "ShmchChannelServer",
+            "header": "shmchannel.h",
+            "methods": [
+                'ShmchChannelServer* shmch_channel_server_new (const gchar* name, guint max_clients)',
+                'void shmch_channel_server_open (ShmchChannelServer* self, GError** error)',
+                'void shmch_channel_server_close (ShmchChannelServer* self, GError** error)',
+                'ShmchChannel* shmch_channel_server_get_client (ShmchChannelServer* self, guint index, '
+                    'GError** error)',
+                'gint shmch_channel_server_dup_wakeup_fd (ShmchChannelServer* self, GError** error)',
+                'gint shmch_channel_server_get_next_timeout (ShmchChannelServer* self)',
+                'void shmch_channel_server_set_request_callback (ShmchChannelServer* self, '
+                    'ShmchClientRequestCallback callback, void* callback_target, '
+                    'GDestroyNotify callback_target_destroy_notify)',
+                'void shmch_channel_server_set_notification_callback (ShmchChannelServer* self, '
+                    'ShmchClientDataCallback callback, void* callback_target, '
+                    'GDestroyNotify callback_target_destroy_notify)',
+                'void shmch_channel_server_set_client_callback (ShmchChannelServer* self, '
+                    'ShmchClientStateCallback callback, void* callback_target, '
+                    'GDestroyNotify callback_target_destroy_notify)',
+                'void shmch_channel_server_notify (ShmchChannelServer* self, guint client, guint8* data, '
+                    'int data_length1, GError** error)',
+                'guint shmch_channel_server_request (ShmchChannelServer* self, guint client, guint8* data, '
+                    'int data_length1, ShmchDataCallback response_callback, void* response_callback_target, '
+                    'GDestroyNotify response_callback_target_destroy_notify, GError** error)',
+                'gboolean shmch_channel_server_send_receive (ShmchChannelServer* self, GError** error)',
+                'guint shmch_channel_server_collect_dead_clients (ShmchChannelServer* self, GError** error)',
+                'const gchar* shmch_channel_server_get_name (ShmchChannelServer* self)',
+                'guint shmch_channel_server_get_max_clients (ShmchChannelServer* self)',
+                'guint shmch_channel_server_get_n_clients (ShmchChannelServer* self)',
+                'gboolean shmch_channel_server_get_is_opened (ShmchChannelServer* self)',
+                'void shmch_channel_server_set_arena_size (ShmchChannelServer* self, guint value)',
+                'void shmch_channel_server_set_pool_size (ShmchChannelServer* self, guint value)',
+                'void shmch_channel_server_set_slot_capacity (ShmchChannelServer* self, guint value)',
             ],
         },
         {
@@ -39,19 +140,97 @@ SHMCH_SPEC = {
             "methods": [
                 'guint8* shmch_incoming_request_get_data (ShmchIncomingRequest* self, int* result_length1)',
                 'void shmch_incoming_request_send_response (ShmchIncomingRequest* self, guint8* data, '
-                    'int data_length1, GError** error)'
+                    'int data_length1, GError** error)',
+                'void shmch_incoming_request_send_partial_response (ShmchIncomingRequest* self, guint8* data, '
+                    'int data_length1, GError** error)',
+            ],
+        },
+        {
+            "name": 'ShmchIncomingBatch',
+            'header': 'shmchannel.h',
+            "methods": [
+                'gint shmch_incoming_batch_get_length (ShmchIncomingBatch* self)',
+                'ShmchMessageKind shmch_incoming_batch_get_kind (ShmchIncomingBatch* self, gint index)',
+                'guint shmch_incoming_batch_get_id (ShmchIncomingBatch* self, gint index)',
+                'guint8* shmch_incoming_batch_get_data (ShmchIncomingBatch* self, gint index, int* result_length1)',
+            ],
+        },
+        {
+            "name": 'ShmchReservation',
+            'header': 'shmchannel.h',
+            "methods": [
+                'gint shmch_reservation_get_size (ShmchReservation* self)',
+                # guchar* (an alias of guint8*) selects SharedBytesTyp to expose the buffer without a copy.
+                'guchar* shmch_reservation_get_buffer (ShmchReservation* self, int* result_length1)',
+            ],
+        },
+        {
+            "name": 'ShmchOutgoingStream',
+            'header': 'shmchannel.h',
+            "methods": [
+                'gint shmch_outgoing_stream_write (ShmchOutgoingStream* self, guint8* data, int data_length1, '
+                    'GError** error)',
+                'void shmch_outgoing_stream_finish (ShmchOutgoingStream* self, GError** error)',
+                'void shmch_outgoing_stream_abort (ShmchOutgoingStream* self, GError** error)',
+                'guint shmch_outgoing_stream_get_id (ShmchOutgoingStream* self)',
+                'gboolean shmch_outgoing_stream_get_finished (ShmchOutgoingStream* self)',
+            ],
+        },
+        {
+            "name": 'ShmchLatencyHistogram',
+            'header': 'shmchannel.h',
+            "methods": [
+                'guint64 shmch_latency_histogram_get_count (ShmchLatencyHistogram* self)',
+                'gint64 shmch_latency_histogram_get_min (ShmchLatencyHistogram* self)',
+                'gint64 shmch_latency_histogram_get_max (ShmchLatencyHistogram* self)',
+                'gdouble shmch_latency_histogram_get_mean (ShmchLatencyHistogram* self)',
+                'gint64 shmch_latency_histogram_get_value_at_percentile (ShmchLatencyHistogram* self, '
+                    'gdouble percentile)',
             ],
         }
     ],
     'callbacks': [
         'void ShmchDataCallback (guint8* data, int data_length1, void* user_data)',
         'void ShmchRequestCallback (ShmchIncomingRequest* request, void* user_data)',
+        'void ShmchStreamingResponseCallback (guint8* data, int data_length1, gboolean last, void* user_data)',
+        'void ShmchBatchResponseCallback (gint index, guint8* data, int data_length1, void* user_data)',
+        'void ShmchBatchCallback (ShmchIncomingBatch* batch, void* user_data)',
+        'void ShmchTimeoutCallback (guint id, void* user_data)',
+        'void ShmchClientRequestCallback (guint client, ShmchIncomingRequest* request, void* user_data)',
+        'void ShmchClientDataCallback (guint client, guint8* data, int data_length1, void* user_data)',
+        'void ShmchClientStateCallback (guint client, gboolean connected, void* user_data)',
+        'void ShmchStreamCallback (guint id, ShmchStreamEvent event, guint8* data, int data_length1, '
+            'void* user_data)',
     ],
     "types": {
         "ShmchMode": IntegerTyp,
+        "ShmchMessageKind": IntegerTyp,
+        "ShmchStat": IntegerTyp,
+        "ShmchLatencyStage": IntegerTyp,
+        "ShmchStreamEvent": IntegerTyp,
+        "ShmchShmemFlags": IntegerTyp,
+        "guint64": NumberTyp,
+        "gint64": NumberTyp,
+        "gdouble": NumberTyp,
+        "guint": IntegerTyp,
+        "gint": IntegerTyp,
         'ShmchRequestCallback': CallbackTyp,
         'ShmchDataCallback': CallbackTyp,
+        'ShmchStreamingResponseCallback': CallbackTyp,
+        'ShmchBatchResponseCallback': CallbackTyp,
+        'ShmchBatchCallback': CallbackTyp,
+        'ShmchTimeoutCallback': CallbackTyp,
+        'ShmchClientRequestCallback': CallbackTyp,
+        'ShmchClientDataCallback': CallbackTyp,
+        'ShmchClientStateCallback': CallbackTyp,
+        'ShmchStreamCallback': CallbackTyp,
+        'ShmchChannel*': ObjectTyp,
         'ShmchIncomingRequest*': UnknownTyp,
+        'ShmchIncomingBatch*': UnknownTyp,
+        'ShmchReservation*': ObjectTyp,
+        'ShmchOutgoingStream*': ObjectTyp,
+        'ShmchLatencyHistogram*': ObjectTyp,
+        'guchar*': SharedBytesTyp,
     }
 }
 
@@ -12,4 +12,5 @@ setup(
     setup_requires=["cffi>=1.0.0"],
     cffi_modules=["cffibuilders/shmch.py:builder"],
     install_requires=["cffi>=1.0.0"],
+    extras_require={"numpy": ["numpy"]},
 )
@@ -1,2 +1,11 @@
 # noinspection PyUnresolvedReferences
-from .channel import Channel, MODE_CLIENT, MODE_SERVER
+from .channel import Channel, MODE_CLIENT, MODE_SERVER, LATENCY_QUEUED, LATENCY_IN_RING, LATENCY_CALLBACK, \
+    LATENCY_TOTAL, SHMEM_POPULATE, SHMEM_HUGEPAGES, SHMEM_WILL_NEED, SHMEM_MLOCK
+# noinspection PyUnresolvedReferences
+from .server import ChannelServer
+# noinspection PyUnresolvedReferences
+from .group import ChannelGroup
+# noinspection PyUnresolvedReferences
+from .stream import IncomingStream, OutgoingStream
+# noinspection PyUnresolvedReferences
+from .shmem import Shmem
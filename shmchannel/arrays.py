@@ -0,0 +1,86 @@
+import struct
+from typing import Tuple, Union
+
+import numpy as np
+
+from shmchannel import libshmch
+
+MAGIC = b"NDAR"
+# magic, ndim, length of the dtype string, offset of the data
+HEADER = struct.Struct("<4sBBH")
+DATA_ALIGNMENT = 64
+
+
+def is_array(data: Union[bytes, libshmch.Lease]) -> bool:
+    buffer = data.data if isinstance(data, libshmch.Lease) else data
+    if len(buffer) < HEADER.size:
+        return False
+    magic, ndim, dtype_size, offset = HEADER.unpack_from(buffer, 0)
+    # Any payload may start with the magic, so the rest of the header must be consistent too.
+    return magic == MAGIC and HEADER.size + 16 * ndim + dtype_size <= offset <= len(buffer)
+
+
+def get_strides(array: np.ndarray) -> Tuple[int, ...]:
+    # Fortran-ordered arrays keep their layout, anything else is sent as a C-contiguous array.
+    if array.flags.f_contiguous and not array.flags.c_contiguous:
+        return array.strides
+    strides = []
+    stride = array.dtype.itemsize
+    for size in reversed(array.shape):
+        strides.append(stride)
+        stride *= max(size, 1)
+    return tuple(reversed(strides))
+
+
+def get_packed_size(array: np.ndarray) -> Tuple[int, int]:
+    dtype = array.dtype.str.encode()
+    header_size = HEADER.size + 16 * array.ndim + len(dtype)
+    offset = (header_size + DATA_ALIGNMENT - 1) // DATA_ALIGNMENT * DATA_ALIGNMENT
+    return offset, offset + array.nbytes
+
+
+def pack_into(buffer: memoryview, array: np.ndarray):
+    if array.dtype.hasobject:
+        raise TypeError("Arrays of Python objects cannot be sent.")
+    if array.ndim > 255:
+        raise ValueError("Arrays with more than 255 dimensions cannot be sent.")
+    strides = get_strides(array)
+    dtype = array.dtype.str.encode()
+    offset, size = get_packed_size(array)
+    HEADER.pack_into(buffer, 0, MAGIC, array.ndim, len(dtype), offset)
+    struct.pack_into("<%dq%dq%ds" % (array.ndim, array.ndim, len(dtype)), buffer, HEADER.size,
+                     *array.shape, *strides, dtype)
+    target = np.ndarray(array.shape, array.dtype, buffer, offset, strides)
+    np.copyto(target, array, casting="no")
+    del target
+
+
+def pack(array: np.ndarray) -> bytes:
+    array = np.asanyarray(array)
+    buffer = bytearray(get_packed_size(array)[1])
+    pack_into(memoryview(buffer), array)
+    return bytes(buffer)
+
+
+def unpack(data: Union[bytes, libshmch.Lease]) -> np.ndarray:
+    # A leased payload is viewed directly and released once the array and all its views are gone.
+    buffer = np.asarray(data.detach()) if isinstance(data, libshmch.Lease) else data
+    magic, ndim, dtype_size, offset = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("The payload does not contain an array.")
+    fields = struct.unpack_from("<%dq%dq%ds" % (ndim, ndim, dtype_size), buffer, HEADER.size)
+    shape, strides, dtype = fields[:ndim], fields[ndim:2 * ndim], np.dtype(fields[-1].decode())
+    array = np.ndarray(shape, dtype, buffer, offset, strides)
+    array.flags.writeable = False
+    return array
+
+
+def reserve(channel, array: np.ndarray) -> memoryview:
+    array = np.asanyarray(array)
+    buffer = channel.reserve(get_packed_size(array)[1])
+    try:
+        pack_into(buffer, array)
+    except Exception:
+        channel.cancel_reservation(buffer)
+        raise
+    return buffer
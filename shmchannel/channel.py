@@ -1,18 +1,78 @@
 import asyncio
+import functools
+import inspect
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence
 
 from shmchannel import libshmch
+from shmchannel.stream import IncomingStream, OutgoingStream
 
 MODE_SERVER, MODE_CLIENT = libshmch.MODE_SERVER, libshmch.MODE_CLIENT
+LATENCY_QUEUED, LATENCY_IN_RING = libshmch.LATENCY_QUEUED, libshmch.LATENCY_IN_RING
+LATENCY_CALLBACK, LATENCY_TOTAL = libshmch.LATENCY_CALLBACK, libshmch.LATENCY_TOTAL
+SHMEM_POPULATE, SHMEM_HUGEPAGES = libshmch.SHMEM_POPULATE, libshmch.SHMEM_HUGEPAGES
+SHMEM_WILL_NEED, SHMEM_MLOCK = libshmch.SHMEM_WILL_NEED, libshmch.SHMEM_MLOCK
+# Incoming stream chunks are queued until consumed, so a channel with a stream callback gets a finite receive window
+# unless one has been configured explicitly.
+STREAM_RECEIVE_WINDOW_PACKETS = 256
+STREAM_RECEIVE_WINDOW_BYTES = 16 * 1024 * 1024
 Mode = int
 
 
 class Channel:
-    def __init__(self, name: str, role: Mode):
+    def __init__(self, name: str, role: Mode, arena_size: int = 0, pool_size: int = 0, slot_capacity: int = 0,
+                 batch_delivery: bool = False, zero_copy: bool = False, tracing: bool = False,
+                 request_timeout: float = 0, max_pending_requests: int = 0, receive_window_packets: int = 0,
+                 receive_window_bytes: int = 0, io_thread: bool = False, stream_chunk_size: int = 0,
+                 shmem_flags: int = 0, segment_shmem_flags: int = 0):
         self._name = name
         self._role = role
         self._channel = libshmch.channel_new(name, role)
+        if arena_size:
+            libshmch.channel_set_arena_size(self._channel, arena_size)
+        if pool_size:
+            libshmch.channel_set_pool_size(self._channel, pool_size)
+        if slot_capacity:
+            libshmch.channel_set_slot_capacity(self._channel, slot_capacity)
+        if tracing:
+            libshmch.channel_set_tracing(self._channel, True)
+        if request_timeout:
+            libshmch.channel_set_request_timeout(self._channel, max(1, round(request_timeout * 1000)))
+        if max_pending_requests:
+            libshmch.channel_set_max_pending_requests(self._channel, max_pending_requests)
+        if receive_window_packets:
+            libshmch.channel_set_receive_window_packets(self._channel, receive_window_packets)
+        if receive_window_bytes:
+            libshmch.channel_set_receive_window_bytes(self._channel, receive_window_bytes)
+        if io_thread:
+            libshmch.channel_set_io_thread(self._channel, True)
+        if stream_chunk_size:
+            libshmch.channel_set_stream_chunk_size(self._channel, stream_chunk_size)
+        if shmem_flags:
+            libshmch.channel_set_shmem_flags(self._channel, shmem_flags)
+        if segment_shmem_flags:
+            libshmch.channel_set_segment_shmem_flags(self._channel, segment_shmem_flags)
+        # Chunks are handed over to the consumer of IncomingStream asynchronously.
+        libshmch.channel_set_defer_stream_credit(self._channel, True)
         self._request_callback = None
-        libshmch.channel_set_request_callback(self._channel, self._process_request)
+        self._notification_callback = None
+        self._array_callback = None
+        self._batch_delivery = batch_delivery
+        self._zero_copy = zero_copy
+        self._pending = {}
+        self._streaming = {}
+        self._reservations = {}
+        self._loop = None
+        self._wakeup_fd = None
+        self._stopped = None
+        self._deadline_timer = None
+        self._credit_waiters = []
+        self._stream_callback = None
+        self._incoming_streams = {}
+        libshmch.channel_set_request_callback(self._channel, self._process_request, zero_copy)
+        libshmch.channel_set_timeout_callback(self._channel, self._request_timed_out)
+        libshmch.channel_set_stream_callback(self._channel, self._process_stream)
+        if batch_delivery:
+            libshmch.channel_set_batch_callback(self._channel, self._process_batch)
 
     def destroy(self):
         if self._channel:
@@ -27,37 +87,330 @@ class Channel:
     def role(self) -> Mode:
         return self._role
 
+    @property
+    def arena_size(self) -> int:
+        return libshmch.channel_get_arena_size(self._channel)
+
+    @property
+    def pool_size(self) -> int:
+        return libshmch.channel_get_pool_size(self._channel)
+
+    @property
+    def slot_capacity(self) -> int:
+        return libshmch.channel_get_slot_capacity(self._channel)
+
+    @property
+    def io_thread(self) -> bool:
+        return libshmch.channel_get_io_thread(self._channel)
+
+    @property
+    def stream_chunk_size(self) -> int:
+        return libshmch.channel_get_stream_chunk_size(self._channel)
+
+    @property
+    def shmem_flags(self) -> int:
+        return libshmch.channel_get_shmem_flags(self._channel)
+
+    @property
+    def segment_shmem_flags(self) -> int:
+        return libshmch.channel_get_segment_shmem_flags(self._channel)
+
+    @property
+    def tracing(self) -> bool:
+        return libshmch.channel_get_tracing(self._channel)
+
+    @tracing.setter
+    def tracing(self, tracing: bool):
+        libshmch.channel_set_tracing(self._channel, tracing)
+
+    def get_stats(self) -> Dict[str, int]:
+        return libshmch.channel_get_stats(self._channel)
+
+    def reset_stats(self):
+        libshmch.channel_reset_stats(self._channel)
+
+    def get_latency(self, stage: int) -> Dict[str, float]:
+        return libshmch.channel_get_latency(self._channel, stage)
+
+    def reset_latency(self):
+        libshmch.channel_reset_latency(self._channel)
+
     def open(self):
         libshmch.channel_open(self._channel)
 
     def close(self):
-        return libshmch.channel_close(self._channel)
+        self.stop()
+        libshmch.channel_close(self._channel)
+        streams, self._incoming_streams = self._incoming_streams, {}
+        for stream in streams.values():
+            stream._finish(ConnectionResetError("The channel %s has been closed." % self._name))
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        if self._loop is not None:
+            return
+        self._loop = loop or asyncio.get_event_loop()
+        self._stopped = self._loop.create_future()
+        self._wakeup_fd = libshmch.channel_get_wakeup_fd(self._channel)
+        self._loop.add_reader(self._wakeup_fd, self.send_receive)
+        self.send_receive()
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.remove_reader(self._wakeup_fd)
+        if self._deadline_timer is not None:
+            self._deadline_timer.cancel()
+            self._deadline_timer = None
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+        self._loop = self._wakeup_fd = None
+
+    async def wait_stopped(self):
+        if self._stopped is not None:
+            await self._stopped
 
     async def request(self, data: bytes) -> bytes:
+        return await self._send_request(
+            lambda callback: libshmch.channel_request(self._channel, data, callback, self._zero_copy))
+
+    async def request_stream(self, data: bytes) -> AsyncIterator[bytes]:
+        frames = asyncio.Queue()
+        request_id = libshmch.channel_request_stream(
+            self._channel, data, lambda frame, last: frames.put_nowait((frame, last)))
+        self._streaming[request_id] = frames
+        finished = False
+        try:
+            while not finished:
+                frame, finished = await frames.get()
+                if isinstance(frame, Exception):
+                    raise frame
+                # The final response only ends the stream unless it carries data.
+                if frame or not finished:
+                    yield frame
+        finally:
+            del self._streaming[request_id]
+            if not finished:
+                libshmch.channel_cancel_request(self._channel, request_id)
+
+    def _send_request(self, send: Callable) -> asyncio.Future:
         future = asyncio.Future()
-        libshmch.channel_request(self._channel, data, future.set_result)
-        return await future
+        if self._batch_delivery:
+            request_id = send(None)
+        else:
+            request_id = send(lambda data: self._resolve(request_id, data))
+        self._pending[request_id] = future
+        future.add_done_callback(lambda _: self._request_done(request_id, future))
+        return future
+
+    def _resolve(self, request_id: int, data: bytes):
+        future = self._pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def _request_done(self, request_id: int, future: asyncio.Future):
+        if self._pending.get(request_id) is future:
+            # The future has been cancelled, e.g. by asyncio.wait_for, so the request is given up.
+            del self._pending[request_id]
+            libshmch.channel_cancel_request(self._channel, request_id)
+
+    def _request_timed_out(self, request_id: int):
+        error = asyncio.TimeoutError("Request %d to %s has timed out." % (request_id, self._name))
+        future = self._pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_exception(error)
+        frames = self._streaming.get(request_id)
+        if frames is not None:
+            frames.put_nowait((error, True))
+
+    def has_credit(self, size: int = 0) -> bool:
+        return libshmch.channel_has_credit(self._channel, size)
+
+    async def drain(self, size: int = 0):
+        while not libshmch.channel_has_credit(self._channel, size):
+            waiter = asyncio.Future()
+            self._credit_waiters.append(waiter)
+            await waiter
+
+    def reserve(self, size: int) -> memoryview:
+        reservation = libshmch.channel_reserve(self._channel, size)
+        buffer = libshmch.reservation_get_buffer(reservation)
+        self._reservations[id(buffer)] = buffer, reservation
+        return buffer
+
+    def _finish_reservation(self, buffer: memoryview):
+        if id(buffer) not in self._reservations:
+            raise ValueError("The buffer has not been reserved by this channel.")
+        # Raises BufferError if the buffer is still exported, e.g. to a numpy array.
+        buffer.release()
+        return self._reservations.pop(id(buffer))[1]
+
+    def commit(self, buffer: memoryview):
+        libshmch.channel_commit(self._channel, self._finish_reservation(buffer))
+
+    async def commit_request(self, buffer: memoryview) -> bytes:
+        reservation = self._finish_reservation(buffer)
+        return await self._send_request(
+            lambda callback: libshmch.channel_commit_request(self._channel, reservation, callback, self._zero_copy))
+
+    def cancel_reservation(self, buffer: memoryview):
+        libshmch.channel_cancel_reservation(self._channel, self._finish_reservation(buffer))
+
+    def request_many(self, payloads: Sequence[bytes]) -> List[asyncio.Future]:
+        futures = [asyncio.Future() for _ in payloads]
+        ids = []
+
+        def response_received(index: int, data: bytes):
+            self._resolve(ids[index], data)
+
+        ids.extend(libshmch.channel_request_many(self._channel, payloads, response_received))
+        # Requests of a batch time out and are cancelled individually like single requests.
+        for request_id, future in zip(ids, futures):
+            self._pending[request_id] = future
+            future.add_done_callback(functools.partial(self._request_done, request_id))
+        return futures
 
     def notify(self, data: bytes):
         libshmch.channel_notify(self._channel, data)
 
+    # NumPy is an optional dependency, so the array functions import it only when they are used.
+    def send_array(self, array):
+        from shmchannel import arrays
+        self.commit(arrays.reserve(self, array))
+
+    async def request_array(self, array):
+        from shmchannel import arrays
+        return arrays.unpack(await self.commit_request(arrays.reserve(self, array)))
+
+    def notify_many(self, payloads: Sequence[bytes]):
+        libshmch.channel_notify_many(self._channel, payloads)
+
     def set_notification_callback(self, callback):
-        libshmch.channel_set_notification_callback(self._channel, callback)
+        self._notification_callback = callback
+        libshmch.channel_set_notification_callback(self._channel, self._process_notification, self._zero_copy)
+
+    def set_array_callback(self, callback):
+        self._array_callback = callback
+        libshmch.channel_set_notification_callback(self._channel, self._process_notification, self._zero_copy)
+
+    def _process_notification(self, data):
+        if self._array_callback:
+            from shmchannel import arrays
+            if arrays.is_array(data):
+                self._array_callback(arrays.unpack(data))
+                return
+        if self._notification_callback:
+            self._notification_callback(data)
+        elif isinstance(data, libshmch.Lease):
+            data.release()
 
     def set_request_callback(self, callback):
         self._request_callback = callback
 
+    def set_stream_callback(self, callback: Optional[Callable[[IncomingStream], None]]):
+        self._stream_callback = callback
+        if callback is not None and not libshmch.channel_get_receive_window_packets(self._channel) \
+                and not libshmch.channel_get_receive_window_bytes(self._channel):
+            libshmch.channel_set_receive_window_packets(self._channel, STREAM_RECEIVE_WINDOW_PACKETS)
+            libshmch.channel_set_receive_window_bytes(self._channel, STREAM_RECEIVE_WINDOW_BYTES)
+
+    async def open_stream(self, metadata: bytes = b"") -> OutgoingStream:
+        await self.drain(len(metadata))
+        return OutgoingStream(self, libshmch.channel_open_stream(self._channel, metadata))
+
+    def _process_stream(self, stream_id: int, event: int, data: bytes):
+        if event == libshmch.STREAM_OPEN:
+            if self._stream_callback:
+                stream = IncomingStream(stream_id, data, self._consume_stream_chunk)
+                self._incoming_streams[stream_id] = stream
+                self._stream_callback(stream)
+        elif event == libshmch.STREAM_DATA:
+            stream = self._incoming_streams.get(stream_id)
+            if stream is not None:
+                stream._push(data)
+            else:
+                self._consume_stream_chunk(len(data))
+        else:
+            stream = self._incoming_streams.pop(stream_id, None)
+            if stream is not None:
+                stream._finish(None if event == libshmch.STREAM_END else ConnectionAbortedError(
+                    "The stream %d of %s has been aborted by the sender." % (stream_id, self._name)))
+
+    def _consume_stream_chunk(self, size: int):
+        if self._channel:
+            libshmch.channel_consume_stream_chunk(self._channel, size)
+
     def _process_request(self, data: bytes, respond):
         if self._request_callback:
             def done_callback(future):
                 respond(future.result())
 
-            task = asyncio.ensure_future(self._request_callback(data))
+            result = self._request_callback(data)
+            if inspect.isasyncgen(result):
+                task = asyncio.ensure_future(self._stream_response(result, respond))
+                task.add_done_callback(self._stream_done)
+                return
+            task = asyncio.ensure_future(result)
             task.add_done_callback(done_callback)
+        elif isinstance(data, libshmch.Lease):
+            with data:
+                respond(bytes(data.data))
         else:
             respond(data)
 
-    async def send_receive(self):
-        while True:
-            libshmch.channel_send_receive(self._channel, False)
-            await asyncio.sleep(0.001)
+    def _process_batch(self, entries):
+        for kind, request_id, data in entries:
+            if kind == libshmch.KIND_RESPONSE:
+                self._resolve(request_id, data)
+            elif kind == libshmch.KIND_REQUEST:
+                self._process_request(data, self._responder(request_id))
+            else:
+                self._process_notification(data)
+
+    async def _stream_response(self, frames: AsyncIterator[bytes], respond):
+        try:
+            async for frame in frames:
+                await self.drain(len(frame))
+                respond.partial(frame)
+        finally:
+            # The caller waits for the final frame, so it is sent even if the handler fails.
+            respond(b"")
+
+    def _stream_done(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            asyncio.get_event_loop().call_exception_handler({
+                "message": "Failed to stream a response on %s." % self._name,
+                "exception": task.exception(),
+                "future": task,
+            })
+
+    def _responder(self, request_id: int):
+        def respond(data: bytes):
+            libshmch.channel_send_response(self._channel, request_id, data)
+
+        def respond_partial(data: bytes):
+            libshmch.channel_send_partial_response(self._channel, request_id, data)
+
+        respond.partial = respond_partial
+        return respond
+
+    def send_receive(self) -> bool:
+        result = libshmch.channel_send_receive(self._channel, False)
+        if self._loop is not None:
+            self._schedule_deadline()
+        self._wake_credit_waiters()
+        return result
+
+    def _wake_credit_waiters(self):
+        if self._credit_waiters:
+            waiters, self._credit_waiters = self._credit_waiters, []
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def _schedule_deadline(self):
+        if self._deadline_timer is not None:
+            self._deadline_timer.cancel()
+            self._deadline_timer = None
+        timeout = libshmch.channel_get_next_timeout(self._channel)
+        if timeout >= 0:
+            self._deadline_timer = self._loop.call_later(timeout / 1000, self.send_receive)
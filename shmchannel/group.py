@@ -0,0 +1,80 @@
+import asyncio
+
+from shmchannel import libshmch
+from shmchannel.channel import Channel
+
+
+class ChannelGroup:
+    def __init__(self):
+        self._group = libshmch.group_new()
+        self._channels = {}
+        self._loop = None
+        self._wakeup_fd = None
+        self._stopped = None
+        self._deadline_timer = None
+        libshmch.group_set_serviced_callback(self._group, self._channel_serviced)
+
+    def destroy(self):
+        if self._group:
+            libshmch.group_unref(self._group)
+            self._group = None
+            self._channels.clear()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def __contains__(self, channel: Channel) -> bool:
+        return channel._channel in self._channels
+
+    def add(self, channel: Channel) -> bool:
+        if not libshmch.group_add(self._group, channel._channel):
+            return False
+        self._channels[channel._channel] = channel
+        return True
+
+    def remove(self, channel: Channel) -> bool:
+        self._channels.pop(channel._channel, None)
+        return libshmch.group_remove(self._group, channel._channel)
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        if self._loop is not None:
+            return
+        self._loop = loop or asyncio.get_event_loop()
+        self._stopped = self._loop.create_future()
+        self._wakeup_fd = libshmch.group_get_wakeup_fd(self._group)
+        self._loop.add_reader(self._wakeup_fd, self.send_receive)
+        self.send_receive()
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.remove_reader(self._wakeup_fd)
+        if self._deadline_timer is not None:
+            self._deadline_timer.cancel()
+            self._deadline_timer = None
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+        self._loop = self._wakeup_fd = None
+
+    async def wait_stopped(self):
+        if self._stopped is not None:
+            await self._stopped
+
+    def send_receive(self) -> int:
+        result = libshmch.group_send_receive(self._group)
+        if self._loop is not None:
+            self._schedule_deadline()
+        return result
+
+    def _channel_serviced(self, pointer):
+        channel = self._channels.get(pointer)
+        if channel is not None:
+            channel._wake_credit_waiters()
+
+    def _schedule_deadline(self):
+        if self._deadline_timer is not None:
+            self._deadline_timer.cancel()
+            self._deadline_timer = None
+        timeout = libshmch.group_get_next_timeout(self._group)
+        if timeout >= 0:
+            self._deadline_timer = self._loop.call_later(timeout / 1000, self.send_receive)
@@ -1,5 +1,7 @@
+import ctypes
+import warnings
 from contextlib import contextmanager
-from typing import Any, Callable
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
 try:
     # noinspection PyUnresolvedReferences
@@ -14,6 +16,24 @@ except ImportError as e:
 
 MODE_CLIENT = lib.SHMCH_MODE_CLIENT
 MODE_SERVER = lib.SHMCH_MODE_SERVER
+KIND_NOTIFICATION = lib.SHMCH_MESSAGE_KIND_NOTIFICATION
+KIND_REQUEST = lib.SHMCH_MESSAGE_KIND_REQUEST
+KIND_RESPONSE = lib.SHMCH_MESSAGE_KIND_RESPONSE
+STREAM_OPEN = lib.SHMCH_STREAM_EVENT_OPEN
+STREAM_DATA = lib.SHMCH_STREAM_EVENT_DATA
+STREAM_END = lib.SHMCH_STREAM_EVENT_END
+STREAM_ABORT = lib.SHMCH_STREAM_EVENT_ABORT
+LATENCY_QUEUED = lib.SHMCH_LATENCY_STAGE_QUEUED
+LATENCY_IN_RING = lib.SHMCH_LATENCY_STAGE_IN_RING
+LATENCY_CALLBACK = lib.SHMCH_LATENCY_STAGE_CALLBACK
+LATENCY_TOTAL = lib.SHMCH_LATENCY_STAGE_TOTAL
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+PYBUF_READ = 0x100
+SHMEM_POPULATE = lib.SHMCH_SHMEM_FLAGS_POPULATE
+SHMEM_HUGEPAGES = lib.SHMCH_SHMEM_FLAGS_HUGEPAGES
+SHMEM_WILL_NEED = lib.SHMCH_SHMEM_FLAGS_WILL_NEED
+SHMEM_MLOCK = lib.SHMCH_SHMEM_FLAGS_MLOCK
+SHMEM_GROWABLE = lib.SHMCH_SHMEM_FLAGS_GROWABLE
 Ptr = Any
 _handles = set()
 
@@ -40,12 +60,131 @@ def wrap_data_callback(func):
     return lib.data_callback, handle, destroy
 
 
+@ffi.def_extern()
+def streaming_response_callback(data, size, last, user_data):
+    func = ffi.from_handle(user_data)
+    func(bytes(ffi.buffer(data, size)), bool(last))
+
+
+def wrap_streaming_response_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.streaming_response_callback, handle, destroy
+
+
+@ffi.def_extern()
+def batch_response_callback(index, data, size, user_data):
+    func = ffi.from_handle(user_data)
+    func(index, bytes(ffi.buffer(data, size)))
+
+
+def wrap_batch_response_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.batch_response_callback, handle, destroy
+
+
+@ffi.def_extern()
+def batch_callback(batch, user_data):
+    size = ffi.new("int[]", [0])
+    entries = lib.shmch_incoming_batch_get_entries(batch, size)
+    func = ffi.from_handle(user_data)
+    func([(entry.kind, entry.id, bytes(ffi.buffer(entry.data, entry.size)))
+          for entry in (entries[i] for i in range(size[0]))])
+
+
+def wrap_batch_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.batch_callback, handle, destroy
+
+
+@ffi.def_extern()
+def timeout_callback(request_id, user_data):
+    func = ffi.from_handle(user_data)
+    func(request_id)
+
+
+def wrap_timeout_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.timeout_callback, handle, destroy
+
+
+@ffi.def_extern()
+def stream_callback(stream_id, event, data, size, user_data):
+    func = ffi.from_handle(user_data)
+    func(stream_id, event, bytes(ffi.buffer(data, size)))
+
+
+def wrap_stream_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.stream_callback, handle, destroy
+
+
+def pack_batch(payloads: Sequence[bytes]):
+    data = b"".join(payloads)
+    sizes = ffi.new("gint[]", [len(payload) for payload in payloads])
+    return data, len(data), sizes, len(payloads)
+
+
 @ffi.def_extern()
 def request_callback(request, user_data):
-    lib.shmch_incoming_request_ref(request)
     size = ffi.new("int[]", [0])
     data = lib.shmch_incoming_request_get_data(request, size)
-    size = size[0]
+    func = ffi.from_handle(user_data)
+    func(bytes(ffi.buffer(data, size[0])), wrap_respond(request))
+
+
+def wrap_request_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.request_callback, handle, destroy
+
+
+@ffi.def_extern()
+def channel_callback(channel, user_data):
+    func = ffi.from_handle(user_data)
+    func(channel)
+
+
+def wrap_channel_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.channel_callback, handle, destroy
+
+
+@ffi.def_extern()
+def client_request_callback(client, request, user_data):
+    size = ffi.new("int[]", [0])
+    data = lib.shmch_incoming_request_get_data(request, size)
+    func = ffi.from_handle(user_data)
+    func(client, bytes(ffi.buffer(data, size[0])), wrap_respond(request))
+
+
+def wrap_client_request_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.client_request_callback, handle, destroy
+
+
+@ffi.def_extern()
+def client_data_callback(client, data, size, user_data):
+    func = ffi.from_handle(user_data)
+    func(client, bytes(ffi.buffer(data, size)))
+
+
+def wrap_client_data_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.client_data_callback, handle, destroy
+
+
+@ffi.def_extern()
+def client_state_callback(client, connected, user_data):
+    func = ffi.from_handle(user_data)
+    func(client, bool(connected))
+
+
+def wrap_client_state_callback(func):
+    handle, destroy = wrap_user_data(func)
+    return lib.client_state_callback, handle, destroy
+
+
+def wrap_respond(request: Ptr) -> Callable:
+    lib.shmch_incoming_request_ref(request)
 
     def respond(response: bytes):
         try:
@@ -54,13 +193,126 @@ def request_callback(request, user_data):
         finally:
             lib.shmch_incoming_request_unref(request)
 
-    func = ffi.from_handle(user_data)
-    func(bytes(ffi.buffer(data, size)), respond)
+    def respond_partial(response: bytes):
+        with g_error() as e:
+            lib.shmch_incoming_request_send_partial_response(request, response, len(response), e)
+
+    respond.partial = respond_partial
+    return respond
+
+
+def readonly_memoryview(data: Ptr, size: int) -> memoryview:
+    if size == 0:
+        return memoryview(b"")
+    from_memory = ctypes.pythonapi.PyMemoryView_FromMemory
+    from_memory.restype = ctypes.py_object
+    from_memory.argtypes = (ctypes.c_void_p, ctypes.c_ssize_t, ctypes.c_int)
+    return from_memory(int(ffi.cast("uintptr_t", data)), size, PYBUF_READ)
+
+
+class Lease:
+    def __init__(self, lease: Ptr):
+        size = ffi.new("int[]", [0])
+        data = lib.shmch_lease_get_data(lease, size)
+        self._lease = ffi.gc(lease, lib.shmch_lease_unref)
+        self._buffer = memoryview(ffi.buffer(data, size[0]))
+        # memoryview.toreadonly() is available since Python 3.8.
+        if hasattr(self._buffer, "toreadonly"):
+            self._data = self._buffer.toreadonly()
+        else:
+            self._data = readonly_memoryview(data, size[0])
+
+    def __del__(self):
+        if self._lease is not None:
+            warnings.warn("A lease of a payload has not been released.", ResourceWarning)
+            self.release()
+
+    def __enter__(self) -> "Lease":
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    @property
+    def data(self) -> memoryview:
+        if self._lease is None:
+            raise ValueError("The lease of a payload has already been released.")
+        return self._data
+
+    @property
+    def released(self) -> bool:
+        return self._lease is None
+
+    def release(self):
+        if self._lease is None:
+            return
+        # Raises BufferError if the payload is still exported, e.g. to a numpy array.
+        self._data.release()
+        self._buffer.release()
+        lease, self._lease = self._lease, None
+        with g_error() as e:
+            lib.shmch_lease_release(lease, e)
+
+    def detach(self):
+        if self._lease is None:
+            raise ValueError("The lease of a payload has already been released.")
+        self._data.release()
+        self._buffer.release()
+        lease, self._lease = self._lease, None
+        return lease_buffer(lease)
+
+
+def lease_buffer(lease: Ptr):
+    size = ffi.new("int[]", [0])
+    data = lib.shmch_lease_get_data(lease, size)
 
+    def release(_):
+        try:
+            with g_error() as e:
+                lib.shmch_lease_release(lease, e)
+        except RuntimeError as e:
+            warnings.warn("Failed to release a lease: %s" % e, ResourceWarning)
 
-def wrap_request_callback(func):
-    handle, destroy = wrap_user_data(func)
-    return lib.request_callback, handle, destroy
+    # The buffer keeps the pointer alive and the lease is released once neither of them is referenced.
+    return LeasedBuffer(ffi.gc(data, release), size[0])
+
+
+class LeasedBuffer:
+    def __init__(self, data: Ptr, size: int):
+        self._data = data
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    # NumPy arrays built on the buffer, e.g. np.asarray(buffer), are read-only and keep the buffer alive.
+    # Unlike ffi.buffer, the receiver cannot make them writable and modify the memory of the sender.
+    @property
+    def __array_interface__(self) -> dict:
+        return {"version": 3, "shape": (self._size,), "typestr": "|u1",
+                "data": (int(ffi.cast("uintptr_t", self._data)), True)}
+
+
+@ffi.def_extern()
+def leased_data_callback(data, size, user_data):
+    channel, func = ffi.from_handle(user_data)
+    func(channel_lease_payload(channel))
+
+
+def wrap_leased_data_callback(channel: Ptr, func):
+    handle, destroy = wrap_user_data((channel, func))
+    return lib.leased_data_callback, handle, destroy
+
+
+@ffi.def_extern()
+def leased_request_callback(request, user_data):
+    channel, func = ffi.from_handle(user_data)
+    func(channel_lease_payload(channel), wrap_respond(request))
+
+
+def wrap_leased_request_callback(channel: Ptr, func):
+    handle, destroy = wrap_user_data((channel, func))
+    return lib.leased_request_callback, handle, destroy
 
 
 @contextmanager
@@ -77,8 +329,9 @@ def channel_new(name: str, role: int) -> Ptr:
     return lib.shmch_channel_new(name.encode(), role)
 
 
-def channel_set_request_callback(channel: Ptr, callback: Callable):
-    return lib.shmch_channel_set_request_callback(channel, *wrap_request_callback(callback))
+def channel_set_request_callback(channel: Ptr, callback: Callable, lease: bool = False):
+    wrapped = wrap_leased_request_callback(channel, callback) if lease else wrap_request_callback(callback)
+    return lib.shmch_channel_set_request_callback(channel, *wrapped)
 
 
 def channel_ref(channel: Ptr):
@@ -99,9 +352,19 @@ def channel_close(channel: Ptr):
         lib.shmch_channel_close(channel, e)
 
 
-def channel_request(channel: Ptr, data: bytes, callback: Callable):
+def channel_request(channel: Ptr, data: bytes, callback: Optional[Callable], lease: bool = False) -> int:
+    if not callback:
+        wrapped = ffi.NULL, ffi.NULL, ffi.NULL
+    else:
+        wrapped = wrap_leased_data_callback(channel, callback) if lease else wrap_data_callback(callback)
     with g_error() as e:
-        return lib.shmch_channel_request(channel, data, len(data), *wrap_data_callback(callback), e)
+        return lib.shmch_channel_request(channel, data, len(data), *wrapped, e)
+
+
+def channel_request_stream(channel: Ptr, data: bytes, callback: Callable) -> int:
+    with g_error() as e:
+        return lib.shmch_channel_request_stream(
+            channel, data, len(data), *wrap_streaming_response_callback(callback), e)
 
 
 def channel_notify(channel: Ptr, data: bytes):
@@ -109,10 +372,433 @@ def channel_notify(channel: Ptr, data: bytes):
         return lib.shmch_channel_notify(channel, data, len(data), e)
 
 
-def channel_set_notification_callback(channel: Ptr, callback: Callable):
-    return lib.shmch_channel_set_notification_callback(channel, *wrap_data_callback(callback))
+def channel_request_many(channel: Ptr, payloads: Sequence[bytes], callback: Callable) -> List[int]:
+    ids = ffi.new("guint[]", len(payloads))
+    with g_error() as e:
+        lib.shmch_channel_request_many(
+            channel, *pack_batch(payloads), ids, len(payloads), *wrap_batch_response_callback(callback), e)
+    return list(ids)
+
+
+def channel_notify_many(channel: Ptr, payloads: Sequence[bytes]):
+    with g_error() as e:
+        return lib.shmch_channel_notify_many(channel, *pack_batch(payloads), e)
+
+
+def channel_set_notification_callback(channel: Ptr, callback: Callable, lease: bool = False):
+    wrapped = wrap_leased_data_callback(channel, callback) if lease else wrap_data_callback(callback)
+    return lib.shmch_channel_set_notification_callback(channel, *wrapped)
+
+
+def channel_get_stats(channel: Ptr) -> Dict[str, int]:
+    stats = ffi.new("ShmchStats*")
+    lib.shmch_channel_get_stats(channel, stats)
+    return {name: getattr(stats, name) for name, _ in ffi.typeof("ShmchStats").fields}
+
+
+def channel_reset_stats(channel: Ptr):
+    lib.shmch_channel_reset_stats(channel)
+
+
+def channel_get_latency(channel: Ptr, stage: int) -> Dict[str, float]:
+    histogram = lib.shmch_channel_get_latency_histogram(channel, stage)
+    result = {
+        "count": lib.shmch_latency_histogram_get_count(histogram),
+        "min": lib.shmch_latency_histogram_get_min(histogram),
+        "max": lib.shmch_latency_histogram_get_max(histogram),
+        "mean": lib.shmch_latency_histogram_get_mean(histogram),
+    }
+    for p in LATENCY_PERCENTILES:
+        result["p%s" % p] = lib.shmch_latency_histogram_get_value_at_percentile(histogram, p)
+    return result
+
+
+def channel_reset_latency(channel: Ptr):
+    lib.shmch_channel_reset_latency_histograms(channel)
+
+
+def channel_lease_payload(channel: Ptr) -> Lease:
+    return Lease(lib.shmch_channel_lease_payload(channel))
+
+
+def channel_reserve(channel: Ptr, size: int) -> Ptr:
+    with g_error() as e:
+        reservation = lib.shmch_channel_reserve(channel, size, e)
+    return ffi.gc(reservation, lib.shmch_reservation_unref)
+
+
+def reservation_get_buffer(reservation: Ptr) -> memoryview:
+    size = ffi.new("int[]", [0])
+    data = lib.shmch_reservation_get_buffer(reservation, size)
+    return memoryview(ffi.buffer(data, size[0]))
+
+
+def channel_commit(channel: Ptr, reservation: Ptr):
+    with g_error() as e:
+        return lib.shmch_channel_commit(channel, reservation, e)
+
+
+def channel_commit_request(channel: Ptr, reservation: Ptr, callback: Optional[Callable], lease: bool = False) -> int:
+    if not callback:
+        wrapped = ffi.NULL, ffi.NULL, ffi.NULL
+    else:
+        wrapped = wrap_leased_data_callback(channel, callback) if lease else wrap_data_callback(callback)
+    with g_error() as e:
+        return lib.shmch_channel_commit_request(channel, reservation, *wrapped, e)
+
+
+def channel_cancel_reservation(channel: Ptr, reservation: Ptr):
+    with g_error() as e:
+        return lib.shmch_channel_cancel_reservation(channel, reservation, e)
+
+
+def channel_set_batch_callback(channel: Ptr, callback: Optional[Callable]):
+    wrapped = wrap_batch_callback(callback) if callback else (ffi.NULL, ffi.NULL, ffi.NULL)
+    return lib.shmch_channel_set_batch_callback(channel, *wrapped)
+
+
+def channel_set_timeout_callback(channel: Ptr, callback: Optional[Callable]):
+    wrapped = wrap_timeout_callback(callback) if callback else (ffi.NULL, ffi.NULL, ffi.NULL)
+    return lib.shmch_channel_set_timeout_callback(channel, *wrapped)
+
+
+def channel_set_stream_callback(channel: Ptr, callback: Optional[Callable]):
+    wrapped = wrap_stream_callback(callback) if callback else (ffi.NULL, ffi.NULL, ffi.NULL)
+    return lib.shmch_channel_set_stream_callback(channel, *wrapped)
+
+
+def channel_open_stream(channel: Ptr, metadata: bytes) -> Ptr:
+    with g_error() as e:
+        stream = lib.shmch_channel_open_stream(channel, metadata, len(metadata), e)
+    return ffi.gc(stream, lib.shmch_outgoing_stream_unref)
+
+
+def channel_consume_stream_chunk(channel: Ptr, size: int):
+    lib.shmch_channel_consume_stream_chunk(channel, size)
+
+
+def stream_get_id(stream: Ptr) -> int:
+    return lib.shmch_outgoing_stream_get_id(stream)
+
+
+def stream_write(stream: Ptr, data: bytes) -> int:
+    with g_error() as e:
+        return lib.shmch_outgoing_stream_write(stream, ffi.from_buffer(data), len(data), e)
+
+
+def stream_finish(stream: Ptr):
+    with g_error() as e:
+        lib.shmch_outgoing_stream_finish(stream, e)
+
+
+def stream_abort(stream: Ptr):
+    with g_error() as e:
+        lib.shmch_outgoing_stream_abort(stream, e)
+
+
+def channel_cancel_request(channel: Ptr, request_id: int) -> bool:
+    return bool(lib.shmch_channel_cancel_request(channel, request_id))
+
+
+def channel_get_next_timeout(channel: Ptr) -> int:
+    return lib.shmch_channel_get_next_timeout(channel)
+
+
+def channel_has_credit(channel: Ptr, size: int) -> bool:
+    return bool(lib.shmch_channel_has_credit(channel, size))
+
+
+def channel_send_response(channel: Ptr, request_id: int, data: bytes):
+    with g_error() as e:
+        return lib.shmch_channel_send_response(channel, request_id, data, len(data), e)
+
+
+def channel_send_partial_response(channel: Ptr, request_id: int, data: bytes):
+    with g_error() as e:
+        return lib.shmch_channel_send_partial_response(channel, request_id, data, len(data), e)
 
 
 def channel_send_receive(channel: Ptr, wait: bool):
     with g_error() as e:
         return lib.shmch_channel_send_receive(channel, wait, e)
+
+
+def channel_get_wakeup_fd(channel: Ptr) -> int:
+    with g_error() as e:
+        return lib.shmch_channel_get_wakeup_fd(channel, e)
+
+
+def channel_wait_for_data(channel: Ptr, timeout: int) -> bool:
+    with g_error() as e:
+        return lib.shmch_channel_wait_for_data(channel, timeout, e)
+
+
+def channel_get_arena_size(channel: Ptr) -> int:
+    return lib.shmch_channel_get_arena_size(channel)
+
+
+def channel_set_arena_size(channel: Ptr, size: int):
+    lib.shmch_channel_set_arena_size(channel, size)
+
+
+def channel_get_pool_size(channel: Ptr) -> int:
+    return lib.shmch_channel_get_pool_size(channel)
+
+
+def channel_set_pool_size(channel: Ptr, size: int):
+    lib.shmch_channel_set_pool_size(channel, size)
+
+
+def channel_get_slot_capacity(channel: Ptr) -> int:
+    return lib.shmch_channel_get_slot_capacity(channel)
+
+
+def channel_set_slot_capacity(channel: Ptr, capacity: int):
+    lib.shmch_channel_set_slot_capacity(channel, capacity)
+
+
+def channel_get_tracing(channel: Ptr) -> bool:
+    return bool(lib.shmch_channel_get_tracing(channel))
+
+
+def channel_set_tracing(channel: Ptr, tracing: bool):
+    lib.shmch_channel_set_tracing(channel, tracing)
+
+
+def channel_get_request_timeout(channel: Ptr) -> int:
+    return lib.shmch_channel_get_request_timeout(channel)
+
+
+def channel_set_request_timeout(channel: Ptr, timeout: int):
+    lib.shmch_channel_set_request_timeout(channel, timeout)
+
+
+def channel_get_max_pending_requests(channel: Ptr) -> int:
+    return lib.shmch_channel_get_max_pending_requests(channel)
+
+
+def channel_set_max_pending_requests(channel: Ptr, limit: int):
+    lib.shmch_channel_set_max_pending_requests(channel, limit)
+
+
+def channel_get_receive_window_packets(channel: Ptr) -> int:
+    return lib.shmch_channel_get_receive_window_packets(channel)
+
+
+def channel_set_receive_window_packets(channel: Ptr, window: int):
+    lib.shmch_channel_set_receive_window_packets(channel, window)
+
+
+def channel_get_receive_window_bytes(channel: Ptr) -> int:
+    return lib.shmch_channel_get_receive_window_bytes(channel)
+
+
+def channel_set_receive_window_bytes(channel: Ptr, window: int):
+    lib.shmch_channel_set_receive_window_bytes(channel, window)
+
+
+def channel_get_io_thread(channel: Ptr) -> bool:
+    return bool(lib.shmch_channel_get_io_thread(channel))
+
+
+def channel_set_io_thread(channel: Ptr, enabled: bool):
+    lib.shmch_channel_set_io_thread(channel, enabled)
+
+
+def channel_get_stream_chunk_size(channel: Ptr) -> int:
+    return lib.shmch_channel_get_stream_chunk_size(channel)
+
+
+def channel_set_stream_chunk_size(channel: Ptr, size: int):
+    lib.shmch_channel_set_stream_chunk_size(channel, size)
+
+
+def channel_get_defer_stream_credit(channel: Ptr) -> bool:
+    return bool(lib.shmch_channel_get_defer_stream_credit(channel))
+
+
+def channel_set_defer_stream_credit(channel: Ptr, enabled: bool):
+    lib.shmch_channel_set_defer_stream_credit(channel, enabled)
+
+
+def channel_get_shmem_flags(channel: Ptr) -> int:
+    return lib.shmch_channel_get_shmem_flags(channel)
+
+
+def channel_set_shmem_flags(channel: Ptr, flags: int):
+    lib.shmch_channel_set_shmem_flags(channel, flags)
+
+
+def channel_get_segment_shmem_flags(channel: Ptr) -> int:
+    return lib.shmch_channel_get_segment_shmem_flags(channel)
+
+
+def channel_set_segment_shmem_flags(channel: Ptr, flags: int):
+    lib.shmch_channel_set_segment_shmem_flags(channel, flags)
+
+
+def server_new(name: str, max_clients: int) -> Ptr:
+    return lib.shmch_channel_server_new(name.encode(), max_clients)
+
+
+def server_unref(server: Ptr):
+    return lib.shmch_channel_server_unref(server)
+
+
+def server_open(server: Ptr):
+    with g_error() as e:
+        return lib.shmch_channel_server_open(server, e)
+
+
+def server_close(server: Ptr):
+    with g_error() as e:
+        lib.shmch_channel_server_close(server, e)
+
+
+def server_set_request_callback(server: Ptr, callback: Callable):
+    return lib.shmch_channel_server_set_request_callback(server, *wrap_client_request_callback(callback))
+
+
+def server_set_notification_callback(server: Ptr, callback: Optional[Callable]):
+    wrapped = wrap_client_data_callback(callback) if callback else (ffi.NULL, ffi.NULL, ffi.NULL)
+    return lib.shmch_channel_server_set_notification_callback(server, *wrapped)
+
+
+def server_set_client_callback(server: Ptr, callback: Optional[Callable]):
+    wrapped = wrap_client_state_callback(callback) if callback else (ffi.NULL, ffi.NULL, ffi.NULL)
+    return lib.shmch_channel_server_set_client_callback(server, *wrapped)
+
+
+def server_notify(server: Ptr, client: int, data: bytes):
+    with g_error() as e:
+        return lib.shmch_channel_server_notify(server, client, data, len(data), e)
+
+
+def server_request(server: Ptr, client: int, data: bytes, callback: Callable) -> int:
+    with g_error() as e:
+        return lib.shmch_channel_server_request(server, client, data, len(data), *wrap_data_callback(callback), e)
+
+
+def server_get_client_stats(server: Ptr, client: int) -> Optional[Dict[str, int]]:
+    with g_error() as e:
+        channel = lib.shmch_channel_server_get_client(server, client, e)
+    return channel_get_stats(channel) if channel != ffi.NULL else None
+
+
+def server_has_credit(server: Ptr, client: int, size: int) -> bool:
+    with g_error() as e:
+        channel = lib.shmch_channel_server_get_client(server, client, e)
+    # Sending to a disconnected client fails right away rather than waiting for credit.
+    return channel_has_credit(channel, size) if channel != ffi.NULL else True
+
+
+def server_send_receive(server: Ptr) -> bool:
+    with g_error() as e:
+        return lib.shmch_channel_server_send_receive(server, e)
+
+
+def server_collect_dead_clients(server: Ptr) -> int:
+    with g_error() as e:
+        return lib.shmch_channel_server_collect_dead_clients(server, e)
+
+
+def server_get_wakeup_fd(server: Ptr) -> int:
+    with g_error() as e:
+        return lib.shmch_channel_server_get_wakeup_fd(server, e)
+
+
+def server_get_next_timeout(server: Ptr) -> int:
+    return lib.shmch_channel_server_get_next_timeout(server)
+
+
+def server_get_n_clients(server: Ptr) -> int:
+    return lib.shmch_channel_server_get_n_clients(server)
+
+
+def server_set_arena_size(server: Ptr, size: int):
+    lib.shmch_channel_server_set_arena_size(server, size)
+
+
+def server_set_pool_size(server: Ptr, size: int):
+    lib.shmch_channel_server_set_pool_size(server, size)
+
+
+def server_set_slot_capacity(server: Ptr, capacity: int):
+    lib.shmch_channel_server_set_slot_capacity(server, capacity)
+
+
+def group_new() -> Ptr:
+    with g_error() as e:
+        return lib.shmch_channel_group_new(e)
+
+
+def group_unref(group: Ptr):
+    return lib.shmch_channel_group_unref(group)
+
+
+def group_add(group: Ptr, channel: Ptr) -> bool:
+    with g_error() as e:
+        return bool(lib.shmch_channel_group_add(group, channel, e))
+
+
+def group_remove(group: Ptr, channel: Ptr) -> bool:
+    return bool(lib.shmch_channel_group_remove(group, channel))
+
+
+def group_set_serviced_callback(group: Ptr, callback: Optional[Callable]):
+    wrapped = wrap_channel_callback(callback) if callback else (ffi.NULL, ffi.NULL, ffi.NULL)
+    return lib.shmch_channel_group_set_serviced_callback(group, *wrapped)
+
+
+def group_get_wakeup_fd(group: Ptr) -> int:
+    return lib.shmch_channel_group_get_wakeup_fd(group)
+
+
+def group_get_next_timeout(group: Ptr) -> int:
+    return lib.shmch_channel_group_get_next_timeout(group)
+
+
+def group_send_receive(group: Ptr) -> int:
+    with g_error() as e:
+        return lib.shmch_channel_group_send_receive(group, e)
+
+
+def group_get_size(group: Ptr) -> int:
+    return lib.shmch_channel_group_get_size(group)
+
+
+def shmem_new(name: str, size: int, create: bool, discard: bool, flags: int = 0) -> Ptr:
+    with g_error() as e:
+        shmem = lib.shmch_shmem_new_with_flags(name.encode(), size, create, discard, flags, e)
+    return ffi.gc(shmem, lib.shmch_shmem_unref)
+
+
+def shmem_get_size(shmem: Ptr) -> int:
+    return lib.shmch_shmem_get_size(shmem)
+
+
+def shmem_get_flags(shmem: Ptr) -> int:
+    return lib.shmch_shmem_get_flags(shmem)
+
+
+def shmem_get_generation(shmem: Ptr) -> int:
+    return lib.shmch_shmem_get_generation(shmem)
+
+
+def shmem_resize(shmem: Ptr, new_size: int):
+    with g_error() as e:
+        lib.shmch_shmem_resize(shmem, new_size, e)
+
+
+def shmem_is_stale(shmem: Ptr) -> bool:
+    return bool(lib.shmch_shmem_is_stale(shmem))
+
+
+def shmem_refresh(shmem: Ptr) -> bool:
+    with g_error() as e:
+        return bool(lib.shmch_shmem_refresh(shmem, e))
+
+
+def shmem_close(shmem: Ptr):
+    with g_error() as e:
+        lib.shmch_shmem_close(shmem, e)
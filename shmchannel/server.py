@@ -0,0 +1,182 @@
+import asyncio
+import inspect
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+from shmchannel import libshmch
+
+
+class ChannelServer:
+    def __init__(self, name: str, max_clients: int, arena_size: int = 0, pool_size: int = 0, slot_capacity: int = 0):
+        self._name = name
+        self._max_clients = max_clients
+        self._server = libshmch.server_new(name, max_clients)
+        if arena_size:
+            libshmch.server_set_arena_size(self._server, arena_size)
+        if pool_size:
+            libshmch.server_set_pool_size(self._server, pool_size)
+        if slot_capacity:
+            libshmch.server_set_slot_capacity(self._server, slot_capacity)
+        self._request_callback = None
+        self._client_callback = None
+        self._pending = {}
+        self._loop = None
+        self._wakeup_fd = None
+        self._stopped = None
+        self._deadline_timer = None
+        self._credit_waiters = []
+        libshmch.server_set_request_callback(self._server, self._process_request)
+        libshmch.server_set_client_callback(self._server, self._client_changed)
+
+    def destroy(self):
+        if self._server:
+            libshmch.server_unref(self._server)
+            self._server = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def max_clients(self) -> int:
+        return self._max_clients
+
+    @property
+    def n_clients(self) -> int:
+        return libshmch.server_get_n_clients(self._server)
+
+    def get_client_stats(self, client: int) -> Optional[Dict[str, int]]:
+        return libshmch.server_get_client_stats(self._server, client)
+
+    def open(self):
+        libshmch.server_open(self._server)
+
+    def close(self):
+        self.stop()
+        libshmch.server_close(self._server)
+        self._fail_pending(None)
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        if self._loop is not None:
+            return
+        self._loop = loop or asyncio.get_event_loop()
+        self._stopped = self._loop.create_future()
+        self._wakeup_fd = libshmch.server_get_wakeup_fd(self._server)
+        self._loop.add_reader(self._wakeup_fd, self.send_receive)
+        self.send_receive()
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.remove_reader(self._wakeup_fd)
+        if self._deadline_timer is not None:
+            self._deadline_timer.cancel()
+            self._deadline_timer = None
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+        self._loop = self._wakeup_fd = None
+
+    async def wait_stopped(self):
+        if self._stopped is not None:
+            await self._stopped
+
+    async def request(self, client: int, data: bytes) -> bytes:
+        future = asyncio.Future()
+        request_id = libshmch.server_request(
+            self._server, client, data, lambda response: self._resolve((client, request_id), response))
+        self._pending[client, request_id] = future
+        return await future
+
+    def _resolve(self, key: Tuple[int, int], data: bytes):
+        future = self._pending.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def _fail_pending(self, client: Optional[int]):
+        for key in [key for key in self._pending if client is None or key[0] == client]:
+            future = self._pending.pop(key)
+            if not future.done():
+                future.set_exception(ConnectionResetError("Client %d of %s has disconnected." % (key[0], self._name)))
+
+    def notify(self, client: int, data: bytes):
+        libshmch.server_notify(self._server, client, data)
+
+    def set_notification_callback(self, callback: Optional[Callable]):
+        libshmch.server_set_notification_callback(self._server, callback)
+
+    def set_request_callback(self, callback: Optional[Callable]):
+        self._request_callback = callback
+
+    def set_client_callback(self, callback: Optional[Callable]):
+        self._client_callback = callback
+
+    def has_credit(self, client: int, size: int = 0) -> bool:
+        return libshmch.server_has_credit(self._server, client, size)
+
+    async def drain(self, client: int, size: int = 0):
+        while not libshmch.server_has_credit(self._server, client, size):
+            waiter = asyncio.Future()
+            self._credit_waiters.append(waiter)
+            await waiter
+
+    def collect_dead_clients(self) -> int:
+        return libshmch.server_collect_dead_clients(self._server)
+
+    def _process_request(self, client: int, data: bytes, respond):
+        if self._request_callback:
+            def done_callback(future):
+                respond(future.result())
+
+            result = self._request_callback(client, data)
+            if inspect.isasyncgen(result):
+                task = asyncio.ensure_future(self._stream_response(client, result, respond))
+                task.add_done_callback(self._stream_done)
+                return
+            task = asyncio.ensure_future(result)
+            task.add_done_callback(done_callback)
+        else:
+            respond(data)
+
+    async def _stream_response(self, client: int, frames: AsyncIterator[bytes], respond):
+        try:
+            async for frame in frames:
+                await self.drain(client, len(frame))
+                respond.partial(frame)
+        finally:
+            # The client waits for the final frame, so it is sent even if the handler fails.
+            respond(b"")
+
+    def _stream_done(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            asyncio.get_event_loop().call_exception_handler({
+                "message": "Failed to stream a response on %s." % self._name,
+                "exception": task.exception(),
+                "future": task,
+            })
+
+    def _client_changed(self, client: int, connected: bool):
+        if not connected:
+            self._fail_pending(client)
+        if self._client_callback:
+            self._client_callback(client, connected)
+
+    def send_receive(self) -> bool:
+        result = libshmch.server_send_receive(self._server)
+        if self._loop is not None:
+            self._schedule_deadline()
+        self._wake_credit_waiters()
+        return result
+
+    def _wake_credit_waiters(self):
+        if self._credit_waiters:
+            waiters, self._credit_waiters = self._credit_waiters, []
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def _schedule_deadline(self):
+        if self._deadline_timer is not None:
+            self._deadline_timer.cancel()
+            self._deadline_timer = None
+        timeout = libshmch.server_get_next_timeout(self._server)
+        if timeout >= 0:
+            self._deadline_timer = self._loop.call_later(timeout / 1000, self.send_receive)
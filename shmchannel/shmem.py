@@ -0,0 +1,204 @@
+import ctypes
+import mmap
+import os
+import warnings
+from typing import Union
+
+from shmchannel import libshmch
+
+# glibc implements shm_open() with files in /dev/shm.
+SHM_DIR = "/dev/shm"
+# The header of a growable shmem, see SHMEM_HEADER_SIZE in lib/src/shmem.vala.
+GROWABLE_HEADER_SIZE = 64
+MAP_POPULATE = getattr(mmap, "MAP_POPULATE", 0x8000)  # Available since Python 3.10.
+MADV_WILLNEED = getattr(mmap, "MADV_WILLNEED", 3)  # Available since Python 3.8 as well as mmap.madvise().
+MADV_HUGEPAGE = getattr(mmap, "MADV_HUGEPAGE", 14)
+MADV_POPULATE_WRITE = 23  # Linux 5.14
+
+
+class Shmem:
+    def __init__(self, name: str, size: int = 0, create: bool = False, discard: bool = False,
+                 populate: bool = False, hugepages: bool = False, will_need: bool = False, mlock: bool = False,
+                 growable: bool = False):
+        flags = (libshmch.SHMEM_POPULATE if populate else 0) | (libshmch.SHMEM_HUGEPAGES if hugepages else 0)
+        flags |= (libshmch.SHMEM_WILL_NEED if will_need else 0) | (libshmch.SHMEM_MLOCK if mlock else 0)
+        flags |= libshmch.SHMEM_GROWABLE if growable else 0
+        self._name = name
+        self._shmem = libshmch.shmem_new(name, size, create, discard, flags)
+        self._size = libshmch.shmem_get_size(self._shmem)
+        self._mmap = self._buffer = None
+        self._map()
+
+    @classmethod
+    def create(cls, name: str, size: int, discard: bool = True, **options) -> "Shmem":
+        return cls(name, size, True, discard, **options)
+
+    @classmethod
+    def open(cls, name: str, size: int = 0, discard: bool = False, **options) -> "Shmem":
+        return cls(name, size, False, discard, **options)
+
+    def __del__(self):
+        if getattr(self, "_shmem", None) is not None and getattr(self, "_buffer", None) is not None:
+            try:
+                self.close()
+            except BufferError:
+                pass  # Exported views of the buffer keep their own mapping alive.
+
+    def __enter__(self) -> "Shmem":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[int, bytes]:
+        # Like mmap, slices are copied. Use the buffer property for zero-copy views.
+        value = self.buffer[key]
+        return value.tobytes() if isinstance(value, memoryview) else value
+
+    def __setitem__(self, key: Union[int, slice], value):
+        self.buffer[key] = value
+
+    # The buffer protocol can be implemented in Python code only since Python 3.12.
+    def __buffer__(self, flags: int) -> memoryview:
+        return memoryview(self.buffer)
+
+    # NumPy can view the shared memory even with older Python versions, e.g. np.asarray(shmem).
+    @property
+    def __array_interface__(self) -> dict:
+        return {"version": 3, "shape": (self._size,), "typestr": "|u1", "data": memoryview(self.buffer)}
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def populate(self) -> bool:
+        return bool(self._shmem is not None and libshmch.shmem_get_flags(self._shmem) & libshmch.SHMEM_POPULATE)
+
+    @property
+    def hugepages(self) -> bool:
+        return bool(self._shmem is not None and libshmch.shmem_get_flags(self._shmem) & libshmch.SHMEM_HUGEPAGES)
+
+    @property
+    def will_need(self) -> bool:
+        return bool(self._shmem is not None and libshmch.shmem_get_flags(self._shmem) & libshmch.SHMEM_WILL_NEED)
+
+    @property
+    def mlock(self) -> bool:
+        return bool(self._shmem is not None and libshmch.shmem_get_flags(self._shmem) & libshmch.SHMEM_MLOCK)
+
+    @property
+    def growable(self) -> bool:
+        return bool(self._shmem is not None and libshmch.shmem_get_flags(self._shmem) & libshmch.SHMEM_GROWABLE)
+
+    @property
+    def generation(self) -> int:
+        self._check_not_closed()
+        return libshmch.shmem_get_generation(self._shmem)
+
+    @property
+    def buffer(self) -> memoryview:
+        self._check_not_closed()
+        return self._buffer
+
+    @property
+    def closed(self) -> bool:
+        return self._shmem is None
+
+    def resize(self, new_size: int):
+        self._check_not_closed()
+        self._remap(libshmch.shmem_resize, new_size)
+
+    def refresh(self) -> bool:
+        self._check_not_closed()
+        if not libshmch.shmem_is_stale(self._shmem):
+            return False
+        self._remap(libshmch.shmem_refresh)
+        return True
+
+    def _remap(self, func, *args):
+        self._unmap()
+        try:
+            func(self._shmem, *args)
+        finally:
+            self._size = libshmch.shmem_get_size(self._shmem)
+            self._map()
+
+    def close(self):
+        if self._shmem is None:
+            return
+        self._unmap()
+        shmem, self._shmem = self._shmem, None
+        self._size = 0
+        libshmch.shmem_close(shmem)
+
+    # Views are handed out from a mapping of our own, because mmap counts all views derived from it, including
+    # slices and views of views, and refuses to be closed while any of them is alive. A memoryview of the
+    # library's mapping would not track them and they could outlive the mapping.
+    def _map(self):
+        offset = GROWABLE_HEADER_SIZE if self.growable else 0
+        # Hugepages must be advised before the pages are faulted in, like in map() in lib/src/shmem.vala.
+        flags = mmap.MAP_SHARED | (MAP_POPULATE if self.populate and not self.hugepages else 0)
+        fd = os.open(SHM_DIR + self._name, os.O_RDWR)
+        try:
+            self._mmap = mmap.mmap(fd, offset + self._size, flags, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self._advise(offset + self._size)
+        self._buffer = memoryview(self._mmap)[offset:offset + self._size]
+
+    # The library applies the options only to its own mapping and madvise() and mlock() work per mapping.
+    def _advise(self, size: int):
+        if size == 0:
+            return
+        if self.hugepages:
+            # Only advisory: the kernel may not support transparent hugepages for shared memory.
+            self._madvise(MADV_HUGEPAGE, size, "Failed to enable hugepages for shmem '%s'.")
+            if self.populate:
+                self._prefault(size)
+        if self.will_need:
+            self._madvise(MADV_WILLNEED, size, "Failed to advise shmem '%s'.")
+        if self.mlock:
+            libc = ctypes.CDLL(None, use_errno=True)
+            pointer = (ctypes.c_char * size).from_buffer(self._mmap)
+            try:
+                if libc.mlock(ctypes.addressof(pointer), ctypes.c_size_t(size)) < 0:
+                    warnings.warn("Failed to lock shmem '%s' in memory: %s" % (
+                        self._name, os.strerror(ctypes.get_errno())), RuntimeWarning)
+            finally:
+                del pointer  # The mmap cannot be closed while the ctypes array exports it.
+
+    def _madvise(self, advice: int, size: int, message: str):
+        try:
+            self._mmap.madvise(advice, 0, size)
+        except (AttributeError, OSError) as e:
+            warnings.warn((message + " %s") % (self._name, e), RuntimeWarning)
+
+    def _prefault(self, size: int):
+        try:
+            self._mmap.madvise(MADV_POPULATE_WRITE, 0, size)
+        except (AttributeError, OSError):
+            # A read fault of shared memory allocates the page too.
+            for offset in range(0, size, mmap.PAGESIZE):
+                self._mmap[offset]
+
+    def _unmap(self):
+        # Raises BufferError if any view of the buffer is still alive, e.g. a slice or a numpy array.
+        self._buffer.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            offset = GROWABLE_HEADER_SIZE if self.growable else 0
+            self._buffer = memoryview(self._mmap)[offset:offset + self._size]
+            raise
+
+    def _check_not_closed(self):
+        if self._shmem is None:
+            raise ValueError("The shmem '%s' is closed." % self._name)
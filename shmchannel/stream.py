@@ -0,0 +1,107 @@
+import asyncio
+from collections import deque
+from typing import Callable, Optional
+
+from shmchannel import libshmch
+
+
+class IncomingStream:
+    def __init__(self, stream_id: int, metadata: bytes, consume: Callable[[int], None]):
+        self._id = stream_id
+        self._metadata = metadata
+        self._consume = consume
+        self._chunks = deque()
+        self._waiter = None
+        self._finished = False
+        self._error = None
+        self._discarded = False
+
+    @property
+    def id(self) -> int:
+        return self._id
+
+    @property
+    def metadata(self) -> bytes:
+        return self._metadata
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def __aiter__(self) -> "IncomingStream":
+        return self
+
+    async def __anext__(self) -> bytes:
+        while not self._chunks:
+            if self._finished:
+                if self._error is not None:
+                    raise self._error
+                raise StopAsyncIteration
+            self._waiter = asyncio.Future()
+            await self._waiter
+        chunk = self._chunks.popleft()
+        # The sender gets the credit back only once the chunk has been taken, so a slow consumer slows it down.
+        self._consume(len(chunk))
+        return chunk
+
+    async def read(self) -> bytes:
+        return b"".join([chunk async for chunk in self])
+
+    def close(self):
+        self._discarded = True
+        while self._chunks:
+            self._consume(len(self._chunks.popleft()))
+        self._finish(None)
+
+    def _push(self, chunk: bytes):
+        if self._discarded:
+            self._consume(len(chunk))
+        else:
+            self._chunks.append(chunk)
+            self._wake_up()
+
+    def _finish(self, error: Optional[Exception]):
+        if not self._finished:
+            self._finished = True
+            self._error = error
+            self._wake_up()
+
+    def _wake_up(self):
+        if self._waiter is not None:
+            if not self._waiter.done():
+                self._waiter.set_result(None)
+            self._waiter = None
+
+
+class OutgoingStream:
+    def __init__(self, channel, stream):
+        self._channel = channel
+        self._stream = stream
+        self._chunk_size = channel.stream_chunk_size
+
+    @property
+    def id(self) -> int:
+        return libshmch.stream_get_id(self._stream)
+
+    async def __aenter__(self) -> "OutgoingStream":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.finish()
+        else:
+            await self.abort()
+
+    async def write(self, data: bytes):
+        view = memoryview(data).cast("B")
+        while view:
+            await self._channel.drain(min(self._chunk_size or len(view), len(view)))
+            view = view[libshmch.stream_write(self._stream, view):]
+
+    async def finish(self):
+        await self._channel.drain()
+        libshmch.stream_finish(self._stream)
+
+    async def abort(self):
+        await self._channel.drain()
+        libshmch.stream_abort(self._stream)
@@ -0,0 +1,41 @@
+import os
+import unittest
+
+from shmchannel import Channel, MODE_CLIENT, MODE_SERVER
+
+
+class LeaseTest(unittest.TestCase):
+    def setUp(self):
+        name = "/shmch-test-lease-%d" % os.getpid()
+        self.server = Channel(name, MODE_SERVER, arena_size=64 * 1024, zero_copy=True)
+        self.client = Channel(name, MODE_CLIENT)
+        self.server.open()
+        self.client.open()
+
+    def tearDown(self):
+        self.client.close()
+        self.client.destroy()
+        self.server.destroy()
+
+    def receive_lease(self, data: bytes):
+        leases = []
+        self.server.set_notification_callback(leases.append)
+        self.client.notify(data)
+        self.client.send_receive()
+        self.server.send_receive()
+        self.assertEqual(len(leases), 1)
+        return leases[0]
+
+    def test_close_with_held_lease(self):
+        data = b"x" * 4096
+        lease = self.receive_lease(data)
+        with self.assertRaises(RuntimeError):
+            self.server.close()
+        self.assertEqual(bytes(lease.data), data)
+        lease.release()
+        self.server.close()
+
+    def test_close_after_lease_is_released(self):
+        with self.receive_lease(b"y" * 4096) as lease:
+            self.assertEqual(bytes(lease.data), b"y" * 4096)
+        self.server.close()
@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from shmchannel import Shmem
+
+
+class ShmemTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "/shmch-test-%d" % os.getpid()
+
+    def test_close_with_live_slice(self):
+        shmem = Shmem.create(self.name, 4096)
+        view = shmem.buffer[16:32]
+        with self.assertRaises(BufferError):
+            shmem.close()
+        self.assertFalse(shmem.closed)
+        view[0] = 42
+        self.assertEqual(shmem[16], 42)
+        view.release()
+        shmem.close()
+        self.assertTrue(shmem.closed)
+
+    def test_close_with_live_view_of_view(self):
+        shmem = Shmem.create(self.name, 4096)
+        view = memoryview(shmem.buffer)[1:]
+        with self.assertRaises(BufferError):
+            shmem.close()
+        del view
+        shmem.close()
+
+    def test_resize_with_live_slice(self):
+        shmem = Shmem.create(self.name, 4096, growable=True)
+        shmem[0:4] = b"data"
+        view = shmem.buffer[0:4]
+        with self.assertRaises(BufferError):
+            shmem.resize(1024 * 1024)
+        self.assertEqual(shmem.size, 4096)
+        self.assertEqual(view.tobytes(), b"data")
+        view.release()
+        shmem.resize(1024 * 1024)
+        self.assertEqual(shmem.size, 1024 * 1024)
+        self.assertEqual(shmem[0:4], b"data")
+        shmem.close()
+
+    def test_refresh_with_live_slice(self):
+        with Shmem.create(self.name, 4096, growable=True) as writer:
+            reader = Shmem.open(self.name, growable=True)
+            view = reader.buffer[0:4]
+            writer.resize(8192)
+            with self.assertRaises(BufferError):
+                reader.refresh()
+            self.assertEqual(reader.size, 4096)
+            view.release()
+            self.assertTrue(reader.refresh())
+            self.assertEqual(reader.size, 8192)
+            reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()